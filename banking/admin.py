@@ -1,36 +1,88 @@
 from django.contrib import admin
 
 # Register your models here.
-from .models import AccountHolder, Account, Transaction, MoneyTransfer, Card, Statement
+from .models import AccountHolder, Account, Transaction, MoneyTransfer, Card, Statement, StatementLine, DailyBalance, DailyRollup, IdempotencyKey
+from . import sharding
+from .routing import replica_reads
+
+class ReplicaModelAdmin(admin.ModelAdmin):
+    """Changelist pages read from the replica; edits and actions stay on the primary."""
+
+    def changelist_view(self, request, extra_context=None):
+        if request.method != 'GET':
+            return super().changelist_view(request, extra_context)
+        with replica_reads(request.user.id):
+            response = super().changelist_view(request, extra_context)
+            # The result list is only queried while the template renders
+            if hasattr(response, 'render'):
+                response.render()
+        return response
 
 @admin.register(AccountHolder)
-class AccountHolderAdmin(admin.ModelAdmin):
+class AccountHolderAdmin(ReplicaModelAdmin):
     list_display = ['user', 'phone_number', 'created_at']
     search_fields = ['user__username', 'user__email', 'phone_number']
 
 @admin.register(Account)
-class AccountAdmin(admin.ModelAdmin):
+class AccountAdmin(ReplicaModelAdmin):
     list_display = ['account_number', 'account_holder', 'account_type', 'balance', 'is_active']
     list_filter = ['account_type', 'is_active']
     search_fields = ['account_number', 'account_holder__user__username']
 
+    # Holders stay on default when the ledger has a database of its own, so
+    # neither the list nor the search can join them
+    def get_list_select_related(self, request):
+        return () if sharding.is_routed() else super().get_list_select_related(request)
+
+    def get_search_fields(self, request):
+        return ['account_number'] if sharding.is_routed() else super().get_search_fields(request)
+
 @admin.register(Transaction)
-class TransactionAdmin(admin.ModelAdmin):
+class TransactionAdmin(ReplicaModelAdmin):
     list_display = ['transaction_id', 'account', 'transaction_type', 'amount', 'created_at']
     list_filter = ['transaction_type', 'created_at']
     search_fields = ['transaction_id', 'account__account_number']
 
 @admin.register(MoneyTransfer)
-class MoneyTransferAdmin(admin.ModelAdmin):
+class MoneyTransferAdmin(ReplicaModelAdmin):
     list_display = ['transfer_id', 'from_account', 'to_account', 'amount', 'status', 'created_at']
     list_filter = ['status', 'created_at']
 
 @admin.register(Card)
-class CardAdmin(admin.ModelAdmin):
+class CardAdmin(ReplicaModelAdmin):
     list_display = ['card_number', 'account', 'card_type', 'cardholder_name', 'is_active']
     list_filter = ['card_type', 'is_active']
 
+class StatementLineInline(admin.TabularInline):
+    model = StatementLine
+    fields = ['position', 'transaction_id', 'transaction_type', 'amount', 'balance_after', 'created_at']
+    readonly_fields = fields
+    can_delete = False
+    extra = 0
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
 @admin.register(Statement)
-class StatementAdmin(admin.ModelAdmin):
-    list_display = ['account', 'statement_period_start', 'statement_period_end', 'generated_at']
+class StatementAdmin(ReplicaModelAdmin):
+    inlines = [StatementLineInline]
+    list_display = ['account', 'statement_period_start', 'statement_period_end', 'line_count', 'generated_at']
     list_filter = ['generated_at']
+
+@admin.register(DailyBalance)
+class DailyBalanceAdmin(ReplicaModelAdmin):
+    list_display = ['account', 'date', 'closing_balance', 'total_deposits', 'total_withdrawals']
+    list_filter = ['date']
+    search_fields = ['account__account_number']
+
+@admin.register(DailyRollup)
+class DailyRollupAdmin(ReplicaModelAdmin):
+    list_display = ['account', 'date', 'transaction_type', 'count', 'total']
+    list_filter = ['transaction_type', 'date']
+    search_fields = ['account__account_number']
+
+@admin.register(IdempotencyKey)
+class IdempotencyKeyAdmin(ReplicaModelAdmin):
+    list_display = ['user', 'key', 'status_code', 'created_at', 'expires_at']
+    search_fields = ['user__username', 'key']
+    readonly_fields = ['user', 'key', 'fingerprint', 'status_code', 'response_body', 'created_at', 'expires_at']
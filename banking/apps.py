@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class BankingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'banking'
+
+    def ready(self):
+        # Connect the holder-cache, token revocation, SQLite pragma and shard signals
+        from . import holders, authentication, sqlite, sharding  # noqa: F401
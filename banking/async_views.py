@@ -0,0 +1,116 @@
+"""
+Async read endpoints for ASGI deployments.
+
+These mirror the sync DRF list views under ``/api/async/`` but are native
+coroutines: authentication is signature-only, holder resolution and queries
+go through the async ORM, and responses are plain ``JsonResponse`` objects.
+Under ASGI a slow client therefore holds a coroutine, not a worker thread.
+Serializers only run over rows that are already loaded, so they never touch
+the database from the event loop. The account, transaction and statement
+lists answer conditional GETs like their sync twins (``banking.conditional``).
+"""
+import functools
+
+from django.http import JsonResponse
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotAuthenticated, NotFound
+from rest_framework.request import Request
+
+from . import conditional
+from .authentication import StatelessHolderAuthentication
+from .holders import aholder_context, aowns_account
+from .models import AccountHolder, Account, Transaction, Statement
+from .pagination import AsyncPageNumberPagination, LedgerPagination
+from .serializers import AccountHolderSerializer, AccountSerializer, StatementSerializer, TransactionSerializer
+
+
+def _error_response(exc):
+    # Same body shape as DRF's default exception handler
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    response = JsonResponse(data, status=exc.status_code, safe=False)
+    if getattr(exc, 'auth_header', None):
+        response['WWW-Authenticate'] = exc.auth_header
+    return response
+
+
+def async_api_view(view):
+    """Authenticate the bearer token and render DRF exceptions for an async GET view."""
+    authenticator = StatelessHolderAuthentication()
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != 'GET':
+            return JsonResponse({'detail': f'Method "{request.method}" not allowed.'},
+                                status=status.HTTP_405_METHOD_NOT_ALLOWED)
+        try:
+            result = authenticator.authenticate(request)
+            if result is None:
+                raise NotAuthenticated()
+            request.user = result[0]
+            return await view(request, *args, **kwargs)
+        except APIException as exc:
+            if isinstance(exc, NotAuthenticated) or exc.status_code == status.HTTP_401_UNAUTHORIZED:
+                exc.auth_header = authenticator.authenticate_header(request)
+            return _error_response(exc)
+
+    return wrapper
+
+
+async def _paginated(request, queryset, serializer_class, pagination_class):
+    paginator = pagination_class()
+    page = await paginator.apaginate_queryset(queryset, Request(request))
+    data = serializer_class(page, many=True).data
+    return JsonResponse(paginator.get_paginated_response(data).data)
+
+
+def conditional_get(view):
+    """Answer with 304 when none of the accounts an async list covers changed."""
+
+    @functools.wraps(view)
+    async def wrapper(request, account_id=None):
+        found = await conditional.afor_request(request, account_id)
+        if found is None:
+            return await view(request, account_id)
+        etag, last_modified = found
+        response = conditional.not_modified(request, etag, last_modified)
+        if response is None:
+            response = await view(request, account_id)
+        return conditional.stamp(response, etag, last_modified)
+
+    return wrapper
+
+
+@async_api_view
+async def account_holder_profile(request):
+    try:
+        context = await aholder_context(request)
+        account_holder = await AccountHolder.objects.select_related('user').aget(pk=context.holder_id)
+    except AccountHolder.DoesNotExist:
+        return JsonResponse({'error': 'Account holder not found'}, status=404)
+    return JsonResponse(AccountHolderSerializer(account_holder).data)
+
+
+@async_api_view
+@conditional_get
+async def account_list(request, account_id=None):
+    context = await aholder_context(request)
+    queryset = Account.objects.filter(account_holder_id=context.holder_id)
+    return await _paginated(request, queryset, AccountSerializer, AsyncPageNumberPagination)
+
+
+@async_api_view
+@conditional_get
+async def transaction_list(request, account_id):
+    if not await aowns_account(request, account_id):
+        raise NotFound('Account not found')
+    queryset = Transaction.objects.filter(account_id=account_id)
+    return await _paginated(request, queryset, TransactionSerializer, LedgerPagination)
+
+
+@async_api_view
+@conditional_get
+async def statement_list(request, account_id):
+    if not await aowns_account(request, account_id):
+        raise NotFound('Account not found')
+    queryset = Statement.objects.filter(account_id=account_id).select_related('account')
+    return await _paginated(request, queryset, StatementSerializer, AsyncPageNumberPagination)
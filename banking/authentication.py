@@ -0,0 +1,172 @@
+"""
+Stateless JWT authentication.
+
+Login embeds the holder id and account ids as token claims. Requests then
+authenticate from the signature alone: no ``auth_user`` lookup and, while the
+claims are current, no holder lookup either. Logout and deactivation are
+enforced through a process-local revocation list instead of the database.
+
+The claims carry the time they were read (``holder_claims_at``). Rotation
+resets ``iat`` but copies that claim forward, so a holder's account-set
+change still invalidates them after any number of refreshes; the refresh
+that notices re-reads them.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import BasePermission
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+
+from . import holders
+from .models import AccountHolder
+
+
+class RevocationList:
+    """
+    Revoked token ids and per-user cut-off times.
+
+    Entries are dropped once every token they could match has expired, so the
+    list only ever holds roughly one token lifetime's worth of logouts.
+    """
+
+    def __init__(self, horizon):
+        self.horizon = horizon
+        self._tokens = {}
+        self._users = {}
+        self._lock = threading.Lock()
+
+    def revoke_token(self, jti, expires_at):
+        with self._lock:
+            self._tokens[jti] = expires_at
+            self._prune()
+
+    def revoke_user(self, user_id):
+        """Reject every token for ``user_id`` issued up to now."""
+        with self._lock:
+            self._users[user_id] = time.time()
+            self._prune()
+
+    def is_revoked(self, token):
+        if token.get(api_settings.JTI_CLAIM) in self._tokens:
+            return True
+        revoked_at = self._users.get(token.get(api_settings.USER_ID_CLAIM))
+        return revoked_at is not None and token['iat'] <= revoked_at
+
+    def clear(self):
+        with self._lock:
+            self._tokens.clear()
+            self._users.clear()
+
+    def _prune(self):
+        now = time.time()
+        for jti in [jti for jti, expires_at in self._tokens.items() if expires_at < now]:
+            del self._tokens[jti]
+        cutoff = now - self.horizon
+        for user_id in [user_id for user_id, at in self._users.items() if at < cutoff]:
+            del self._users[user_id]
+
+
+revocations = RevocationList(horizon=(
+    settings.SIMPLE_JWT['ACCESS_TOKEN_LIFETIME'] + settings.SIMPLE_JWT['REFRESH_TOKEN_LIFETIME']
+).total_seconds())
+
+
+class StatelessHolderAuthentication(JWTStatelessUserAuthentication):
+    """
+    Authenticates from the token alone and seeds the request's holder context
+    from its claims.
+
+    ``request.user`` is a ``TokenUser``; views must not rely on model fields
+    of ``User`` beyond ``id``.
+    """
+
+    def authenticate(self, request):
+        result = super().authenticate(request)
+        if result is None:
+            return None
+        user, token = result
+        if revocations.is_revoked(token):
+            raise AuthenticationFailed('Token has been revoked', code='token_revoked')
+        context = holders.from_claims(token)
+        if context is not None:
+            request._holder_context = context
+        return user, token
+
+
+def set_holder_claims(token, user_id):
+    """Embed ``user_id``'s holder id and account ids, read now, in ``token``."""
+    claims_at = int(time.time())
+    try:
+        context = holders.resolve(user_id)
+    except AccountHolder.DoesNotExist:
+        return token
+    token['holder_id'] = context.holder_id
+    token['account_ids'] = sorted(context.account_ids)
+    token[holders.CLAIMS_AT_CLAIM] = claims_at
+    return token
+
+
+def is_staff(user):
+    """
+    Whether ``user`` is active staff right now.
+
+    The ``is_staff`` claim is copied into every refreshed token, so a demoted
+    user's claim says yes until the refresh token expires. Gates that grant
+    staff powers confirm it against the database; the claim only spares
+    everyone else the query.
+    """
+    return bool(getattr(user, 'is_staff', False)) and User.objects.filter(
+        pk=user.id, is_staff=True, is_active=True
+    ).exists()
+
+
+class IsStaff(BasePermission):
+    """``IsAdminUser`` for token users, checked against the database."""
+
+    def has_permission(self, request, view):
+        return is_staff(request.user)
+
+
+class BankingTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        # Read by TokenUser.is_staff, which gates the operations endpoints.
+        token['is_staff'] = user.is_staff
+        return set_holder_claims(token, user.id)
+
+
+class BankingTokenRefreshSerializer(TokenRefreshSerializer):
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        if revocations.is_revoked(refresh):
+            raise InvalidToken('Token has been revoked')
+
+        if holders.claims_are_stale(refresh):
+            set_holder_claims(refresh, refresh[api_settings.USER_ID_CLAIM])
+        data = {'access': str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data['refresh'] = str(refresh)
+        return data
+
+
+@receiver(post_save, sender=User)
+def _user_saved(sender, instance, created, **kwargs):
+    if not created and not instance.is_active:
+        revocations.revoke_user(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def _user_deleted(sender, instance, **kwargs):
+    revocations.revoke_user(instance.pk)
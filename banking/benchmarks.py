@@ -0,0 +1,163 @@
+"""
+Helpers shared by the ``bench_*`` management commands.
+
+Benchmarks run against throwaway, freshly migrated SQLite files so they never
+touch ``banking_db.sqlite3`` or the ledger databases, and so worker threads
+get real file locking rather than an in-memory database.
+"""
+import os
+import tempfile
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.servers.basehttp import ThreadedWSGIServer
+from django.core.wsgi import get_wsgi_application
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.testcases import QuietWSGIRequestHandler
+
+from . import sharding
+from .models import AccountHolder, Account
+
+PASSWORD = 'benchpass123'
+
+
+@contextmanager
+def scratch_database(alias=None):
+    """
+    Point ``alias`` at a new temporary database for the duration of the block.
+
+    Without an alias, ``default`` and every ledger shard (``sharding.shards()``)
+    are swapped, since ledger rows live on the shards. Yields the path of the
+    first one swapped.
+    """
+    if alias is not None:
+        with _scratch(alias) as path:
+            yield path
+        return
+    with ExitStack() as stack:
+        paths = [stack.enter_context(_scratch(name))
+                 for name in dict.fromkeys((DEFAULT_DB_ALIAS,) + sharding.shards())]
+        yield paths[0]
+
+
+@contextmanager
+def _scratch(alias):
+    conn = connections[alias]
+    fd, path = tempfile.mkstemp(prefix='banking-bench-', suffix='.sqlite3')
+    os.close(fd)
+    conn.settings_dict['TEST'] = dict(conn.settings_dict.get('TEST') or {}, NAME=path)
+    old_name = conn.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield path
+    finally:
+        connections.close_all()
+        conn.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def run_threads(target, count, *args):
+    """
+    Run ``target(index, *args)`` on ``count`` threads released together.
+
+    Returns ``(elapsed_seconds, errors)`` where ``errors`` lists the exceptions
+    raised by workers.
+    """
+    barrier = threading.Barrier(count + 1)
+    errors = []
+
+    def worker(index):
+        try:
+            barrier.wait()
+            target(index, *args)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started, errors
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of ``values`` (``pct`` in 0-100)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[rank]
+
+
+def create_holder(username, balance=Decimal('0.00'), account_type='CHECKING'):
+    """Create a user, holder and one account; returns the account."""
+    user = User.objects.create_user(username=username, password=PASSWORD)
+    holder = AccountHolder.objects.create(
+        user=user,
+        phone_number='+10000000000',
+        address='1 Bench St',
+        date_of_birth=date(1990, 1, 1)
+    )
+    return Account.objects.create(account_holder=holder, account_type=account_type, balance=balance)
+
+
+def seed_population(prefix, holders, accounts_per_holder=1, balance=Decimal('0.00')):
+    """
+    Bulk-create ``holders`` users (password ``PASSWORD``), each with
+    ``accounts_per_holder`` accounts. Returns ``[(username, [account_id, ...])]``.
+    """
+    password = make_password(PASSWORD)  # hash once; every user shares it
+    User.objects.bulk_create([
+        User(username=f'{prefix}{i}', password=password) for i in range(holders)
+    ], batch_size=1000)
+    users = list(User.objects.filter(username__startswith=prefix).order_by('id'))
+    AccountHolder.objects.bulk_create([
+        AccountHolder(user=user, phone_number='+10000000000', address='1 Bench St',
+                      date_of_birth=date(1990, 1, 1))
+        for user in users
+    ], batch_size=1000)
+    holder_ids = dict(AccountHolder.objects.filter(user__in=users).values_list('user_id', 'id'))
+    by_shard = {}
+    for user in users:
+        by_shard.setdefault(sharding.shard_for_holder(holder_ids[user.id]), []).append(user)
+    accounts = {}
+    for alias, members in by_shard.items():
+        Account.objects.using(alias).bulk_create([
+            Account(account_holder_id=holder_ids[user.id], account_type='CHECKING', balance=balance,
+                    account_number=f'ACC{prefix.upper()[:6]}{user.id:08d}{n:02d}')
+            for user in members for n in range(accounts_per_holder)
+        ], batch_size=1000)
+        for holder_id, account_id in Account.objects.using(alias).filter(
+                account_holder_id__in=[holder_ids[user.id] for user in members]
+        ).order_by('id').values_list('account_holder_id', 'id'):
+            accounts.setdefault(holder_id, []).append(account_id)
+    return [(user.username, accounts[holder_ids[user.id]]) for user in users]
+
+
+class _RequestHandler(QuietWSGIRequestHandler):
+    # wsgiref writes headers and body separately; with Nagle on, every
+    # keep-alive response would wait out the client's delayed ACK (~40ms).
+    disable_nagle_algorithm = True
+
+
+@contextmanager
+def serve_wsgi():
+    """Serve the project's WSGI application on a local port; yields ``(host, port)``."""
+    server = ThreadedWSGIServer(('127.0.0.1', 0), _RequestHandler, allow_reuse_address=False)
+    server.set_app(get_wsgi_application())
+    thread = threading.Thread(target=server.serve_forever, name='bench-wsgi', daemon=True)
+    thread.start()
+    try:
+        yield server.server_address[:2]
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
@@ -0,0 +1,73 @@
+"""
+Per-endpoint query budgets.
+
+Every URL in ``banking/urls.py`` declares here how many SQL queries one
+request may issue, as ``queries + per_row * rows`` where ``rows`` is the
+number of items on the page (or in the request body, for batch writes).
+``test_query_budgets`` replays each endpoint against a small and a large
+dataset and fails when a request goes over budget or issues more queries
+against the larger one, which is how an N+1 shows up before it ships.
+
+Counts assume a warm holder cache and a token carrying holder claims, i.e.
+the steady state of a logged-in client.
+"""
+
+
+class Budget:
+    """Maximum queries for one method on one endpoint."""
+    __slots__ = ('queries', 'per_row')
+
+    def __init__(self, queries, per_row=0):
+        self.queries = queries
+        self.per_row = per_row
+
+    def limit(self, rows=0):
+        return self.queries + self.per_row * rows
+
+    def __repr__(self):
+        return f'<Budget {self.queries} + {self.per_row}/row>'
+
+
+# url name -> HTTP method -> Budget
+BUDGETS = {
+    'signup': {'POST': Budget(3)},
+    'login': {'POST': Budget(2)},
+    # Re-reads the holder claims only when the account set changed since they were read
+    'token_refresh': {'POST': Budget(1)},
+    'logout': {'POST': Budget(0)},
+    'profile': {'GET': Budget(1)},
+    # Conditional GETs (banking.conditional) first look up their accounts'
+    # versions; that lookup is the whole cost of a 304.
+    # Page-number pages: versions, COUNT(*) plus the page
+    'account-list': {'GET': Budget(3), 'POST': Budget(1)},
+    'account-detail': {'GET': Budget(3), 'PATCH': Budget(2)},
+    # Exports stream one cursor however many rows they write
+    'holder-transaction-export': {'GET': Budget(1)},
+    'transactions': {'GET': Budget(2)},
+    'transaction-export': {'GET': Budget(1)},
+    # SAVEPOINT, UPDATE ... RETURNING, INSERT, checkpoint upsert, rollup upsert, RELEASE
+    'deposit': {'POST': Budget(6)},
+    'withdraw': {'POST': Budget(6)},
+    'account-balance': {'GET': Budget(2)},
+    'holder-analytics': {'GET': Budget(1)},
+    'account-analytics': {'GET': Budget(1)},
+    'transfers': {'GET': Budget(2), 'POST': Budget(11)},
+    'bulk-transfer': {'POST': Budget(11)},
+    # The staff check, then one savepoint and conditional update per account in the batch
+    'ingest-transactions': {'POST': Budget(8, per_row=3)},
+    'card-list': {'GET': Budget(2), 'POST': Budget(2)},
+    'card-detail': {'GET': Budget(1), 'PATCH': Budget(2)},
+    # Versions, COUNT(*) and the page with its account; lines are paged separately
+    'statements': {'GET': Budget(3)},
+    'statement-lines': {'GET': Budget(2)},
+    'generate-statement': {'POST': Budget(12)},
+    'async-profile': {'GET': Budget(1)},
+    'async-account-list': {'GET': Budget(3)},
+    'async-transactions': {'GET': Budget(2)},
+    'async-statements': {'GET': Budget(3)},
+}
+
+
+def budget(name, method):
+    """The Budget for ``method`` on the URL named ``name``; KeyError if undeclared."""
+    return BUDGETS[name][method.upper()]
@@ -0,0 +1,186 @@
+"""
+Daily balance checkpoints.
+
+The ledger calls ``record`` for every posting so each account keeps one
+``DailyBalance`` row per active day with the end-of-day balance and the day's
+inflows and outflows. Balances as of any date and statement totals then read a
+single checkpoint or one row per day of the period instead of replaying the
+account's full transaction history.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from . import sharding
+from .models import DailyBalance, Transaction
+
+ZERO = Decimal('0.00')
+
+# Without ON CONFLICT, above this many (account, day) pairs record() switches to batched writes
+BULK_THRESHOLD = 8
+
+
+def _day_totals(entries):
+    """Fold ledger entries into {(account_id, day): (closing, deposits, withdrawals)}."""
+    days = {}
+    for entry in entries:
+        key = (entry.account_id, timezone.localdate(entry.created_at))
+        closing, deposits, withdrawals = days.get(key, (ZERO, ZERO, ZERO))
+        if entry.transaction_type in Transaction.CREDIT_TYPES:
+            deposits += entry.amount
+        else:
+            withdrawals += entry.amount
+        days[key] = (entry.balance_after, deposits, withdrawals)
+    return days
+
+
+def record(entries):
+    """
+    Fold freshly written ledger entries into their accounts' checkpoints.
+
+    Must run in the same transaction as the balance update that produced the
+    entries; that update's row lock keeps checkpoint writes for one account in
+    commit order. Where the backend has ON CONFLICT one upsert covers every
+    day the posting touched, so a transfer costs a single extra query.
+    """
+    days = _day_totals(entries)
+    if not days:
+        return
+    connection = sharding.connection()
+    if connection.features.supports_update_conflicts_with_target:
+        _record_upsert(connection, days)
+    elif len(days) > BULK_THRESHOLD:
+        _record_many(days)
+    else:
+        _record_each(days)
+
+
+def _record_upsert(connection, days):
+    ops = connection.ops
+    table = ops.quote_name(DailyBalance._meta.db_table)
+    columns = [ops.quote_name(DailyBalance._meta.get_field(name).column)
+               for name in ('account', 'date', 'closing_balance', 'total_deposits', 'total_withdrawals')]
+    closing_column, deposits_column, withdrawals_column = columns[2:]
+    rows = [
+        [account_id, ops.adapt_datefield_value(day), ops.adapt_decimalfield_value(closing),
+         ops.adapt_decimalfield_value(deposits), ops.adapt_decimalfield_value(withdrawals)]
+        for (account_id, day), (closing, deposits, withdrawals) in days.items()
+    ]
+    batch_size = (connection.features.max_query_params or 5 * len(rows)) // 5
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            sql = (
+                'INSERT INTO %s (%s) VALUES %s ON CONFLICT (%s) DO UPDATE SET %s = excluded.%s, '
+                '%s = ROUND(%s.%s + excluded.%s, 2), %s = ROUND(%s.%s + excluded.%s, 2)' % (
+                    table,
+                    ', '.join(columns),
+                    ', '.join(['(%s, %s, %s, %s, %s)'] * len(batch)),
+                    ', '.join(columns[:2]),
+                    closing_column, closing_column,
+                    deposits_column, table, deposits_column, deposits_column,
+                    withdrawals_column, table, withdrawals_column, withdrawals_column,
+                )
+            )
+            cursor.execute(sql, [param for row in batch for param in row])
+
+
+def _record_each(days):
+    """``record`` for backends without ON CONFLICT: update, then create what was missing."""
+    for (account_id, day), (closing, deposits, withdrawals) in days.items():
+        updated = DailyBalance.objects.filter(account_id=account_id, date=day).update(
+            closing_balance=closing,
+            total_deposits=F('total_deposits') + deposits,
+            total_withdrawals=F('total_withdrawals') + withdrawals
+        )
+        if not updated:
+            DailyBalance.objects.create(
+                account_id=account_id,
+                date=day,
+                closing_balance=closing,
+                total_deposits=deposits,
+                total_withdrawals=withdrawals
+            )
+
+
+def _record_many(days):
+    """``record`` for bulk postings: one read, then batched updates and inserts."""
+    existing = {
+        (checkpoint.account_id, checkpoint.date): checkpoint
+        for checkpoint in DailyBalance.objects.filter(
+            account_id__in={account_id for account_id, _ in days},
+            date__in={day for _, day in days}
+        )
+    }
+    changed = []
+    created = []
+    for key, (closing, deposits, withdrawals) in days.items():
+        checkpoint = existing.get(key)
+        if checkpoint is None:
+            created.append(DailyBalance(
+                account_id=key[0],
+                date=key[1],
+                closing_balance=closing,
+                total_deposits=deposits,
+                total_withdrawals=withdrawals
+            ))
+        else:
+            checkpoint.closing_balance = closing
+            checkpoint.total_deposits += deposits
+            checkpoint.total_withdrawals += withdrawals
+            changed.append(checkpoint)
+    DailyBalance.objects.bulk_update(
+        changed, ['closing_balance', 'total_deposits', 'total_withdrawals'], batch_size=500
+    )
+    DailyBalance.objects.bulk_create(created, batch_size=500)
+
+
+def balance_as_of(account, day):
+    """The account's closing balance on ``day``."""
+    checkpoint = DailyBalance.objects.filter(account=account, date__lte=day).order_by('-date').first()
+    if checkpoint is not None:
+        return checkpoint.closing_balance
+    # Nothing on or before the day: the balance then was whatever the account
+    # opened its first recorded day with.
+    first = DailyBalance.objects.filter(account=account, date__gt=day).order_by('date').first()
+    if first is not None:
+        return first.opening_balance
+    return account.balance
+
+
+def period_summary(account, start_date, end_date):
+    """Opening/closing balance and total inflows/outflows for a date range."""
+    totals = DailyBalance.objects.filter(
+        account=account, date__range=[start_date, end_date]
+    ).aggregate(deposits=Sum('total_deposits'), withdrawals=Sum('total_withdrawals'))
+    return {
+        'opening_balance': balance_as_of(account, start_date - timedelta(days=1)),
+        'closing_balance': balance_as_of(account, end_date),
+        'total_deposits': totals['deposits'] or ZERO,
+        'total_withdrawals': totals['withdrawals'] or ZERO,
+    }
+
+
+def rebuild(account_ids):
+    """Recompute the checkpoints of ``account_ids`` from their raw transactions."""
+    entries = Transaction.objects.filter(account_id__in=account_ids).order_by(
+        'account_id', 'created_at', 'id'
+    ).only('account_id', 'transaction_type', 'amount', 'balance_after', 'created_at')
+
+    with transaction.atomic(using=sharding.current()):
+        DailyBalance.objects.filter(account_id__in=account_ids).delete()
+        days = _day_totals(entries.iterator(chunk_size=2000))
+        DailyBalance.objects.bulk_create([
+            DailyBalance(
+                account_id=account_id,
+                date=day,
+                closing_balance=closing,
+                total_deposits=deposits,
+                total_withdrawals=withdrawals
+            )
+            for (account_id, day), (closing, deposits, withdrawals) in days.items()
+        ], batch_size=500)
+    return len(days)
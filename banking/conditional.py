@@ -0,0 +1,103 @@
+"""
+Conditional GET for the account, transaction and statement reads.
+
+Every ledger posting bumps its account's ``version`` in the same UPDATE that
+moves the balance, and issuing a statement bumps it too. A read's ETag is a
+digest of the ``(id, version, updated_at)`` of the accounts it covers plus
+the URL and the response's media type. Last-Modified is the newest
+``updated_at``. Both come from one indexed lookup on the accounts table, so a
+poll that finds nothing changed answers 304 without running the list query or
+the serializer.
+
+Prefer ``If-None-Match``: ``If-Modified-Since`` only has one-second
+resolution, so a change in the same second as the previous response can be
+missed by a client that sends nothing else.
+"""
+import hashlib
+
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .holders import aholder_context, holder_context
+from .models import Account
+
+
+def touch(accounts):
+    """Mark the accounts in the ``accounts`` queryset as changed."""
+    return accounts.update(version=F('version') + 1, updated_at=timezone.now())
+
+
+def _versions(holder_id, account_id):
+    accounts = Account.objects.filter(account_holder_id=holder_id)
+    if account_id is not None:
+        accounts = accounts.filter(pk=account_id)
+    return accounts.order_by('id').values_list('id', 'version', 'updated_at')
+
+
+def validators(request, rows, media_type, single=False):
+    """
+    ``(etag, last_modified)`` for a response covering the account ``rows``,
+    or None when ``single`` and the account was not found, so the view can
+    answer 404 as usual.
+    """
+    if single and not rows:
+        return None
+    digest = hashlib.sha256(f'{request.get_full_path()}\n{media_type}\n'.encode())
+    for account_id, version, updated_at in rows:
+        digest.update(f'{account_id}:{version}:{updated_at.isoformat()}\n'.encode())
+    last_modified = max((row[2] for row in rows), default=None)
+    return (
+        f'"{digest.hexdigest()[:32]}"',
+        int(last_modified.timestamp()) if last_modified is not None else None,
+    )
+
+
+def not_modified(request, etag, last_modified):
+    """The 304 (or 412) response when the client's copy is current, else None."""
+    return get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+
+def stamp(response, etag, last_modified):
+    """Attach the validators to a 200 or 304 and have clients revalidate every time."""
+    if response.status_code in (200, 304):
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def for_request(request, account_id=None, media_type='application/json'):
+    """Validators for the requesting holder's accounts, or just ``account_id``."""
+    context = holder_context(request)
+    return validators(request, list(_versions(context.holder_id, account_id)), media_type,
+                      single=account_id is not None)
+
+
+async def afor_request(request, account_id=None, media_type='application/json'):
+    context = await aholder_context(request)
+    rows = [row async for row in _versions(context.holder_id, account_id)]
+    return validators(request, rows, media_type, single=account_id is not None)
+
+
+class ConditionalGetMixin:
+    """
+    Answer a generic view's GET with 304 when none of its accounts changed.
+
+    ``conditional_account_kwarg`` names the URL kwarg holding the one account
+    the view reads; None covers all of the holder's accounts.
+    """
+    conditional_account_kwarg = None
+
+    def get(self, request, *args, **kwargs):
+        account_id = kwargs.get(self.conditional_account_kwarg) if self.conditional_account_kwarg else None
+        found = for_request(request, account_id, request.accepted_media_type)
+        if found is None:
+            return super().get(request, *args, **kwargs)
+        etag, last_modified = found
+        response = not_modified(request, etag, last_modified)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        return stamp(response, etag, last_modified)
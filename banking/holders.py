@@ -0,0 +1,272 @@
+"""
+Per-request account-holder resolution.
+
+Almost every endpoint needs "which holder is this, and which accounts do they
+own". ``holder_context(request)`` answers that once per request from a bounded
+process-local LRU, so the querysets can filter on ``account_id__in`` directly
+instead of re-deriving the holder and an ``Account`` subquery each time.
+
+The cache is invalidated by signals when accounts or holders are created or
+deleted in this process; ``BANKING_HOLDER_CACHE_TTL`` bounds how long another
+process can serve a stale account set. The same signals record when a holder's
+account set last changed, so account ids embedded in older JWTs are ignored.
+
+``holder_context`` also activates the holder's shard for the rest of the
+request (``banking.sharding``).
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.settings import api_settings
+
+from . import sharding
+from .models import AccountHolder, Account
+
+
+class HolderContext:
+    """The resolved holder and the ids of the accounts they own."""
+    __slots__ = ('user_id', 'holder_id', 'account_ids')
+
+    def __init__(self, user_id, holder_id, account_ids):
+        self.user_id = user_id
+        self.holder_id = holder_id
+        self.account_ids = frozenset(account_ids)
+
+    def __repr__(self):
+        return f'<HolderContext holder={self.holder_id} accounts={sorted(self.account_ids)}>'
+
+
+class HolderCache:
+    """Thread-safe LRU of user id -> HolderContext with a time-to-live."""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._users_by_holder = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            context, expires = entry
+            if expires < time.monotonic():
+                self._drop(user_id)
+                return None
+            self._entries.move_to_end(user_id)
+            return context
+
+    def set(self, context):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._drop(context.user_id)
+            self._entries[context.user_id] = (context, time.monotonic() + self.ttl)
+            self._users_by_holder[context.holder_id] = context.user_id
+            while len(self._entries) > self.max_size:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            self._drop(user_id)
+
+    def invalidate_holder(self, holder_id):
+        with self._lock:
+            user_id = self._users_by_holder.get(holder_id)
+            if user_id is not None:
+                self._drop(user_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._users_by_holder.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _drop(self, user_id):
+        entry = self._entries.pop(user_id, None)
+        if entry is not None:
+            self._users_by_holder.pop(entry[0].holder_id, None)
+
+
+class ChangeLog:
+    """Remembers when each holder's account set last changed, for a bounded horizon."""
+
+    def __init__(self, horizon):
+        self.horizon = horizon
+        self._changed = {}
+        self._lock = threading.Lock()
+
+    def mark(self, holder_id):
+        now = time.time()
+        with self._lock:
+            self._changed[holder_id] = now
+            cutoff = now - self.horizon
+            for key in [key for key, at in self._changed.items() if at < cutoff]:
+                del self._changed[key]
+
+    def changed_since(self, holder_id, timestamp):
+        changed = self._changed.get(holder_id)
+        return changed is not None and changed >= timestamp
+
+    def clear(self):
+        with self._lock:
+            self._changed.clear()
+
+
+cache = HolderCache(
+    max_size=getattr(settings, 'BANKING_HOLDER_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'BANKING_HOLDER_CACHE_TTL', 300),
+)
+
+# Access tokens minted by a refresh carry the refresh token's iat, so claims
+# can be as old as both lifetimes together.
+# When a token's holder claims were read; unlike iat, rotation keeps it
+CLAIMS_AT_CLAIM = 'holder_claims_at'
+
+changes = ChangeLog(horizon=(
+    settings.SIMPLE_JWT['ACCESS_TOKEN_LIFETIME'] + settings.SIMPLE_JWT['REFRESH_TOKEN_LIFETIME']
+).total_seconds())
+
+
+def _context_from_rows(user_id, rows):
+    if not rows:
+        raise AccountHolder.DoesNotExist('Account holder not found')
+    context = HolderContext(user_id, rows[0][0], [account_id for _, account_id in rows if account_id])
+    cache.set(context)
+    return context
+
+
+def _resolution_query(user_id):
+    return AccountHolder.objects.filter(user_id=user_id).values_list('id', 'accounts__id')
+
+
+def _sharded_rows(user_id):
+    # The holder is on the default database and its accounts on its shard,
+    # so the two cannot be joined.
+    holder_id = AccountHolder.objects.filter(user_id=user_id).values_list('id', flat=True).first()
+    if holder_id is None:
+        return []
+    with sharding.using(sharding.shard_for_holder(holder_id)):
+        account_ids = list(Account.objects.filter(account_holder_id=holder_id).values_list('id', flat=True))
+    return [(holder_id, account_id) for account_id in account_ids] or [(holder_id, None)]
+
+
+def resolve(user_id):
+    """
+    Load a user's HolderContext in one query (two when the ledger has its own
+    database), or raise
+    AccountHolder.DoesNotExist.
+    """
+    if sharding.is_routed():
+        return _context_from_rows(user_id, _sharded_rows(user_id))
+    return _context_from_rows(user_id, list(_resolution_query(user_id)))
+
+
+async def aresolve(user_id):
+    """Async ``resolve`` for views served under ASGI."""
+    if sharding.is_routed():
+        return _context_from_rows(user_id, await sync_to_async(_sharded_rows)(user_id))
+    return _context_from_rows(user_id, [row async for row in _resolution_query(user_id)])
+
+
+def claims_are_stale(token):
+    """
+    Whether ``token``'s holder claims predate a change to the holder's
+    account set. Tokens minted before ``CLAIMS_AT_CLAIM`` existed fall back
+    to ``iat``.
+    """
+    holder_id = token.get('holder_id')
+    return holder_id is not None and changes.changed_since(
+        holder_id, token.get(CLAIMS_AT_CLAIM, token['iat'])
+    )
+
+
+def from_claims(token):
+    """
+    Build a HolderContext from the claims of a validated access token.
+
+    Returns None when the token has no holder claims or the holder's account
+    set has changed since the claims were read.
+    """
+    holder_id = token.get('holder_id')
+    if holder_id is None or claims_are_stale(token):
+        return None
+    return HolderContext(token[api_settings.USER_ID_CLAIM], holder_id, token.get('account_ids', ()))
+
+
+def holder_context(request):
+    """
+    Return the HolderContext for ``request.user``, resolving it at most once
+    per request, and route the rest of the request to the holder's shard.
+    """
+    context = getattr(request, '_holder_context', None)
+    if context is None:
+        context = cache.get(request.user.id) or resolve(request.user.id)
+        request._holder_context = context
+    sharding.activate(sharding.shard_for_holder(context.holder_id))
+    return context
+
+
+def owns_account(request, account_id):
+    """
+    Whether the requesting holder owns ``account_id``.
+
+    A miss is re-checked against the database once, so accounts opened
+    through another process are visible before the cached entry expires.
+    """
+    context = holder_context(request)
+    if int(account_id) in context.account_ids:
+        return True
+    cache.invalidate_user(context.user_id)
+    request._holder_context = context = resolve(context.user_id)
+    return int(account_id) in context.account_ids
+
+
+async def aholder_context(request):
+    """Async ``holder_context``."""
+    context = getattr(request, '_holder_context', None)
+    if context is None:
+        context = cache.get(request.user.id) or await aresolve(request.user.id)
+        request._holder_context = context
+    sharding.activate(sharding.shard_for_holder(context.holder_id))
+    return context
+
+
+async def aowns_account(request, account_id):
+    """Async ``owns_account``."""
+    context = await aholder_context(request)
+    if int(account_id) in context.account_ids:
+        return True
+    cache.invalidate_user(context.user_id)
+    request._holder_context = context = await aresolve(context.user_id)
+    return int(account_id) in context.account_ids
+
+
+@receiver(post_save, sender=Account)
+def _account_saved(sender, instance, created, **kwargs):
+    if created:
+        cache.invalidate_holder(instance.account_holder_id)
+        changes.mark(instance.account_holder_id)
+
+
+@receiver(post_delete, sender=Account)
+def _account_deleted(sender, instance, **kwargs):
+    cache.invalidate_holder(instance.account_holder_id)
+    changes.mark(instance.account_holder_id)
+
+
+@receiver(post_save, sender=AccountHolder)
+@receiver(post_delete, sender=AccountHolder)
+def _holder_changed(sender, instance, **kwargs):
+    cache.invalidate_user(instance.user_id)
+    changes.mark(instance.id)
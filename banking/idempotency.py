@@ -0,0 +1,203 @@
+"""
+Idempotency-Key support for money-moving endpoints.
+
+A client that times out can retry a deposit or transfer with the same
+``Idempotency-Key`` header and get the original response back instead of a
+second posting. The first request claims the key by inserting an
+``IdempotencyKey`` row in its own commit (the unique constraint makes exactly
+one concurrent request win). It then runs the view and stores the response.
+Retries replay that response without touching ``Account``. A retry that
+arrives while the first request is still running gets ``409``. The claim
+is only a lease of ``BANKING_IDEMPOTENCY_LEASE`` seconds: if its request
+dies before storing a response, a retry after the lease reclaims the key.
+
+Finished responses are also kept in a process-local LRU, so hot replays skip
+the database entirely. Keys live for ``BANKING_IDEMPOTENCY_TTL`` seconds;
+``purge_idempotency_keys`` deletes expired rows.
+"""
+import functools
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+from django.utils import timezone
+from rest_framework.response import Response
+
+from . import ledger
+from .models import IdempotencyKey
+
+HEADER = 'HTTP_IDEMPOTENCY_KEY'
+MAX_KEY_LENGTH = 255
+
+
+class ResponseCache:
+    """Thread-safe LRU of (user id, key) -> (fingerprint, status, body) with a time-to-live."""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id, key):
+        with self._lock:
+            entry = self._entries.get((user_id, key))
+            if entry is None:
+                return None
+            stored, expires = entry
+            if expires < time.monotonic():
+                del self._entries[(user_id, key)]
+                return None
+            self._entries.move_to_end((user_id, key))
+            return stored
+
+    def set(self, user_id, key, stored, ttl=None):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries.pop((user_id, key), None)
+            self._entries[(user_id, key)] = (stored, time.monotonic() + (self.ttl if ttl is None else ttl))
+            while len(self._entries) > self.max_size:
+                del self._entries[next(iter(self._entries))]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+cache = ResponseCache(
+    max_size=getattr(settings, 'BANKING_IDEMPOTENCY_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'BANKING_IDEMPOTENCY_TTL', 86400),
+)
+
+
+def _digest(value):
+    """JSON stand-in for what ``DjangoJSONEncoder`` cannot encode; uploads by their contents."""
+    if isinstance(value, UploadedFile):
+        digest = hashlib.sha256()
+        for chunk in value.chunks():
+            digest.update(chunk)
+        value.seek(0)
+        return {'name': value.name, 'sha256': digest.hexdigest()}
+    return str(value)
+
+
+def fingerprint(request):
+    """Hash of what the request asks for, so a key cannot be reused for a different request."""
+    body = json.dumps(request.data, sort_keys=True, cls=DjangoJSONEncoder, default=_digest)
+    return hashlib.sha256(f'{request.method} {request.path}\n{body}'.encode()).hexdigest()
+
+
+def _replay(stored, request_fingerprint):
+    stored_fingerprint, status_code, body = stored
+    if stored_fingerprint != request_fingerprint:
+        return Response({'error': 'Idempotency-Key was already used for a different request'}, status=422)
+    response = Response(body, status=status_code)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _claim(user_id, key, request_fingerprint):
+    """
+    Insert the in-progress row for ``key`` and return None, or return the
+    response to send instead when another request already holds the key.
+    """
+    lease = getattr(settings, 'BANKING_IDEMPOTENCY_LEASE', 60)
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            IdempotencyKey.objects.create(
+                user_id=user_id, key=key, fingerprint=request_fingerprint,
+                expires_at=now + timedelta(seconds=lease)
+            )
+        return None
+    except IntegrityError:
+        pass
+
+    existing = IdempotencyKey.objects.filter(user_id=user_id, key=key).first()
+    if existing is None or existing.expires_at <= now:
+        # Expired, abandoned past its lease, or released between our insert
+        # and this read: reclaim it.
+        IdempotencyKey.objects.filter(user_id=user_id, key=key, expires_at__lte=now).delete()
+        return _claim(user_id, key, request_fingerprint)
+    if existing.status_code is None:
+        if existing.fingerprint != request_fingerprint:
+            return Response({'error': 'Idempotency-Key was already used for a different request'}, status=422)
+        return Response({'error': 'A request with this Idempotency-Key is still in progress'}, status=409)
+
+    stored = (existing.fingerprint, existing.status_code, existing.response_body)
+    cache.set(user_id, key, stored, ttl=(existing.expires_at - now).total_seconds())
+    return _replay(stored, request_fingerprint)
+
+
+def _store(user_id, key, request_fingerprint, response):
+    ttl = getattr(settings, 'BANKING_IDEMPOTENCY_TTL', 86400)
+    body = json.loads(json.dumps(response.data, cls=DjangoJSONEncoder))
+    # Only an in-progress claim is filled in; a response stored by a request
+    # that reclaimed the key after our lease ran out is left alone.
+    IdempotencyKey.objects.filter(user_id=user_id, key=key, status_code__isnull=True).update(
+        status_code=response.status_code, response_body=body,
+        expires_at=timezone.now() + timedelta(seconds=ttl)
+    )
+    cache.set(user_id, key, (request_fingerprint, response.status_code, body))
+
+
+def _release(user_id, key):
+    IdempotencyKey.objects.filter(user_id=user_id, key=key, status_code__isnull=True).delete()
+
+
+def idempotent(view):
+    """
+    Honor an ``Idempotency-Key`` header on a DRF view function (or method,
+    via ``method_decorator``). Apply it under ``@api_view`` so the request is
+    already authenticated.
+
+    Responses below 500 are stored and replayed. Server errors and exceptions
+    release the key, so the client can retry.
+    """
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.META.get(HEADER)
+        if not key:
+            return view(request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response({'error': f'Idempotency-Key must be at most {MAX_KEY_LENGTH} characters'}, status=400)
+
+        user_id = request.user.id
+        request_fingerprint = fingerprint(request)
+        stored = cache.get(user_id, key)
+        if stored is not None:
+            return _replay(stored, request_fingerprint)
+        conflict = _claim(user_id, key, request_fingerprint)
+        if conflict is not None:
+            return conflict
+
+        try:
+            response = view(request, *args, **kwargs)
+        except BaseException:
+            ledger.with_retries(_release, user_id, key, using=DEFAULT_DB_ALIAS)
+            raise
+        if response.status_code >= 500:
+            ledger.with_retries(_release, user_id, key, using=DEFAULT_DB_ALIAS)
+        else:
+            # The posting has committed; losing its response to a momentary
+            # lock would leave the key answering 409 until its lease runs out.
+            ledger.with_retries(_store, user_id, key, request_fingerprint, response, using=DEFAULT_DB_ALIAS)
+        return response
+    return wrapper
+
+
+def purge(now=None):
+    """Delete expired keys and return how many were removed."""
+    deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=now or timezone.now()).delete()
+    return deleted
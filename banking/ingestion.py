@@ -0,0 +1,215 @@
+"""
+Batch ingestion of settlement credits and debits.
+
+Upstream card-settlement and ACH files carry tens of thousands of deposits and
+withdrawals across many accounts. ``ingest`` applies them in chunks: lines are
+grouped by account, each account's balance moves with one UPDATE for the net
+change, and the ledger rows are bulk-inserted with the running
+``balance_after`` each line would have produced on its own. Bad lines
+(unknown account, bad amount, overdraft) fail individually and never abort
+the rest of the batch. With sharding, each shard's accounts are applied in a
+transaction on that shard.
+"""
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+
+from . import ledger, sharding
+from .models import Account, Transaction
+
+LINE_TYPES = ('DEPOSIT', 'WITHDRAWAL')
+
+
+class IngestResult:
+    """Counts plus the per-line failures of one ingestion run."""
+
+    def __init__(self):
+        self.applied = 0
+        self.failures = []
+
+    def fail(self, line, error):
+        self.failures.append({'line': line, 'error': error})
+
+    def as_dict(self):
+        return {'applied': self.applied, 'failed': len(self.failures), 'failures': self.failures}
+
+
+def parse(content, output=None):
+    """
+    Decode a settlement file into a list of line dicts.
+
+    ``output`` is 'csv', 'ndjson' or 'json'; when omitted it is guessed from
+    the first character (``[`` for a JSON array, ``{`` for NDJSON, else CSV).
+    """
+    if isinstance(content, bytes):
+        content = content.decode('utf-8-sig')
+    if output is None:
+        first = content.lstrip()[:1]
+        output = 'json' if first == '[' else 'ndjson' if first == '{' else 'csv'
+    if output == 'json':
+        return json.loads(content)
+    if output == 'ndjson':
+        return [json.loads(line) for line in content.splitlines() if line.strip()]
+    if output == 'csv':
+        return list(csv.DictReader(io.StringIO(content)))
+    raise ValueError(f'Unknown file format: {output}')
+
+
+def _parse_line(raw):
+    """Return (account_ref, transaction_type, amount, description, reference) or raise ValueError."""
+    if not isinstance(raw, dict):
+        raise ValueError('Line must be an object')
+    if raw.get('account') not in (None, ''):
+        try:
+            account_ref = ('id', int(raw['account']))
+        except (TypeError, ValueError):
+            raise ValueError('Invalid account id')
+    elif raw.get('account_number'):
+        account_ref = ('number', str(raw['account_number']))
+    else:
+        raise ValueError('Line needs an account or account_number')
+
+    transaction_type = str(raw.get('type') or raw.get('transaction_type') or '').upper()
+    if transaction_type not in LINE_TYPES:
+        raise ValueError('Type must be DEPOSIT or WITHDRAWAL')
+    try:
+        amount = Decimal(str(raw.get('amount')))
+    except InvalidOperation:
+        raise ValueError('Invalid amount')
+    if not amount.is_finite() or amount <= 0 or amount != amount.quantize(ledger.CENT):
+        raise ValueError('Amount must be positive with at most 2 decimal places')
+    return (account_ref, transaction_type, amount,
+            str(raw.get('description') or ''), str(raw.get('reference_number') or ''))
+
+
+def _resolve_accounts(refs):
+    """
+    Map ('id', n) / ('number', s) references to (account_id, balance), with at
+    most two queries on each shard that can hold them.
+    """
+    ids = {value for kind, value in refs if kind == 'id'}
+    numbers = {value for kind, value in refs if kind == 'number'}
+    resolved = {}
+    for alias in sharding.shards():
+        # Ids name their shard; account numbers could be on any of them
+        shard_ids = {pk for pk in ids if sharding.shard_for_account(pk) == alias}
+        if not shard_ids and not numbers:
+            continue
+        with sharding.using(alias):
+            accounts = Account.objects.filter(is_active=True)
+            if shard_ids:
+                for pk, balance in accounts.filter(id__in=shard_ids).values_list('id', 'balance'):
+                    resolved[('id', pk)] = (pk, balance)
+            if numbers:
+                for pk, number, balance in accounts.filter(account_number__in=numbers).values_list(
+                        'id', 'account_number', 'balance'):
+                    resolved[('number', number)] = (pk, balance)
+    return resolved
+
+
+def _apply_account(account_id, opening, lines, result):
+    """
+    Walk one account's lines in order from ``opening``, apply the net change
+    and return the ledger rows, or None when the balance moved underneath us.
+    """
+    running = opening
+    accepted = []
+    for number, transaction_type, amount, description, reference in lines:
+        if transaction_type == 'WITHDRAWAL':
+            if amount > running:
+                result.fail(number, 'Insufficient funds')
+                continue
+            running -= amount
+        else:
+            running += amount
+        accepted.append(Transaction(
+            transaction_id=Transaction.generate_transaction_id(),
+            account_id=account_id,
+            transaction_type=transaction_type,
+            amount=amount,
+            description=description,
+            reference_number=reference,
+            balance_after=running
+        ))
+
+    # Even a zero net change runs the conditional UPDATE: it locks the row and
+    # proves ``opening`` was the real balance before any row is written.
+    if ledger.apply_net(account_id, running - opening) != running:
+        return None
+    return accepted
+
+
+def _ingest_chunk(lines, result):
+    failed_before = len(result.failures)
+    by_account = {}
+    refs = set()
+    for number, raw in lines:
+        try:
+            parsed = _parse_line(raw)
+        except ValueError as e:
+            result.fail(number, str(e))
+            continue
+        refs.add(parsed[0])
+        by_account.setdefault(parsed[0], []).append((number,) + parsed[1:])
+
+    resolved = _resolve_accounts(refs)
+    by_shard = {}
+    for ref, account_lines in by_account.items():
+        if ref not in resolved:
+            for line in account_lines:
+                result.fail(line[0], 'Account not found')
+            continue
+        account_id, opening = resolved[ref]
+        by_shard.setdefault(sharding.shard_for_account(account_id), []).append((account_id, opening, account_lines))
+
+    # Each shard's accounts commit in a transaction of their own
+    for alias, accounts in by_shard.items():
+        with sharding.using(alias):
+            result.applied += len(_ingest_shard(accounts, result))
+    result.failures[failed_before:] = sorted(result.failures[failed_before:], key=lambda failure: failure['line'])
+
+
+def _ingest_shard(accounts, result):
+    entries = []
+    with transaction.atomic(using=sharding.current()):
+        for account_id, opening, account_lines in accounts:
+            failed_before = len(result.failures)
+            while True:
+                with transaction.atomic(using=sharding.current()):
+                    accepted = _apply_account(account_id, opening, account_lines, result)
+                    if accepted is None:
+                        # Another writer moved the balance since it was read:
+                        # undo this account's update and replay from the new balance.
+                        transaction.set_rollback(True)
+                if accepted is not None:
+                    break
+                del result.failures[failed_before:]
+                opening = Account.objects.filter(pk=account_id).values_list('balance', flat=True).first()
+                if opening is None:
+                    for line in account_lines:
+                        result.fail(line[0], 'Account not found')
+                    accepted = []
+                    break
+            entries.extend(accepted)
+
+        ledger.record_entries(entries)
+    return entries
+
+
+def ingest(lines, chunk_size=5000):
+    """
+    Apply settlement ``lines`` (dicts with ``account`` or ``account_number``,
+    ``type``, ``amount`` and optional ``description``/``reference_number``).
+
+    Each chunk commits on its own; lines keep their file order within an
+    account. Returns an ``IngestResult`` whose failures carry 1-based line
+    numbers.
+    """
+    result = IngestResult()
+    numbered = list(enumerate(lines, start=1))
+    for start in range(0, len(numbered), chunk_size):
+        _ingest_chunk(numbered[start:start + chunk_size], result)
+    return result
@@ -0,0 +1,603 @@
+"""
+Balance mutation service.
+
+Every change to ``Account.balance`` goes through ``credit``/``debit`` so the
+balance is moved by a single conditional UPDATE inside the database instead of
+a read-modify-write in Python. A debit only matches when the account holds
+enough funds, which closes the race between the funds check and the update.
+
+Each posting runs on the shard that holds its account (``banking.sharding``).
+A transfer between two shards cannot commit atomically, so it is split into
+two local transactions joined by a durable outbox. The first debits the
+source and queues the credit as an ``OutboxMessage`` in the same commit. The
+second, ``deliver``, applies the credit on the destination shard, recording
+the message id there so a repeat is a no-op. It then settles the source:
+the transfer completes, or is refunded if the destination account is gone.
+Delivery runs right after the first commit; ``relay`` (the ``relay_outbox``
+command) retries whatever a crash or an unreachable shard left queued.
+"""
+import random
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, OperationalError, connections, transaction
+from django.utils import timezone
+
+from . import checkpoints, rollups, sharding
+from .models import Account, Transaction, MoneyTransfer, OutboxMessage, InboxMessage
+
+CENT = Decimal('0.01')
+
+# Lock-contention errors that are safe to retry once the transaction has rolled back
+RETRYABLE_ERRORS = (
+    'database is locked',
+    'database table is locked',
+    'deadlock detected',
+    'could not serialize access',
+)
+
+
+class InsufficientFunds(Exception):
+    """Raised when a debit would take an account below zero."""
+
+
+def _to_decimal(value):
+    return Decimal(str(value)).quantize(CENT)
+
+
+def _update_balance(account_id, delta, holder_id=None, require_funds=False):
+    """
+    Add ``delta`` to the balance with one UPDATE and return the new balance,
+    or None when no row matched. The same UPDATE bumps the account's
+    ``version`` for conditional GETs (``banking.conditional``).
+
+    The ORM's ``update()`` cannot hand back column values, so the statement is
+    written by hand to use ``RETURNING`` where the backend supports it.
+    """
+    connection = sharding.connection()
+    ops = connection.ops
+    where = ['id = %s']
+    params = [
+        ops.adapt_decimalfield_value(delta),
+        ops.adapt_datetimefield_value(timezone.now()),
+        account_id,
+    ]
+    if holder_id is not None:
+        where.append('account_holder_id = %s')
+        params.append(holder_id)
+    if require_funds:
+        where.append('balance >= %s')
+        params.append(ops.adapt_decimalfield_value(-delta))
+
+    sql = 'UPDATE %s SET balance = ROUND(balance + %%s, 2), updated_at = %%s, version = version + 1 WHERE %s' % (
+        ops.quote_name(Account._meta.db_table), ' AND '.join(where),
+    )
+    returning = connection.features.can_return_columns_from_insert
+    if returning:
+        sql += ' RETURNING balance'
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        if returning:
+            row = cursor.fetchone()
+            return None if row is None else _to_decimal(row[0])
+        if cursor.rowcount == 0:
+            return None
+    return Account.objects.values_list('balance', flat=True).get(pk=account_id)
+
+
+def _credit_many(deltas, chunk_size=300):
+    """
+    Add positive ``deltas`` ({account_id: amount}) to many balances with one
+    UPDATE per chunk and return {account_id: new_balance}.
+
+    Accounts that do not exist are simply missing from the result.
+    """
+    connection = sharding.connection()
+    ops = connection.ops
+    table = ops.quote_name(Account._meta.db_table)
+    now = ops.adapt_datetimefield_value(timezone.now())
+    returning = connection.features.can_return_columns_from_insert
+    balances = {}
+    ids = sorted(deltas)
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        params = []
+        for account_id in chunk:
+            params += [account_id, ops.adapt_decimalfield_value(deltas[account_id])]
+        params.append(now)
+        params += chunk
+        sql = ('UPDATE %s SET balance = ROUND(balance + CASE id %s END, 2), updated_at = %%s, '
+               'version = version + 1 WHERE id IN (%s)') % (
+            table, ' '.join(['WHEN %s THEN %s'] * len(chunk)), ', '.join(['%s'] * len(chunk)),
+        )
+        with connection.cursor() as cursor:
+            if returning:
+                cursor.execute(sql + ' RETURNING id, balance', params)
+                balances.update((row[0], _to_decimal(row[1])) for row in cursor.fetchall())
+            else:
+                cursor.execute(sql, params)
+    if not returning:
+        balances = dict(Account.objects.filter(pk__in=ids).values_list('id', 'balance'))
+    return balances
+
+
+def _account_exists(account_id, holder_id=None):
+    accounts = Account.objects.filter(pk=account_id)
+    if holder_id is not None:
+        accounts = accounts.filter(account_holder_id=holder_id)
+    return accounts.exists()
+
+
+def _apply_leg(account_id, delta, holder_id=None):
+    """Apply one signed balance change, raising if it cannot be applied."""
+    balance = _update_balance(account_id, delta, holder_id=holder_id, require_funds=delta < 0)
+    if balance is None:
+        if delta < 0 and _account_exists(account_id, holder_id):
+            raise InsufficientFunds('Insufficient funds')
+        raise Account.DoesNotExist('Account not found')
+    return balance
+
+
+@contextmanager
+def _posting(account_id):
+    """Route the block to the shard holding ``account_id`` and run it in one transaction there."""
+    with sharding.using(sharding.shard_for_account(account_id)) as alias, transaction.atomic(using=alias):
+        yield
+
+
+def _after_post(entries):
+    """Maintain the derived ledger state for entries written in this transaction."""
+    checkpoints.record(entries)
+    rollups.record(entries)
+
+
+def apply_net(account_id, delta):
+    """
+    Move a balance by a precomputed net ``delta`` and return the new balance,
+    or None when the account is missing or a negative delta would overdraw it.
+    """
+    return _update_balance(account_id, delta, require_funds=delta < 0)
+
+
+def record_entries(entries):
+    """Bulk-insert ledger rows whose balances were already applied in this transaction."""
+    entries = Transaction.objects.bulk_create(entries, batch_size=1000)
+    _after_post(entries)
+    return entries
+
+
+def _record(account_id, transaction_type, amount, balance_after, description, reference_number):
+    entry = Transaction.objects.create(
+        account_id=account_id,
+        transaction_type=transaction_type,
+        amount=amount,
+        description=description,
+        reference_number=reference_number,
+        balance_after=balance_after
+    )
+    _after_post([entry])
+    return entry
+
+
+def credit(account_id, amount, transaction_type='DEPOSIT', description='',
+           reference_number='', holder_id=None):
+    """
+    Add ``amount`` to the account and return the ledger ``Transaction``.
+
+    When ``holder_id`` is given the update only matches accounts owned by that
+    holder, so ownership is checked by the same statement.
+    """
+    with _posting(account_id):
+        balance = _apply_leg(account_id, amount, holder_id)
+        return _record(account_id, transaction_type, amount, balance,
+                       description, reference_number)
+
+
+def debit(account_id, amount, transaction_type='WITHDRAWAL', description='',
+          reference_number='', holder_id=None):
+    """
+    Take ``amount`` from the account and return the ledger ``Transaction``.
+
+    Raises ``InsufficientFunds`` when the balance is too low; the balance is
+    left untouched in that case.
+    """
+    with _posting(account_id):
+        balance = _apply_leg(account_id, -amount, holder_id)
+        return _record(account_id, transaction_type, amount, balance,
+                       description, reference_number)
+
+
+def _is_retryable(error):
+    message = str(error).lower()
+    return any(text in message for text in RETRYABLE_ERRORS)
+
+
+def _transfer_once(from_account, to_account, amount, description, holder_id):
+    # Touch the rows in id order so two crossing transfers always take their
+    # row locks in the same sequence and cannot deadlock each other.
+    legs = sorted([
+        (from_account.id, -amount, holder_id),
+        (to_account.id, amount, None),
+    ])
+    with transaction.atomic(using=sharding.current()):
+        balances = {account_id: _apply_leg(account_id, delta, owner)
+                    for account_id, delta, owner in legs}
+
+        money_transfer = MoneyTransfer.objects.create(
+            from_account=from_account,
+            to_account=to_account,
+            amount=amount,
+            description=description,
+            status='COMPLETED',
+            completed_at=timezone.now()
+        )
+        legs = Transaction.objects.bulk_create([
+            Transaction(
+                transaction_id=Transaction.generate_transaction_id(),
+                account_id=from_account.id,
+                transaction_type='TRANSFER_OUT',
+                amount=amount,
+                description=f"Transfer to {to_account.account_number}",
+                reference_number=money_transfer.transfer_id,
+                balance_after=balances[from_account.id]
+            ),
+            Transaction(
+                transaction_id=Transaction.generate_transaction_id(),
+                account_id=to_account.id,
+                transaction_type='TRANSFER_IN',
+                amount=amount,
+                description=f"Transfer from {from_account.account_number}",
+                reference_number=money_transfer.transfer_id,
+                balance_after=balances[to_account.id]
+            ),
+        ])
+        _after_post(legs)
+    return money_transfer
+
+
+def with_retries(fn, *args, using=None):
+    """
+    Run ``fn(*args)``, retrying lock-contention errors with jittered exponential backoff.
+
+    ``fn`` writes to the ``using`` database (the current shard by default);
+    it is not retried inside a transaction already open there.
+    """
+    retries = getattr(settings, 'BANKING_TRANSFER_RETRIES', 5)
+    backoff = getattr(settings, 'BANKING_TRANSFER_BACKOFF', 0.01)
+    connection = connections[using] if using else sharding.connection()
+    attempt = 0
+    while True:
+        try:
+            return fn(*args)
+        except OperationalError as e:
+            attempt += 1
+            if attempt > retries or connection.in_atomic_block or not _is_retryable(e):
+                raise
+            time.sleep(backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+
+
+def transfer(from_account, to_account, amount, description='', holder_id=None):
+    """
+    Move ``amount`` between two accounts and return the ``MoneyTransfer``.
+
+    Both balance updates, the transfer record and its two ledger legs commit
+    together. Lock-contention failures ("database is locked", deadlocks,
+    serialization errors) are retried with jittered exponential backoff up to
+    ``BANKING_TRANSFER_RETRIES`` times, unless the caller already holds an open
+    transaction that the failure has poisoned.
+
+    When the accounts are on different shards only the debit commits here and
+    the transfer is ``PENDING`` until its outbox message is delivered, which
+    normally happens as soon as the debit commits.
+    """
+    if from_account.id == to_account.id:
+        raise ValueError('Cannot transfer to the same account')
+    with sharding.using(sharding.shard_for_account(from_account.id)) as source:
+        if sharding.shard_for_account(to_account.id) != source:
+            return with_retries(_send_transfer, from_account, to_account, amount, description, holder_id)
+        return with_retries(_transfer_once, from_account, to_account, amount, description, holder_id)
+
+
+def _send_transfer(from_account, to_account, amount, description, holder_id):
+    """Debit the source and queue the credit for the destination shard, in one transaction."""
+    alias = sharding.current()
+    with transaction.atomic(using=alias):
+        balance = _apply_leg(from_account.id, -amount, holder_id)
+        money_transfer = MoneyTransfer.objects.create(
+            from_account=from_account,
+            to_account=to_account,
+            amount=amount,
+            description=description,
+            status='PENDING'
+        )
+        _record(from_account.id, 'TRANSFER_OUT', amount, balance,
+                f"Transfer to {to_account.account_number}", money_transfer.transfer_id)
+        message = OutboxMessage.objects.create(payload=_credit_payload(
+            money_transfer.transfer_id, from_account, to_account.id, to_account.account_number, amount, description
+        ))
+        # A failed delivery is logged and left queued for relay
+        transaction.on_commit(lambda: _deliver_sent(message, money_transfer), using=alias, robust=True)
+    return money_transfer
+
+
+def _credit_payload(transfer_id, from_account, to_id, to_number, amount, description):
+    """The outbox payload that credits ``to_id`` on its own shard."""
+    return {
+        'transfer_id': transfer_id,
+        'from_account': from_account.id,
+        'from_account_number': from_account.account_number,
+        'to_account': to_id,
+        'to_account_number': to_number,
+        'amount': str(amount),
+        'description': description,
+    }
+
+
+def _deliver_sent(message, money_transfer):
+    applied = deliver(message)
+    money_transfer.status = 'COMPLETED' if applied else 'FAILED'
+    money_transfer.completed_at = timezone.now()
+
+
+def _receive_transfer(message_id, payload):
+    """Apply a queued credit on this shard once; returns whether it was applied."""
+    with transaction.atomic(using=sharding.current()):
+        # Claim the message id first: a redelivery stops here, and the write
+        # lock is taken up front instead of upgraded from a read.
+        try:
+            with transaction.atomic(using=sharding.current()):
+                inbox = InboxMessage.objects.create(message_id=message_id, applied=True)
+        except IntegrityError:
+            return InboxMessage.objects.values_list('applied', flat=True).get(message_id=message_id)
+        amount = Decimal(payload['amount'])
+        try:
+            balance = _apply_leg(payload['to_account'], amount)
+        except Account.DoesNotExist:
+            inbox.applied = False
+            inbox.save(update_fields=['applied'])
+        else:
+            # This shard's copy of the transfer, so the recipient lists it too
+            MoneyTransfer.objects.create(
+                transfer_id=payload['transfer_id'],
+                from_account_id=payload['from_account'],
+                to_account_id=payload['to_account'],
+                amount=amount,
+                description=payload['description'],
+                status='COMPLETED',
+                completed_at=timezone.now()
+            )
+            _record(payload['to_account'], 'TRANSFER_IN', amount, balance,
+                    f"Transfer from {payload['from_account_number']}", payload['transfer_id'])
+    return inbox.applied
+
+
+def _settle_transfer(message_pk, payload, applied):
+    """Mark a delivered message done on the sending shard and complete or refund its transfer."""
+    now = timezone.now()
+    with transaction.atomic(using=sharding.current()):
+        if not OutboxMessage.objects.filter(pk=message_pk, delivered_at__isnull=True).update(delivered_at=now):
+            return  # settled by a concurrent delivery
+        transfers = MoneyTransfer.objects.filter(transfer_id=payload['transfer_id'])
+        if applied:
+            transfers.update(status='COMPLETED', completed_at=now)
+            return
+        amount = Decimal(payload['amount'])
+        balance = _apply_leg(payload['from_account'], amount)
+        _record(payload['from_account'], 'TRANSFER_IN', amount, balance,
+                f"Refund: {payload['to_account_number']} could not be credited", payload['transfer_id'])
+        transfers.update(status='FAILED', completed_at=now)
+
+
+def deliver(message):
+    """
+    Deliver one cross-shard transfer: credit the destination, then settle the
+    source. Returns whether the credit was applied (False: refunded).
+
+    Safe to repeat at any point, so a crash between the two commits is
+    repaired by delivering the message again.
+    """
+    payload = message.payload
+    with sharding.using(sharding.shard_for_account(payload['to_account'])):
+        applied = with_retries(_receive_transfer, message.message_id, payload)
+    with sharding.using(message._state.db):
+        with_retries(_settle_transfer, message.pk, payload, applied)
+    return applied
+
+
+def relay(limit=500):
+    """
+    Deliver up to ``limit`` queued messages from each shard's outbox, oldest
+    first. Returns ``(delivered, failed)``; failed messages stay queued.
+    """
+    delivered = failed = 0
+    for alias in sharding.shards():
+        with sharding.using(alias):
+            messages = list(OutboxMessage.objects.filter(delivered_at__isnull=True).order_by('id')[:limit])
+        for message in messages:
+            try:
+                deliver(message)
+            except DatabaseError:
+                failed += 1
+            else:
+                delivered += 1
+    return delivered, failed
+
+
+class BulkTransferError(Exception):
+    """Raised when an all-or-nothing bulk transfer has invalid items; carries per-item results."""
+
+    def __init__(self, results):
+        super().__init__('Bulk transfer rejected')
+        self.results = results
+
+
+def _parse_bulk_items(from_account, items):
+    """Validate bulk items; returns (parsed, results) with results[i] set for each rejected item."""
+    results = [None] * len(items)
+    parsed = []
+    for index, item in enumerate(items):
+        try:
+            to_id = int(item['to_account'])
+            amount = Decimal(str(item['amount']))
+        except (KeyError, TypeError, ValueError, ArithmeticError):
+            results[index] = {'status': 'FAILED', 'error': 'Each item needs a to_account id and an amount'}
+            continue
+        if not amount.is_finite() or amount <= 0 or amount != amount.quantize(CENT):
+            results[index] = {'status': 'FAILED', 'error': 'Amount must be positive with at most 2 decimal places'}
+        elif to_id == from_account.id:
+            results[index] = {'status': 'FAILED', 'error': 'Cannot transfer to the same account'}
+        else:
+            parsed.append((index, to_id, amount, str(item.get('description') or '')))
+
+    # One query per shard validates every destination
+    destinations = {}
+    for _, to_id, _, _ in parsed:
+        destinations.setdefault(sharding.shard_for_account(to_id), set()).add(to_id)
+    numbers = {}
+    for alias, ids in destinations.items():
+        with sharding.using(alias):
+            numbers.update(Account.objects.filter(id__in=ids, is_active=True).values_list('id', 'account_number'))
+    valid = []
+    for index, to_id, amount, description in parsed:
+        if to_id in numbers:
+            valid.append((index, to_id, numbers[to_id], amount, description))
+        else:
+            results[index] = {'status': 'FAILED', 'error': 'Destination account not found'}
+    return valid, results
+
+
+def _affordable(from_account, lines, holder_id):
+    """The lines the source's locked balance covers, taken in order."""
+    accounts = Account.objects.select_for_update().filter(pk=from_account.id)
+    if holder_id is not None:
+        accounts = accounts.filter(account_holder_id=holder_id)
+    available = accounts.values_list('balance', flat=True).get()
+    affordable = []
+    for line in lines:
+        if line[3] <= available:
+            available -= line[3]
+            affordable.append(line)
+    return affordable
+
+
+def _bulk_transfer_once(from_account, lines, holder_id, all_or_nothing):
+    """Pay ``lines`` in one transaction; returns the lines paid and their transfers."""
+    alias = sharding.current()
+    with transaction.atomic(using=alias):
+        if not all_or_nothing:
+            # Size the batch from the locked balance, so a concurrent debit
+            # fails the items it leaves uncovered rather than the whole batch
+            lines = _affordable(from_account, lines, holder_id)
+            if not lines:
+                return [], []
+        total = sum(amount for _, _, _, amount, _ in lines)
+        credits = {}
+        for _, to_id, _, amount, _ in lines:
+            if sharding.shard_for_account(to_id) == alias:
+                credits[to_id] = credits.get(to_id, Decimal('0.00')) + amount
+
+        # The source is debited once for the whole batch, then every local
+        # destination is credited with batched UPDATEs. Destinations on other
+        # shards are credited through the outbox, as ``transfer`` does.
+        source_balance = _apply_leg(from_account.id, -total, holder_id)
+        balances = _credit_many(credits)
+
+        # Rebuild each line's running balance from the final balances
+        source_running = source_balance + total
+        running = {to_id: balances[to_id] - credited for to_id, credited in credits.items()}
+        now = timezone.now()
+        transfers = []
+        entries = []
+        payloads = []
+        for _, to_id, to_number, amount, description in lines:
+            transfer_id = MoneyTransfer.generate_transfer_id()
+            local = to_id in credits
+            source_running -= amount
+            transfers.append(MoneyTransfer(
+                transfer_id=transfer_id,
+                from_account_id=from_account.id,
+                to_account_id=to_id,
+                amount=amount,
+                description=description,
+                status='COMPLETED' if local else 'PENDING',
+                completed_at=now if local else None
+            ))
+            entries.append(Transaction(
+                transaction_id=Transaction.generate_transaction_id(),
+                account_id=from_account.id,
+                transaction_type='TRANSFER_OUT',
+                amount=amount,
+                description=f"Transfer to {to_number}",
+                reference_number=transfer_id,
+                balance_after=source_running
+            ))
+            if not local:
+                payloads.append(_credit_payload(transfer_id, from_account, to_id, to_number, amount, description))
+                continue
+            running[to_id] += amount
+            entries.append(Transaction(
+                transaction_id=Transaction.generate_transaction_id(),
+                account_id=to_id,
+                transaction_type='TRANSFER_IN',
+                amount=amount,
+                description=f"Transfer from {from_account.account_number}",
+                reference_number=transfer_id,
+                balance_after=running[to_id]
+            ))
+        transfers = MoneyTransfer.objects.bulk_create(transfers, batch_size=1000)
+        entries = Transaction.objects.bulk_create(entries, batch_size=1000)
+        _after_post(entries)
+
+        if payloads:
+            messages = OutboxMessage.objects.bulk_create(
+                [OutboxMessage(payload=payload) for payload in payloads], batch_size=1000
+            )
+            pending = [money_transfer for money_transfer in transfers if money_transfer.status == 'PENDING']
+            for message, money_transfer in zip(messages, pending):
+                # A failed delivery is logged and left queued for relay
+                transaction.on_commit(lambda message=message, money_transfer=money_transfer:
+                                      _deliver_sent(message, money_transfer), using=alias, robust=True)
+    return lines, transfers
+
+
+def bulk_transfer(from_account, items, holder_id=None, all_or_nothing=True):
+    """
+    Pay many destinations from one source account in a single transaction
+    on the source's shard.
+
+    ``items`` is a sequence of mappings with ``to_account`` (an account id),
+    ``amount`` and an optional ``description``. Returns one result per item:
+    ``{'status': 'COMPLETED', 'transfer': MoneyTransfer}`` or
+    ``{'status': 'FAILED', 'error': ...}``.
+
+    With ``all_or_nothing`` any invalid item raises ``BulkTransferError``
+    (valid items are marked ``SKIPPED``) and an overdraft raises
+    ``InsufficientFunds``; nothing is applied in either case. Otherwise invalid items and items the balance cannot cover (taken
+    in order) fail individually and the rest are paid.
+
+    Destinations on other shards are debited here with the rest and
+    credited through the outbox; their transfers stay ``PENDING`` until
+    delivered, as with ``transfer``.
+    """
+    with sharding.using(sharding.shard_for_account(from_account.id)):
+        return _bulk_transfer(from_account, items, holder_id, all_or_nothing)
+
+
+def _bulk_transfer(from_account, items, holder_id, all_or_nothing):
+    lines, results = _parse_bulk_items(from_account, items)
+    if all_or_nothing and len(lines) < len(items):
+        for line in lines:
+            results[line[0]] = {'status': 'SKIPPED'}
+        raise BulkTransferError(results)
+
+    if lines:
+        paid, transfers = with_retries(_bulk_transfer_once, from_account, lines, holder_id, all_or_nothing)
+        for line, money_transfer in zip(paid, transfers):
+            results[line[0]] = {'status': 'COMPLETED', 'transfer': money_transfer}
+        for line in lines:
+            if results[line[0]] is None:
+                results[line[0]] = {'status': 'FAILED', 'error': 'Insufficient funds'}
+    return results
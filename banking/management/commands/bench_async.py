@@ -0,0 +1,89 @@
+import asyncio
+import threading
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from banking import ledger
+from banking.benchmarks import create_holder, percentile, run_threads, scratch_database
+
+
+class Command(BaseCommand):
+    help = ('Compare concurrent-client throughput of the sync (WSGI thread pool) and async (ASGI) '
+            'transaction list endpoints.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=64, help='Concurrent clients.')
+        parser.add_argument('--requests', type=int, default=10, help='Requests per client.')
+        parser.add_argument('--threads', type=int, default=8,
+                            help='WSGI worker threads, as in a gthread/threaded server.')
+        parser.add_argument('--client-delay', type=float, default=0.05,
+                            help='Seconds each response takes to drain to a slow client.')
+        parser.add_argument('--mode', choices=['wsgi', 'asgi', 'both'], default='both')
+
+    def handle(self, *args, **options):
+        modes = ['wsgi', 'asgi'] if options['mode'] == 'both' else [options['mode']]
+        with scratch_database():
+            account = create_holder('bench-async', balance=Decimal('1000.00'))
+            for _ in range(100):
+                ledger.credit(account.id, Decimal('1.00'))
+            token = str(RefreshToken.for_user(account.account_holder.user).access_token)
+            for mode in modes:
+                run = self.run_wsgi if mode == 'wsgi' else self.run_asgi
+                elapsed, latencies, failures = run(account.id, token, options)
+                total = len(latencies)
+                self.stdout.write(
+                    f'{mode:>5}: {options["clients"]} clients x {options["requests"]} requests in {elapsed:.2f}s '
+                    f'({total / elapsed if elapsed else 0:.0f} req/s), '
+                    f'p50={percentile(latencies, 50) * 1000:.1f}ms p99={percentile(latencies, 99) * 1000:.1f}ms '
+                    f'failures={failures}'
+                )
+
+    def run_wsgi(self, account_id, token, options):
+        """A fixed pool of worker threads serves every client; a slow client pins its worker."""
+        url = f'/api/accounts/{account_id}/transactions/'
+        delay = options['client_delay']
+        workers = threading.BoundedSemaphore(options['threads'])
+        failures = []
+        latencies = []
+
+        def client_loop(index):
+            client = Client(HTTP_AUTHORIZATION=f'Bearer {token}')
+            for _ in range(options['requests']):
+                submitted = time.perf_counter()
+                with workers:
+                    response = client.get(url)
+                    if response.status_code != 200:
+                        failures.append(response.status_code)
+                    time.sleep(delay)
+                latencies.append(time.perf_counter() - submitted)
+
+        elapsed, errors = run_threads(client_loop, options['clients'])
+        return elapsed, latencies, len(failures) + len(errors)
+
+    def run_asgi(self, account_id, token, options):
+        """One event loop; a slow client holds a coroutine, not a thread."""
+        url = f'/api/async/accounts/{account_id}/transactions/'
+        delay = options['client_delay']
+        failures = []
+        latencies = []
+
+        async def client_loop():
+            client = AsyncClient()
+            for _ in range(options['requests']):
+                submitted = time.perf_counter()
+                response = await client.get(url, headers={'Authorization': f'Bearer {token}'})
+                if response.status_code != 200:
+                    failures.append(response.status_code)
+                await asyncio.sleep(delay)
+                latencies.append(time.perf_counter() - submitted)
+
+        async def main():
+            await asyncio.gather(*(client_loop() for _ in range(options['clients'])))
+
+        started = time.perf_counter()
+        asyncio.run(main())
+        return time.perf_counter() - started, latencies, len(failures)
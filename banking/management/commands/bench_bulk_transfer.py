@@ -0,0 +1,72 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db.models import Sum
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from banking import holders
+from banking.benchmarks import create_holder, scratch_database
+from banking.models import Account, MoneyTransfer
+
+
+class Command(BaseCommand):
+    help = 'Time a payroll run through /api/transfers/bulk/ against one /api/transfers/ call per employee.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, default=10000, help='Employees paid by the bulk run.')
+        parser.add_argument('--single-lines', type=int, default=500,
+                            help='Employees paid one request at a time for comparison (0 to skip).')
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            business = create_holder('bench-payroll', balance=Decimal('100000000.00'), account_type='BUSINESS')
+            employees = self.create_employees(max(options['lines'], options['single_lines']))
+            holders.cache.clear()
+
+            client = APIClient()
+            token = RefreshToken.for_user(business.account_holder.user).access_token
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+            if options['single_lines']:
+                self.run_single(client, business, employees[:options['single_lines']])
+            self.run_bulk(client, business, employees[:options['lines']])
+
+            total = Account.objects.aggregate(total=Sum('balance'))['total']
+            self.stdout.write(f'money conserved: {total == Decimal("100000000.00")}')
+
+    def create_employees(self, count):
+        holder = create_holder('bench-employee').account_holder
+        Account.objects.bulk_create([
+            Account(account_holder=holder, account_type='CHECKING', account_number=f'ACCBENCH{i:012d}')
+            for i in range(count)
+        ], batch_size=1000)
+        return list(Account.objects.filter(account_number__startswith='ACCBENCH').values_list('id', flat=True))
+
+    def run_single(self, client, business, employees):
+        started = time.perf_counter()
+        for account_id in employees:
+            client.post('/api/transfers/', {
+                'from_account': business.id, 'to_account': account_id, 'amount': '1.00'
+            }, format='json')
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'single: {len(employees)} transfers in {elapsed:.2f}s ({len(employees) / elapsed:.0f} lines/s, '
+            f'~{elapsed / len(employees) * 10000:.0f}s per 10k)'
+        )
+
+    def run_bulk(self, client, business, employees):
+        before = MoneyTransfer.objects.count()
+        items = [{'to_account': account_id, 'amount': '1.00', 'description': 'Payroll'}
+                 for account_id in employees]
+        started = time.perf_counter()
+        response = client.post('/api/transfers/bulk/', {
+            'from_account': business.id, 'items': items
+        }, format='json')
+        elapsed = time.perf_counter() - started
+        completed = MoneyTransfer.objects.count() - before
+        self.stdout.write(
+            f'  bulk: {completed} transfers in {elapsed:.2f}s ({completed / elapsed:.0f} lines/s), '
+            f'status={response.status_code}'
+        )
@@ -0,0 +1,54 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.utils import timezone
+
+from banking import ledger, statements
+from banking.authentication import BankingTokenObtainPairSerializer
+from banking.benchmarks import create_holder, percentile, scratch_database
+
+
+class Command(BaseCommand):
+    help = ('Compare the latency of full responses with 304 Not Modified revalidations on the '
+            'account, transaction and statement reads a polling client repeats.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per endpoint and mode.')
+        parser.add_argument('--postings', type=int, default=200, help='Transactions on the benchmark account.')
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            account = create_holder('bench-etag', balance=Decimal('1000.00'))
+            for _ in range(options['postings']):
+                ledger.credit(account.id, Decimal('1.00'))
+            statements.generate(account, timezone.localdate(), timezone.localdate())
+            token = BankingTokenObtainPairSerializer.get_token(account.account_holder.user).access_token
+            client = Client(HTTP_AUTHORIZATION=f'Bearer {token}')
+            urls = {
+                'accounts': '/api/accounts/',
+                'transactions': f'/api/accounts/{account.id}/transactions/',
+                'statements': f'/api/accounts/{account.id}/statements/',
+            }
+
+            for name, url in urls.items():
+                etag = client.get(url)['ETag']
+                headers = {'full': {}, '304': {'HTTP_IF_NONE_MATCH': etag}}
+                timings = {'full': [], '304': []}
+                sizes = {}
+                # Interleave so drift and GC pauses hit both sides alike
+                for n in range(options['requests']):
+                    for mode in (('full', '304') if n % 2 == 0 else ('304', 'full')):
+                        started = time.perf_counter()
+                        response = client.get(url, **headers[mode])
+                        timings[mode].append(time.perf_counter() - started)
+                        sizes[mode] = len(response.content)
+                full = percentile(timings['full'], 50)
+                cached = percentile(timings['304'], 50)
+                self.stdout.write(
+                    f'{name:>12}: p50 {full * 1e6:7.0f}us full ({sizes["full"]} bytes), '
+                    f'{cached * 1e6:7.0f}us 304 ({sizes["304"]} bytes), '
+                    f'p99 {percentile(timings["full"], 99) * 1e6:.0f}us / '
+                    f'{percentile(timings["304"], 99) * 1e6:.0f}us ({full / cached if cached else 0:.1f}x)'
+                )
@@ -0,0 +1,75 @@
+import resource
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from banking.benchmarks import create_holder, scratch_database
+from banking.models import Transaction
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def seed(account, rows, batch_size=5000):
+    """Insert ``rows`` deposits into ``account`` with ascending timestamps."""
+    start = timezone.now() - timedelta(seconds=rows)
+    amount = Decimal('1.00')
+    for offset in range(0, rows, batch_size):
+        count = min(batch_size, rows - offset)
+        Transaction.objects.bulk_create([
+            Transaction(
+                transaction_id=f'TXB{offset + i:017d}',
+                account=account,
+                transaction_type='DEPOSIT',
+                amount=amount,
+                description='Bench deposit',
+                balance_after=Decimal(offset + i + 1),
+                created_at=start + timedelta(seconds=offset + i)
+            )
+            for i in range(count)
+        ])
+
+
+class Command(BaseCommand):
+    help = 'Stream a large account history through the export endpoint and report rows/s and peak RSS.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000)
+        parser.add_argument('--output', choices=['csv', 'ndjson', 'both'], default='both')
+
+    def handle(self, *args, **options):
+        outputs = ['csv', 'ndjson'] if options['output'] == 'both' else [options['output']]
+        with scratch_database():
+            account = create_holder('bench-export')
+            started = time.perf_counter()
+            seed(account, options['rows'])
+            self.stdout.write(f'seeded {options["rows"]} rows in {time.perf_counter() - started:.1f}s, '
+                              f'peak RSS {peak_rss_mb():.0f} MB')
+
+            user = account.account_holder.user
+            client = Client(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+            for output in outputs:
+                self.run_export(client, account, output)
+
+    def run_export(self, client, account, output):
+        rss_before = peak_rss_mb()
+        started = time.perf_counter()
+        response = client.get(f'/api/accounts/{account.id}/transactions/export/', {'output': output})
+        size = lines = 0
+        for chunk in response.streaming_content:
+            size += len(chunk)
+            lines += 1
+        elapsed = time.perf_counter() - started
+        rows = lines - 1 if output == 'csv' else lines
+        self.stdout.write(
+            f'{output:>6}: {rows} rows, {size / 1048576:.1f} MB in {elapsed:.2f}s '
+            f'({rows / elapsed if elapsed else 0:.0f} rows/s), '
+            f'peak RSS {rss_before:.0f} -> {peak_rss_mb():.0f} MB'
+        )
@@ -0,0 +1,63 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from banking import ledger
+from banking.benchmarks import create_holder, percentile, run_threads, scratch_database
+from banking.models import Account, Transaction
+from banking.writer import GroupCommitWriter
+
+
+class Command(BaseCommand):
+    help = 'Compare per-posting commits with the group-commit writer at several group sizes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=32)
+        parser.add_argument('--postings', type=int, default=50, help='Postings per worker.')
+        parser.add_argument('--accounts', type=int, default=8)
+        parser.add_argument('--group-sizes', default='1,8,32,128',
+                            help='Comma-separated group sizes to try.')
+        parser.add_argument('--wait', type=float, default=0.002, help='Max seconds to fill a group.')
+
+    def handle(self, *args, **options):
+        self.run_mode('direct', None, options)
+        for size in [int(s) for s in options['group_sizes'].split(',')]:
+            self.run_mode(f'group={size}', GroupCommitWriter(max_batch=size, max_wait=options['wait']), options)
+
+    def run_mode(self, label, group_writer, options):
+        with scratch_database():
+            accounts = [create_holder(f'bench-gc-{i}', balance=Decimal('1000000.00')).id
+                        for i in range(options['accounts'])]
+            amount = Decimal('1.00')
+            latencies = []
+
+            def worker(index):
+                account_id = accounts[index % len(accounts)]
+                for n in range(options['postings']):
+                    post = ledger.credit if n % 2 == 0 else ledger.debit
+                    started = time.perf_counter()
+                    if group_writer is None:
+                        post(account_id, amount)
+                    else:
+                        group_writer.call(post, account_id, amount)
+                    latencies.append(time.perf_counter() - started)
+
+            try:
+                elapsed, errors = run_threads(worker, options['workers'])
+            finally:
+                if group_writer is not None:
+                    group_writer.shutdown()
+
+            posted = Transaction.objects.count()
+            drift = sum(
+                abs(Decimal('1000000.00') - balance)
+                for balance in Account.objects.values_list('balance', flat=True)
+            )
+            groups = f' groups={group_writer.groups}' if group_writer is not None else ''
+            self.stdout.write(
+                f'{label:>10}: {posted} postings in {elapsed:.2f}s '
+                f'({posted / elapsed if elapsed else 0:.0f} postings/s), '
+                f'p50={percentile(latencies, 50) * 1000:.1f}ms p99={percentile(latencies, 99) * 1000:.1f}ms '
+                f'errors={len(errors)}{groups} balance_drift={drift}'
+            )
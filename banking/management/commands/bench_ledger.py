@@ -0,0 +1,63 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from banking import ledger
+from banking.benchmarks import create_holder, run_threads, scratch_database
+from banking.models import Account, Transaction
+
+
+def legacy_deposit(account_id, amount):
+    """The read-modify-write deposit the views used before the ledger service."""
+    account = Account.objects.get(id=account_id)
+    with transaction.atomic():
+        account.balance += amount
+        account.save()
+        Transaction.objects.create(
+            account=account,
+            transaction_type='DEPOSIT',
+            amount=amount,
+            balance_after=account.balance
+        )
+
+
+def ledger_deposit(account_id, amount):
+    ledger.credit(account_id, amount)
+
+
+class Command(BaseCommand):
+    help = 'Hammer one account with concurrent deposits and report throughput and lost updates.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=32)
+        parser.add_argument('--postings', type=int, default=25, help='Deposits per writer.')
+        parser.add_argument('--mode', choices=['ledger', 'legacy', 'both'], default='both')
+
+    def handle(self, *args, **options):
+        modes = ['legacy', 'ledger'] if options['mode'] == 'both' else [options['mode']]
+        for mode in modes:
+            with scratch_database():
+                self.run_mode(mode, options['writers'], options['postings'])
+
+    def run_mode(self, mode, writers, postings):
+        deposit = ledger_deposit if mode == 'ledger' else legacy_deposit
+        account = create_holder(f'bench-{mode}')
+        amount = Decimal('1.00')
+
+        def worker(index):
+            for _ in range(postings):
+                deposit(account.id, amount)
+
+        elapsed, errors = run_threads(worker, writers)
+
+        account.refresh_from_db()
+        expected = amount * writers * postings
+        recorded = Transaction.objects.filter(account=account).count()
+        lost = int((expected - account.balance) / amount)
+        self.stdout.write(
+            f'{mode:>6}: {writers} writers x {postings} deposits in {elapsed:.2f}s '
+            f'({recorded / elapsed if elapsed else 0:.0f} postings/s), '
+            f'balance={account.balance} expected={expected} '
+            f'lost_updates={lost} errors={len(errors)}'
+        )
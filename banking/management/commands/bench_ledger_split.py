@@ -0,0 +1,157 @@
+import multiprocessing
+import os
+import random
+import time
+from datetime import date
+from decimal import Decimal
+from functools import partial
+
+from django.contrib.auth.models import User, update_last_login
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections
+from django.test.utils import override_settings
+
+from banking import ledger
+from banking.benchmarks import percentile, scratch_database, seed_population
+from banking.models import AccountHolder
+
+LEDGER = 'bench_ledger'
+
+
+def _pace(began, sent, rate):
+    """Sleep until the ``sent``-th operation is due at ``rate`` per second (0: unpaced)."""
+    if rate:
+        pause = began + sent / rate - time.perf_counter()
+        if pause > 0:
+            time.sleep(pause)
+
+
+def _signup_or_login(rng, index, count, users, signups):
+    if rng.random() < signups:
+        user = User.objects.create_user(username=f'signup{index}-{count}', password='benchpass123')
+        AccountHolder.objects.create(user=user, phone_number='+10000000000',
+                                     address='1 Bench St', date_of_birth=date(1990, 1, 1))
+    else:
+        # A session login, as the admin does: a session row and last_login
+        user = User.objects.get(username=rng.choice(users))
+        session = SessionStore()
+        session['_auth_user_id'] = str(user.pk)
+        session.create()
+        update_last_login(None, user)
+
+
+def _drive(kind, index, operation, duration, rate, start, results):
+    """Worker process: run ``operation(rng, count)`` at ``rate`` per second, timing each one."""
+    rng = random.Random(index)
+    latencies = []
+    errors = 0
+    try:
+        start.wait()
+        began = time.perf_counter()
+        deadline = began + duration
+        while time.perf_counter() < deadline:
+            _pace(began, len(latencies) + errors, rate)
+            started = time.perf_counter()
+            try:
+                operation(rng, len(latencies) + errors)
+                latencies.append(time.perf_counter() - started)
+            except OperationalError:
+                errors += 1
+    finally:
+        connections.close_all()
+        results.put((kind, errors, latencies))
+
+
+class Command(BaseCommand):
+    help = ('Measure deposit and login/signup latency under a mixed load, with the ledger '
+            'sharing default\'s SQLite file and then in a database of its own. Both kinds of '
+            'worker run at a fixed rate, so the two layouts see the same load.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--auth-workers', type=int, default=2, help='Processes signing up and logging in.')
+        parser.add_argument('--deposit-workers', type=int, default=2, help='Processes posting deposits.')
+        parser.add_argument('--duration', type=float, default=5.0, help='Seconds per layout.')
+        parser.add_argument('--holders', type=int, default=64)
+        parser.add_argument('--auth-rate', type=float, default=200,
+                            help='Logins plus signups per second, over all auth workers.')
+        parser.add_argument('--deposit-rate', type=float, default=300,
+                            help='Deposits per second, over all deposit workers (0: as fast as possible).')
+        parser.add_argument('--signups', type=float, default=0.2,
+                            help='Fraction of auth operations that are signups rather than logins.')
+        parser.add_argument('--pragmas', default=None,
+                            help='SQLite pragmas as name=value pairs (default: '
+                                 'settings_production.BANKING_SQLITE_PRAGMAS).')
+
+    def handle(self, *args, **options):
+        if options['pragmas']:
+            pragmas = dict(pair.split('=', 1) for pair in options['pragmas'].split(','))
+        else:
+            from banking_application import settings_production
+            pragmas = settings_production.BANKING_SQLITE_PRAGMAS
+
+        self.stdout.write(f'{os.cpu_count()} CPU(s), {options["auth_workers"]} auth + '
+                          f'{options["deposit_workers"]} deposit worker processes')
+        connections.settings[LEDGER] = connections.configure_settings({
+            'default': dict(connections.settings['default']),
+            LEDGER: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ''},
+        })[LEDGER]
+        try:
+            for layout, shards in (('single database', ['default']), ('ledger split', [LEDGER])):
+                # A cheap hasher keeps the auth workers writing rather than hashing
+                with override_settings(BANKING_SHARDS=shards, BANKING_SQLITE_PRAGMAS=pragmas,
+                                       PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher']), \
+                        scratch_database():
+                    self.report(layout, self.measure(options))
+        finally:
+            del connections[LEDGER]
+            del connections.settings[LEDGER]
+
+    def measure(self, options):
+        population = seed_population('split', options['holders'], 1)
+        users = [username for username, _ in population]
+        accounts = [ids[0] for _, ids in population]
+
+        # Children open their own connections rather than share ours
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        start = context.Event()
+        results = context.Queue()
+        signup_or_login = partial(_signup_or_login, users=users, signups=options['signups'])
+        amount = Decimal('1.00')
+        workers = [
+            context.Process(target=_drive, args=(
+                'auth', index, lambda rng, count, index=index: signup_or_login(rng, index, count),
+                options['duration'], options['auth_rate'] / options['auth_workers'], start, results))
+            for index in range(options['auth_workers'])
+        ] + [
+            context.Process(target=_drive, args=(
+                'deposit', index, lambda rng, count: ledger.credit(rng.choice(accounts), amount),
+                options['duration'], options['deposit_rate'] / options['deposit_workers'], start, results))
+            for index in range(options['deposit_workers'])
+        ]
+        for worker in workers:
+            worker.start()
+        started = time.perf_counter()
+        start.set()
+        outcomes = [results.get() for _ in workers]
+        elapsed = time.perf_counter() - started
+        for worker in workers:
+            worker.join()
+
+        totals = {'auth': [0, []], 'deposit': [0, []]}
+        for kind, errors, latencies in outcomes:
+            totals[kind][0] += errors
+            totals[kind][1].extend(latencies)
+        return totals, elapsed
+
+    def report(self, layout, measured):
+        totals, elapsed = measured
+        self.stdout.write(f'{layout}:')
+        for kind, label in (('deposit', 'deposits'), ('auth', 'logins+signups')):
+            errors, latencies = totals[kind]
+            self.stdout.write(
+                f'  {label:>14}: {len(latencies) / elapsed:6.0f}/s '
+                f'p50={percentile(latencies, 50) * 1000:6.2f}ms p99={percentile(latencies, 99) * 1000:7.2f}ms '
+                f'errors={errors}'
+            )
@@ -0,0 +1,60 @@
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import override_settings
+
+from banking import ledger, metrics
+from banking.authentication import BankingTokenObtainPairSerializer
+from banking.benchmarks import create_holder, percentile, scratch_database
+
+METRICS_MIDDLEWARE = 'banking.metrics.MetricsMiddleware'
+
+
+class Command(BaseCommand):
+    help = ('Measure the per-request overhead of MetricsMiddleware on the fastest endpoints by '
+            'interleaving requests through handlers with and without it.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=3000, help='Requests per endpoint and mode.')
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            account = create_holder('bench-metrics', balance=Decimal('1000.00'))
+            for _ in range(50):
+                ledger.credit(account.id, Decimal('1.00'))
+            token = BankingTokenObtainPairSerializer.get_token(account.account_holder.user).access_token
+            urls = {
+                'balance': f'/api/accounts/{account.id}/balance/',
+                'profile': '/api/profile/',
+                'transactions': f'/api/accounts/{account.id}/transactions/',
+            }
+            without = [name for name in settings.MIDDLEWARE if name != METRICS_MIDDLEWARE]
+            with_metrics = [METRICS_MIDDLEWARE] + without
+
+            for name, url in urls.items():
+                clients = {'off': self.client(url, str(token), without),
+                           'on': self.client(url, str(token), with_metrics)}
+                timings = {'off': [], 'on': []}
+                # Interleave single requests so drift and GC pauses hit both sides alike
+                for n in range(options['requests']):
+                    for mode in (('off', 'on') if n % 2 == 0 else ('on', 'off')):
+                        started = time.perf_counter()
+                        clients[mode].get(url)
+                        timings[mode].append(time.perf_counter() - started)
+                off = percentile(timings['off'], 50)
+                on = percentile(timings['on'], 50)
+                self.stdout.write(
+                    f'{name:>12}: p50 {off * 1e6:7.0f}us without, {on * 1e6:7.0f}us with metrics '
+                    f'({(on - off) * 1e6:+.0f}us, {(on / off - 1) * 100 if off else 0:+.1f}%)'
+                )
+            metrics.registry.clear()
+
+    def client(self, url, token, middleware):
+        """A test client whose handler loaded ``middleware``; it keeps that chain afterwards."""
+        with override_settings(MIDDLEWARE=middleware):
+            client = Client(HTTP_AUTHORIZATION=f'Bearer {token}')
+            client.get(url)
+        return client
@@ -0,0 +1,78 @@
+import time
+from datetime import datetime, time as clock, timedelta
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from banking import statements
+from banking.benchmarks import create_holder, scratch_database
+from banking.models import Account, DailyBalance, DailyRollup, Statement, StatementLine, Transaction
+
+
+class Command(BaseCommand):
+    help = 'Time month_end_statements over many accounts against per-account statements.generate.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--accounts', type=int, default=100000)
+        parser.add_argument('--entries', type=int, default=3, help='Ledger entries per account in the month.')
+        parser.add_argument('--workers', type=int, default=1)
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--single', type=int, default=500,
+                            help='Accounts to generate one at a time for comparison (0 to skip).')
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            day = (timezone.localdate().replace(day=1) - timedelta(days=1)).replace(day=15)
+            started = time.perf_counter()
+            self.populate(options['accounts'], options['entries'], day)
+            self.stdout.write(f'populated {options["accounts"]} accounts in {time.perf_counter() - started:.1f}s')
+
+            if options['single']:
+                self.run_single(options['single'], day)
+
+            call_command('month_end_statements', month=day.strftime('%Y-%m'), workers=options['workers'],
+                         chunk_size=options['chunk_size'], stdout=self.stdout)
+            self.stdout.write(f'statements: {Statement.objects.count()}, lines: {StatementLine.objects.count()}')
+
+    def populate(self, count, entries, day):
+        holder = create_holder('bench-month-end').account_holder
+        created_at = timezone.make_aware(datetime.combine(day, clock(12)))
+        amount = Decimal('1.00')
+        batch = 5000
+        for start in range(0, count, batch):
+            accounts = Account.objects.bulk_create([
+                Account(account_holder=holder, account_type='CHECKING', account_number=f'ACCME{i:015d}',
+                        balance=amount * entries)
+                for i in range(start, min(start + batch, count))
+            ])
+            Transaction.objects.bulk_create([
+                Transaction(transaction_id=f'TXME{account.id:09d}{n:03d}', account=account,
+                            transaction_type='DEPOSIT', amount=amount, balance_after=amount * (n + 1),
+                            created_at=created_at)
+                for account in accounts for n in range(entries)
+            ], batch_size=2000)
+            DailyBalance.objects.bulk_create([
+                DailyBalance(account=account, date=day, closing_balance=amount * entries,
+                             total_deposits=amount * entries)
+                for account in accounts
+            ], batch_size=2000)
+            DailyRollup.objects.bulk_create([
+                DailyRollup(account=account, date=day, transaction_type='DEPOSIT', count=entries,
+                            total=amount * entries)
+                for account in accounts
+            ], batch_size=2000)
+        # auto_now_add ignores the value passed to bulk_create
+        Transaction.objects.update(created_at=created_at)
+
+    def run_single(self, count, day):
+        first = day.replace(day=1)
+        last = (first.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+        accounts = list(Account.objects.filter(account_number__startswith='ACCME').order_by('-id')[:count])
+        started = time.perf_counter()
+        for account in accounts:
+            statements.generate(account, first, last)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'per-account generate: {count} in {elapsed:.2f}s ({count / elapsed:.0f} accounts/s)')
+        Statement.objects.filter(account__in=accounts).delete()
@@ -0,0 +1,128 @@
+import multiprocessing
+import os
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections
+from django.db.models import Sum
+from django.test.utils import override_settings
+
+from banking import ledger, sharding
+from banking.benchmarks import scratch_database, seed_population
+from banking.models import Account
+
+
+def _drive(index, local, remote, duration, cross_shard, start, results):
+    """Worker process: post to one shard's accounts until ``duration`` runs out."""
+    rng = random.Random(index)
+    amount = Decimal('1.00')
+    deposits = transfers = errors = 0
+    try:
+        start.wait()
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            try:
+                if remote and rng.random() < cross_shard:
+                    source_id, destination_id = rng.choice(local), rng.choice(remote)
+                    source = Account.objects.using(sharding.shard_for_account(source_id)).get(pk=source_id)
+                    destination = Account.objects.using(
+                        sharding.shard_for_account(destination_id)).get(pk=destination_id)
+                    ledger.transfer(source, destination, amount)
+                    transfers += 1
+                else:
+                    ledger.credit(rng.choice(local), amount)
+                    deposits += 1
+            except OperationalError:
+                errors += 1
+    finally:
+        connections.close_all()
+        results.put((deposits, transfers, errors))
+
+
+class Command(BaseCommand):
+    help = ('Measure ledger write throughput with the ledger split over 1, 2, 4... SQLite shards. '
+            'A fixed number of worker processes post deposits (and optionally cross-shard '
+            'transfers) for --duration seconds; each worker writes to one shard.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shard-counts', default='1,2,4', help='Comma-separated shard counts to try.')
+        parser.add_argument('--workers', type=int, default=4, help='Worker processes, spread over the shards.')
+        parser.add_argument('--duration', type=float, default=5.0, help='Seconds per shard count.')
+        parser.add_argument('--holders', type=int, default=64, help='Account holders, spread over the shards.')
+        parser.add_argument('--cross-shard', type=float, default=0.0,
+                            help='Fraction of postings that are transfers to another shard.')
+        parser.add_argument('--pragmas', default=None,
+                            help='SQLite pragmas as name=value pairs (default: '
+                                 'settings_production.BANKING_SQLITE_PRAGMAS).')
+
+    def handle(self, *args, **options):
+        if options['pragmas']:
+            pragmas = dict(pair.split('=', 1) for pair in options['pragmas'].split(','))
+        else:
+            from banking_application import settings_production
+            pragmas = settings_production.BANKING_SQLITE_PRAGMAS
+
+        self.stdout.write(f'{os.cpu_count()} CPU(s), {options["workers"]} worker processes, '
+                          f'{options["cross_shard"]:.0%} cross-shard transfers')
+        baseline = None
+        for count in [int(c) for c in options['shard_counts'].split(',')]:
+            aliases = ['default'] + [f'bench_shard{n}' for n in range(1, count)]
+            for alias in aliases[1:]:
+                connections.settings[alias] = connections.configure_settings({
+                    'default': dict(connections.settings['default']),
+                    alias: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ''},
+                })[alias]
+            try:
+                with override_settings(BANKING_SHARDS=aliases, BANKING_SQLITE_PRAGMAS=pragmas), scratch_database():
+                    deposits, transfers, errors, drift, elapsed = self.measure(options)
+            finally:
+                for alias in aliases[1:]:
+                    del connections[alias]
+                    del connections.settings[alias]
+
+            rate = (deposits + transfers) / elapsed
+            baseline = baseline or rate
+            self.stdout.write(
+                f'{count:>2} shard(s): {deposits} deposits + {transfers} transfers in {elapsed:.1f}s = '
+                f'{rate:7.0f} postings/s ({rate / baseline:.2f}x) errors={errors} balance_drift={drift}'
+            )
+
+    def measure(self, options):
+        opening = Decimal('1000000.00')
+        population = seed_population('shard', options['holders'], 1, balance=opening)
+        by_shard = {}
+        for _, ids in population:
+            by_shard.setdefault(sharding.shard_for_account(ids[0]), []).extend(ids)
+        shards = [by_shard[alias] for alias in sharding.shards()]
+
+        # Children open their own connections rather than share ours
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        start = context.Event()
+        results = context.Queue()
+        workers = []
+        for index in range(options['workers']):
+            local = shards[index % len(shards)]
+            remote = [account_id for other in shards if other is not local for account_id in other]
+            workers.append(context.Process(target=_drive, args=(
+                index, local, remote, options['duration'], options['cross_shard'], start, results,
+            )))
+        for worker in workers:
+            worker.start()
+        started = time.perf_counter()
+        start.set()
+        outcomes = [results.get() for _ in workers]
+        elapsed = time.perf_counter() - started
+        for worker in workers:
+            worker.join()
+
+        # Deliver anything still queued, then check that transfers moved
+        # money between shards without creating or losing any
+        ledger.relay()
+        deposits, transfers, errors = (sum(column) for column in zip(*outcomes))
+        total = sum(Account.objects.using(alias).aggregate(total=Sum('balance'))['total']
+                    for alias in sharding.shards())
+        drift = total - opening * options['holders'] - deposits
+        return deposits, transfers, errors, drift, elapsed
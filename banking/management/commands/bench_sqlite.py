@@ -0,0 +1,129 @@
+import random
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections
+from django.test.utils import override_settings
+
+from banking import ingestion, ledger, sqlite
+from banking.benchmarks import percentile, run_threads, scratch_database, seed_population
+from banking.models import Account, Transaction
+from banking.writer import GroupCommitWriter
+
+
+class Command(BaseCommand):
+    help = ('Measure read throughput and latency with and without a steady write load, under '
+            'SQLite defaults (rollback journal, writes on the request threads) and under the '
+            'production profile (WAL pragmas, writes through the serialized writer lane).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4, help='Concurrent reader threads.')
+        parser.add_argument('--writers', type=int, default=4, help='Concurrent writer threads.')
+        parser.add_argument('--write-rate', type=float, default=100.0,
+                            help='Target postings per second across all writers.')
+        parser.add_argument('--duration', type=float, default=5.0, help='Seconds per phase.')
+        parser.add_argument('--accounts', type=int, default=50)
+        parser.add_argument('--history', type=int, default=100, help='Ledger entries seeded per account.')
+        parser.add_argument('--pragmas', default=None,
+                            help='Production pragmas as name=value pairs (default: '
+                                 'settings_production.BANKING_SQLITE_PRAGMAS).')
+
+    def handle(self, *args, **options):
+        if options['pragmas']:
+            production = dict(pair.split('=', 1) for pair in options['pragmas'].split(','))
+        else:
+            from banking_application import settings_production
+            production = settings_production.BANKING_SQLITE_PRAGMAS
+
+        for label, pragmas, lane in (('default', {}, False), ('production', production, True)):
+            connections.close_all()
+            with override_settings(BANKING_SQLITE_PRAGMAS=pragmas), scratch_database():
+                accounts = self.seed(options)
+                journal = sqlite.pragmas(connections['default']).get('journal_mode') or 'delete'
+                idle = self.phase(accounts, options, writers=0, lane=None)
+                group_writer = GroupCommitWriter(
+                    max_batch=getattr(settings, 'BANKING_LEDGER_GROUP_SIZE', 64),
+                    max_wait=getattr(settings, 'BANKING_LEDGER_GROUP_WAIT', 0.002),
+                ) if lane else None
+                try:
+                    loaded = self.phase(accounts, options, writers=options['writers'], lane=group_writer)
+                finally:
+                    if group_writer is not None:
+                        group_writer.shutdown()
+            connections.close_all()
+
+            self.stdout.write(f'{label} (journal_mode={journal}, writes {"via lane" if lane else "direct"}):')
+            for phase, result in (('reads only', idle), ('with writes', loaded)):
+                self.stdout.write(
+                    f'  {phase:>11}: {result["reads_per_second"]:7.0f} reads/s '
+                    f'p50={result["read_p50_ms"]:6.2f}ms p99={result["read_p99_ms"]:7.2f}ms '
+                    f'max={result["read_max_ms"]:7.1f}ms read errors={result["read_errors"]}'
+                    + (f' | {result["writes_per_second"]:.0f} writes/s, write errors={result["write_errors"]}'
+                       if phase == 'with writes' else '')
+                )
+            change = (loaded['reads_per_second'] / idle['reads_per_second'] - 1) * 100 if idle['reads_per_second'] else 0
+            self.stdout.write(f'  read throughput under write load: {change:+.1f}%')
+
+    def seed(self, options):
+        population = seed_population('sqlite', options['accounts'], 1, balance=Decimal('1000000.00'))
+        accounts = [account_id for _, ids in population for account_id in ids]
+        ingestion.ingest([
+            {'account': account_id, 'type': 'DEPOSIT', 'amount': '1.00'}
+            for account_id in accounts for _ in range(options['history'])
+        ])
+        return accounts
+
+    def phase(self, accounts, options, writers, lane):
+        deadline = time.perf_counter() + options['duration']
+        readers = options['readers']
+        reads, read_errors, write_errors = [], [], []
+        written = [0]
+        interval = writers / options['write_rate'] if writers and options['write_rate'] > 0 else 0
+
+        def read(rng):
+            account_id = rng.choice(accounts)
+            Account.objects.only('balance').get(pk=account_id)
+            list(Transaction.objects.filter(account_id=account_id).order_by('-created_at', '-id')[:20])
+
+        def write(account_id):
+            if lane is None:
+                ledger.credit(account_id, Decimal('1.00'))
+            else:
+                lane.call(ledger.credit, account_id, Decimal('1.00'))
+
+        def worker(index):
+            rng = random.Random(index)
+            if index < readers:
+                while time.perf_counter() < deadline:
+                    started = time.perf_counter()
+                    try:
+                        read(rng)
+                    except OperationalError as e:
+                        read_errors.append(e)
+                        continue
+                    reads.append(time.perf_counter() - started)
+                return
+            next_write = time.perf_counter()
+            while time.perf_counter() < deadline:
+                try:
+                    write(rng.choice(accounts))
+                    written[0] += 1
+                except OperationalError as e:
+                    write_errors.append(e)
+                next_write += interval
+                time.sleep(max(next_write - time.perf_counter(), 0))
+
+        elapsed, errors = run_threads(worker, readers + writers)
+        if errors:
+            raise errors[0]
+        return {
+            'reads_per_second': len(reads) / elapsed if elapsed else 0,
+            'read_p50_ms': percentile(reads, 50) * 1000,
+            'read_p99_ms': percentile(reads, 99) * 1000,
+            'read_max_ms': max(reads, default=0) * 1000,
+            'read_errors': len(read_errors),
+            'writes_per_second': written[0] / elapsed if elapsed else 0,
+            'write_errors': len(write_errors),
+        }
@@ -0,0 +1,91 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from banking import ledger
+from banking.benchmarks import create_holder, run_threads, scratch_database
+from banking.models import Account, MoneyTransfer, Transaction
+
+
+def legacy_transfer(from_id, to_id, amount):
+    """The transfer path MoneyTransferListCreateView used before the engine."""
+    from_account = Account.objects.get(id=from_id)
+    to_account = Account.objects.get(id=to_id)
+    if from_account.balance < amount:
+        raise ledger.InsufficientFunds('Insufficient funds')
+    with transaction.atomic():
+        from_account.balance -= amount
+        from_account.save()
+        to_account.balance += amount
+        to_account.save()
+        money_transfer = MoneyTransfer.objects.create(
+            from_account=from_account, to_account=to_account, amount=amount,
+            status='COMPLETED', completed_at=timezone.now()
+        )
+        Transaction.objects.create(
+            account=from_account, transaction_type='TRANSFER_OUT', amount=amount,
+            reference_number=money_transfer.transfer_id, balance_after=from_account.balance
+        )
+        Transaction.objects.create(
+            account=to_account, transaction_type='TRANSFER_IN', amount=amount,
+            reference_number=money_transfer.transfer_id, balance_after=to_account.balance
+        )
+
+
+def engine_transfer(from_id, to_id, amount):
+    ledger.transfer(Account.objects.get(id=from_id), Account.objects.get(id=to_id), amount)
+
+
+class Command(BaseCommand):
+    help = ('Run crossing A->B / B->A transfers from many threads and report transfers/s. The legacy '
+            'path checks and saves balances it read outside its transaction, so concurrent transfers '
+            'overwrite each other (conserved=False). The engine moves both balances with conditional '
+            'UPDATEs in id order and also writes the checkpoint and rollup rows that balance-as-of and '
+            'analytics read, so it does more work per transfer for the same SQLite write lock; on one '
+            'CPU the two land within noise of each other.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=32)
+        parser.add_argument('--transfers', type=int, default=25, help='Transfers per worker.')
+        parser.add_argument('--mode', choices=['engine', 'legacy', 'both'], default='both')
+
+    def handle(self, *args, **options):
+        modes = ['legacy', 'engine'] if options['mode'] == 'both' else [options['mode']]
+        for mode in modes:
+            with scratch_database():
+                self.run_mode(mode, options['workers'], options['transfers'])
+
+    def run_mode(self, mode, workers, transfers):
+        move = engine_transfer if mode == 'engine' else legacy_transfer
+        opening = Decimal('1000000.00')
+        a = create_holder(f'bench-{mode}-a', balance=opening)
+        b = create_holder(f'bench-{mode}-b', balance=opening)
+        amount = Decimal('1.00')
+
+        def worker(index):
+            # Even workers push A->B, odd workers B->A
+            source, target = (a.id, b.id) if index % 2 == 0 else (b.id, a.id)
+            for _ in range(transfers):
+                move(source, target, amount)
+
+        elapsed, errors = run_threads(worker, workers)
+
+        completed = MoneyTransfer.objects.count()
+        total = Account.objects.aggregate(total=Sum('balance'))['total']
+        # Every transfer must leave the pair's combined balance untouched, and
+        # each account's balance must match what its ledger legs imply.
+        drift = Decimal('0.00')
+        for account in Account.objects.all():
+            legs = Transaction.objects.filter(account=account)
+            credits = legs.filter(transaction_type='TRANSFER_IN').aggregate(s=Sum('amount'))['s'] or 0
+            debits = legs.filter(transaction_type='TRANSFER_OUT').aggregate(s=Sum('amount'))['s'] or 0
+            drift += abs(opening + credits - debits - account.balance)
+        self.stdout.write(
+            f'{mode:>6}: {workers} workers x {transfers} crossing transfers in {elapsed:.2f}s '
+            f'({completed / elapsed if elapsed else 0:.0f} transfers/s), '
+            f'completed={completed} errors={len(errors)} '
+            f'conserved={total == opening * 2} ledger_drift={drift}'
+        )
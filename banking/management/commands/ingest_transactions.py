@@ -0,0 +1,41 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from banking import ingestion
+
+
+class Command(BaseCommand):
+    help = 'Apply a settlement file of deposits and withdrawals (CSV, NDJSON or a JSON array).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Settlement file to ingest.')
+        parser.add_argument('--format', choices=['csv', 'ndjson', 'json'],
+                            help='File format (guessed from the content when omitted).')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Lines committed per transaction.')
+        parser.add_argument('--failures', help='Write per-line failures to this file as NDJSON.')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], 'rb') as f:
+                lines = ingestion.parse(f.read(), options['format'])
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Could not read {options["path"]}: {e}')
+        if not isinstance(lines, list):
+            raise CommandError('Expected a list of lines')
+
+        result = ingestion.ingest(lines, chunk_size=max(options['chunk_size'], 1))
+
+        if options['failures']:
+            with open(options['failures'], 'w') as f:
+                for failure in result.failures:
+                    f.write(json.dumps(failure) + '\n')
+        else:
+            for failure in result.failures[:20]:
+                self.stderr.write(f'line {failure["line"]}: {failure["error"]}')
+            if len(result.failures) > 20:
+                self.stderr.write(f'... and {len(result.failures) - 20} more')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Applied {result.applied} lines, {len(result.failures)} failed'
+        ))
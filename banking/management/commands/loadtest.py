@@ -0,0 +1,235 @@
+import http.client
+import json
+import random
+import sys
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from banking import ingestion
+from banking.benchmarks import PASSWORD, percentile, run_threads, scratch_database, seed_population, serve_wsgi
+
+DEFAULT_MIX = 'login=1,deposit=4,withdraw=3,transfer=3,list=6,statement=1'
+
+
+class Command(BaseCommand):
+    help = ('Seed a population into a scratch SQLite database, replay a weighted mix of API calls '
+            'from concurrent workers against the WSGI app over HTTP, and report throughput and '
+            'latency percentiles per endpoint as JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--holders', type=int, default=200, help='Account holders to seed.')
+        parser.add_argument('--accounts-per-holder', type=int, default=2)
+        parser.add_argument('--history', type=int, default=20, help='Ledger entries seeded per account.')
+        parser.add_argument('--workers', type=int, default=8, help='Concurrent clients.')
+        parser.add_argument('--duration', type=float, default=20.0, help='Seconds to run.')
+        parser.add_argument('--requests', type=int, default=0,
+                            help='Stop each worker after this many calls instead (0: use --duration).')
+        parser.add_argument('--mix', default=DEFAULT_MIX,
+                            help=f'Comma-separated endpoint=weight pairs (default: {DEFAULT_MIX}).')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the call sequence.')
+        parser.add_argument('--output', help='Append the JSON report as one line to this file.')
+
+    def handle(self, *args, **options):
+        mix = self.parse_mix(options['mix'])
+        with scratch_database():
+            started = time.perf_counter()
+            population = self.seed(options)
+            seeded = time.perf_counter() - started
+            with serve_wsgi() as address:
+                elapsed, samples, errors = self.run(address, population, mix, options)
+
+        report = self.report(options, mix, seeded, elapsed, samples, errors)
+        self.stdout.write(json.dumps(report, indent=2))
+        if options['output']:
+            with open(options['output'], 'a') as f:
+                f.write(json.dumps(report) + '\n')
+        for name, stats in report['endpoints'].items():
+            sys.stderr.write(
+                f'{name:>10}: {stats["requests"]:6d} req {stats["throughput"]:8.1f}/s '
+                f'p50={stats["p50_ms"]:7.1f}ms p95={stats["p95_ms"]:7.1f}ms p99={stats["p99_ms"]:7.1f}ms '
+                f'errors={stats["errors"]}\n'
+            )
+
+    def parse_mix(self, spec):
+        mix = {}
+        for part in spec.split(','):
+            name, _, weight = part.partition('=')
+            if name not in OPERATIONS:
+                raise CommandError(f'Unknown endpoint {name!r}; choose from {", ".join(OPERATIONS)}')
+            try:
+                mix[name] = float(weight or 1)
+            except ValueError:
+                raise CommandError(f'Bad weight for {name}: {weight!r}')
+        if not any(mix.values()):
+            raise CommandError('The mix needs at least one positive weight')
+        return mix
+
+    def seed(self, options):
+        population = seed_population('load', options['holders'], options['accounts_per_holder'],
+                                     balance=Decimal('1000.00'))
+        # History goes through ingestion so checkpoints and rollups exist too
+        lines = [
+            {'account': account_id, 'type': 'DEPOSIT' if n % 2 else 'WITHDRAWAL', 'amount': '1.00'}
+            for _, accounts in population for account_id in accounts for n in range(options['history'])
+        ]
+        if lines:
+            ingestion.ingest(lines)
+        return population
+
+    def run(self, address, population, mix, options):
+        names = list(mix)
+        weights = [mix[name] for name in names]
+        all_accounts = [account_id for _, accounts in population for account_id in accounts]
+        deadline = time.perf_counter() + options['duration']
+        samples = {name: [] for name in OPERATIONS}
+
+        def worker(index):
+            rng = random.Random(options['seed'] * 10007 + index)
+            session = Session(*address, *population[index % len(population)], all_accounts, rng)
+            session.call('login')
+            calls = 0
+            while True:
+                if options['requests'] and calls >= options['requests']:
+                    break
+                if not options['requests'] and time.perf_counter() >= deadline:
+                    break
+                name = rng.choices(names, weights)[0]
+                samples[name].append(session.call(name))
+                calls += 1
+            session.close()
+
+        elapsed, errors = run_threads(worker, options['workers'])
+        return elapsed, samples, errors
+
+    def report(self, options, mix, seeded, elapsed, samples, errors):
+        endpoints = {}
+        everything = []
+        for name, results in samples.items():
+            if not results:
+                continue
+            everything.extend(results)
+            endpoints[name] = self.stats(results, elapsed)
+        return {
+            'timestamp': timezone.now().isoformat(),
+            'config': {
+                'holders': options['holders'],
+                'accounts_per_holder': options['accounts_per_holder'],
+                'history': options['history'],
+                'workers': options['workers'],
+                'duration': options['duration'],
+                'requests': options['requests'],
+                'mix': mix,
+                'seed': options['seed'],
+            },
+            'seed_seconds': round(seeded, 2),
+            'elapsed_seconds': round(elapsed, 2),
+            'worker_errors': [repr(error) for error in errors],
+            'total': self.stats(everything, elapsed),
+            'endpoints': endpoints,
+        }
+
+    def stats(self, results, elapsed):
+        latencies = [latency for latency, _ in results]
+        statuses = {}
+        errors = 0
+        for _, status in results:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+            if status == 'error' or status >= 500:
+                errors += 1
+        return {
+            'requests': len(results),
+            'throughput': round(len(results) / elapsed, 1) if elapsed else 0.0,
+            'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+            'max_ms': round(max(latencies) * 1000, 2),
+            'errors': errors,
+            'statuses': statuses,
+        }
+
+
+class Session:
+    """One simulated client: a keep-alive HTTP connection and a logged-in holder."""
+
+    def __init__(self, host, port, username, accounts, all_accounts, rng):
+        self.connection = http.client.HTTPConnection(host, port, timeout=60)
+        self.username = username
+        self.accounts = accounts
+        self.all_accounts = all_accounts
+        self.rng = rng
+        self.token = None
+
+    def call(self, name):
+        """Run operation ``name``; returns ``(seconds, status)`` with status 'error' on I/O failure."""
+        method, path, body = OPERATIONS[name](self)
+        headers = {'Content-Type': 'application/json'}
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+        started = time.perf_counter()
+        try:
+            self.connection.request(method, path, body=json.dumps(body) if body is not None else None,
+                                    headers=headers)
+            response = self.connection.getresponse()
+            payload = response.read()
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            return time.perf_counter() - started, 'error'
+        latency = time.perf_counter() - started
+        if name == 'login' and response.status == 200:
+            self.token = json.loads(payload)['access']
+        return latency, response.status
+
+    def close(self):
+        self.connection.close()
+
+    def account(self):
+        return self.rng.choice(self.accounts)
+
+    def other_account(self, own):
+        while True:
+            account_id = self.rng.choice(self.all_accounts)
+            if account_id != own:
+                return account_id
+
+
+def _login(session):
+    return 'POST', '/api/auth/login/', {'username': session.username, 'password': PASSWORD}
+
+
+def _deposit(session):
+    return 'POST', f'/api/accounts/{session.account()}/deposit/', {'amount': '10.00'}
+
+
+def _withdraw(session):
+    return 'POST', f'/api/accounts/{session.account()}/withdraw/', {'amount': '5.00'}
+
+
+def _transfer(session):
+    own = session.account()
+    return 'POST', '/api/transfers/', {
+        'from_account': own, 'to_account': session.other_account(own), 'amount': '1.00'
+    }
+
+
+def _list(session):
+    return 'GET', f'/api/accounts/{session.account()}/transactions/', None
+
+
+def _statement(session):
+    today = timezone.localdate().isoformat()
+    return 'POST', f'/api/accounts/{session.account()}/generate-statement/', {
+        'start_date': today, 'end_date': today
+    }
+
+
+OPERATIONS = {
+    'login': _login,
+    'deposit': _deposit,
+    'withdraw': _withdraw,
+    'transfer': _transfer,
+    'list': _list,
+    'statement': _statement,
+}
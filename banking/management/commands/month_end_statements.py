@@ -0,0 +1,97 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from banking import ledger, sharding, statements
+from banking.models import Account
+
+
+def _generate(start_id, end_id, start_date, end_date):
+    """Process-pool entry point: one account-id range, on its shard, in its own transaction."""
+    with sharding.using(sharding.shard_for_account(start_id)):
+        return ledger.with_retries(statements.generate_range, start_id, end_id, start_date, end_date)
+
+
+class Command(BaseCommand):
+    help = ('Issue every account\'s statement for a period, sharding account-id ranges across '
+            'a process pool. Rerun to resume: ranges that already committed are skipped.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', help='Statement month as YYYY-MM (default: last month).')
+        parser.add_argument('--start-date', help='Period start as YYYY-MM-DD (with --end-date, instead of --month).')
+        parser.add_argument('--end-date', help='Period end as YYYY-MM-DD.')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Account ids per range.')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Worker processes (1 runs in this process).')
+        parser.add_argument('--from-id', type=int, default=None, help='Skip accounts below this id.')
+
+    def handle(self, *args, **options):
+        start_date, end_date = self.period(options)
+        chunk_size = max(options['chunk_size'], 1)
+        ranges = []
+        # Account ids name their shard, so every range stays on one shard
+        for alias in sharding.shards():
+            bounds = Account.objects.using(alias).aggregate(low=Min('id'), high=Max('id'))
+            if bounds['low'] is None:
+                continue
+            low = max(bounds['low'], options['from_id'] or 0)
+            ranges += [(start, min(start + chunk_size, bounds['high'] + 1))
+                       for start in range(low, bounds['high'] + 1, chunk_size)]
+        if not ranges:
+            self.stdout.write('No accounts')
+            return
+        self.stdout.write(f'Statements for {start_date} to {end_date}: {len(ranges)} ranges of {chunk_size} ids')
+
+        started = time.perf_counter()
+        self.issued = self.lines = self.done = 0
+        self.last_report = started
+        if options['workers'] <= 1:
+            for start, end in ranges:
+                self.progress(started, len(ranges), *_generate(start, end, start_date, end_date))
+        else:
+            # Children must open their own connections rather than share ours
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+                futures = [pool.submit(_generate, start, end, start_date, end_date) for start, end in ranges]
+                for future in as_completed(futures):
+                    self.progress(started, len(ranges), *future.result())
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Issued {self.issued} statements with {self.lines} lines in {elapsed:.1f}s '
+            f'({self.issued / elapsed if elapsed else 0:.0f} accounts/s)'
+        ))
+
+    def period(self, options):
+        try:
+            if options['start_date'] or options['end_date']:
+                if not (options['start_date'] and options['end_date']):
+                    raise CommandError('--start-date and --end-date go together')
+                return (datetime.strptime(options['start_date'], '%Y-%m-%d').date(),
+                        datetime.strptime(options['end_date'], '%Y-%m-%d').date())
+            if options['month']:
+                first = datetime.strptime(options['month'], '%Y-%m').date()
+            else:
+                first = (timezone.localdate().replace(day=1) - timedelta(days=1)).replace(day=1)
+        except ValueError as e:
+            raise CommandError(str(e))
+        following = (first.replace(day=28) + timedelta(days=4)).replace(day=1)
+        return first, following - timedelta(days=1)
+
+    def progress(self, started, total, issued, lines):
+        self.issued += issued
+        self.lines += lines
+        self.done += 1
+        now = time.perf_counter()
+        if now - self.last_report >= 5 or self.done == total:
+            self.last_report = now
+            self.stdout.write(
+                f'{self.done}/{total} ranges, {self.issued} statements '
+                f'({self.issued / (now - started) if now > started else 0:.0f} accounts/s)'
+            )
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from banking import idempotency
+
+
+class Command(BaseCommand):
+    help = 'Delete Idempotency-Key records older than BANKING_IDEMPOTENCY_TTL.'
+
+    def handle(self, *args, **options):
+        deleted = idempotency.purge()
+        self.stdout.write(self.style.SUCCESS(f'Purged {deleted} expired idempotency keys'))
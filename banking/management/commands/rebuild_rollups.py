@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from banking import rollups, sharding
+from banking.models import Account
+
+
+class Command(BaseCommand):
+    help = 'Reconcile daily per-type rollups with the raw ledger, a chunk of accounts at a time.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=200, help='Accounts reconciled per transaction.')
+        parser.add_argument('--account', type=int, action='append', dest='accounts',
+                            help='Only reconcile this account id (repeatable).')
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without rewriting rollups.')
+
+    def handle(self, *args, **options):
+        chunk_size = max(options['chunk_size'], 1)
+        drifted = total = 0
+        # Each shard's accounts, on that shard
+        for alias in sharding.shards():
+            account_ids = Account.objects.using(alias).order_by('id').values_list('id', flat=True)
+            if options['accounts']:
+                account_ids = account_ids.filter(id__in=options['accounts'])
+            account_ids = list(account_ids)
+            total += len(account_ids)
+            with sharding.using(alias):
+                for start in range(0, len(account_ids), chunk_size):
+                    chunk = account_ids[start:start + chunk_size]
+                    drifted += rollups.reconcile(chunk, fix=not options['dry_run'])
+                    self.stdout.write(f'{alias}: {start + len(chunk)}/{len(account_ids)} accounts')
+
+        verb = 'Found' if options['dry_run'] else 'Repaired'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {drifted} drifted rollups across {total} accounts'
+        ))
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from banking import ledger
+
+
+class Command(BaseCommand):
+    help = ('Deliver cross-shard transfers still queued in the shards\' outboxes. Runs once, '
+            'or every --interval seconds until interrupted.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Seconds between passes (0: one pass and exit).')
+        parser.add_argument('--limit', type=int, default=500, help='Messages per shard per pass.')
+
+    def handle(self, *args, **options):
+        while True:
+            delivered, failed = ledger.relay(limit=options['limit'])
+            if delivered or failed or options['interval'] <= 0:
+                self.stdout.write(f'delivered {delivered}, failed {failed}')
+            if options['interval'] <= 0:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from banking import routing
+
+
+class Command(BaseCommand):
+    help = ('Copy each primary SQLite database over its read replica: a local stand-in for real '
+            'replication. Runs once, or every --interval seconds until interrupted.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Seconds between copies (0: copy once and exit).')
+
+    def handle(self, *args, **options):
+        if not routing.replicas():
+            raise CommandError('No replica configured; set BANKING_REPLICA_PATH or BANKING_LEDGER_REPLICA_PATH')
+        while True:
+            elapsed = routing.replicate()
+            self.stdout.write(f'replicas synced in {elapsed * 1000:.0f}ms')
+            if options['interval'] <= 0:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,228 @@
+"""
+Per-endpoint request and database metrics in Prometheus text format.
+
+``MetricsMiddleware`` times every request and, through an
+``execute_wrapper`` on each database connection, counts the queries it runs
+and the time spent in them. Results are filed under the URL name the request
+resolved to (``'admin:index'``, ``'transactions'``), never the raw path, so
+the number of series stays bounded.
+
+Recording is lock-free: each thread adds into its own shard, and only a
+scrape of ``/metrics`` walks the shards and sums them. The scrape therefore
+never blocks a request, at the cost of possibly missing a request that is
+being recorded at that instant. When a thread exits its shard is folded into
+a retired total, so servers that start a thread per request (runserver,
+``ThreadedWSGIServer``) keep one shard per live thread rather than one per
+request ever served.
+
+Streaming responses (the CSV/NDJSON exports) are recorded when the view
+returns: their size is unknown and the queries run while streaming are not
+counted.
+"""
+import bisect
+import threading
+import time
+import weakref
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import Http404, HttpResponse
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds; the Prometheus client defaults
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+UNMATCHED = 'unmatched'
+
+
+class Series:
+    """Everything recorded for one (endpoint, method)."""
+    __slots__ = ('buckets', 'count', 'seconds', 'statuses', 'queries', 'query_seconds', 'response_bytes')
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.seconds = 0.0
+        self.statuses = {}
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.response_bytes = 0
+
+    def observe(self, status, seconds, queries, query_seconds, response_bytes):
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.seconds += seconds
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.queries += queries
+        self.query_seconds += query_seconds
+        self.response_bytes += response_bytes
+
+    def merge(self, other):
+        for index, count in enumerate(other.buckets):
+            self.buckets[index] += count
+        self.count += other.count
+        self.seconds += other.seconds
+        for status, count in list(other.statuses.items()):
+            self.statuses[status] = self.statuses.get(status, 0) + count
+        self.queries += other.queries
+        self.query_seconds += other.query_seconds
+        self.response_bytes += other.response_bytes
+
+
+class _Owner:
+    """Lives in a thread's local storage; its collection marks the thread's exit."""
+
+
+def _merge_into(merged, shard):
+    for key, series in list(shard.items()):
+        merged.setdefault(key, Series()).merge(series)
+
+
+class Registry:
+    """Per-thread shards of {(endpoint, method): Series}, summed on read."""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []
+        self._retired = {}  # the merged shards of threads that have exited
+        self._lock = threading.Lock()  # guards the shard list, taken once per thread
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            self._local.owner = _Owner()
+            with self._lock:
+                self._shards.append(shard)
+            weakref.finalize(self._local.owner, self._retire, shard)
+        return shard
+
+    def _retire(self, shard):
+        with self._lock:
+            self._shards = [other for other in self._shards if other is not shard]
+            _merge_into(self._retired, shard)
+
+    def observe(self, endpoint, method, status, seconds, queries=0, query_seconds=0.0, response_bytes=0):
+        shard = self._shard()
+        series = shard.get((endpoint, method))
+        if series is None:
+            series = shard[(endpoint, method)] = Series()
+        series.observe(status, seconds, queries, query_seconds, response_bytes)
+
+    def snapshot(self):
+        """Return the merged {(endpoint, method): Series} across all threads."""
+        merged = {}
+        with self._lock:
+            shards = list(self._shards)
+            _merge_into(merged, self._retired)
+        for shard in shards:
+            _merge_into(merged, shard)
+        return merged
+
+    def clear(self):
+        with self._lock:
+            self._retired.clear()
+            for shard in self._shards:
+                shard.clear()
+
+
+registry = Registry()
+
+
+def _labels(endpoint, method, **extra):
+    pairs = [('endpoint', endpoint), ('method', method)] + list(extra.items())
+    return '{%s}' % ','.join('%s="%s"' % (name, str(value).replace('\\', r'\\').replace('"', r'\"'))
+                             for name, value in pairs)
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(snapshot=None):
+    """The registry (or ``snapshot``) in Prometheus text exposition format."""
+    snapshot = registry.snapshot() if snapshot is None else snapshot
+    keys = sorted(snapshot)
+    lines = [
+        '# HELP banking_http_request_duration_seconds Request latency by URL name.',
+        '# TYPE banking_http_request_duration_seconds histogram',
+    ]
+    for key in keys:
+        series = snapshot[key]
+        cumulative = 0
+        for bound, count in zip(BUCKETS + ('+Inf',), series.buckets):
+            cumulative += count
+            lines.append('banking_http_request_duration_seconds_bucket%s %d' % (
+                _labels(*key, le=bound), cumulative))
+        lines.append('banking_http_request_duration_seconds_sum%s %s' % (_labels(*key), _number(series.seconds)))
+        lines.append('banking_http_request_duration_seconds_count%s %d' % (_labels(*key), series.count))
+
+    lines += [
+        '# HELP banking_http_requests_total Requests by URL name and response status.',
+        '# TYPE banking_http_requests_total counter',
+    ]
+    for key in keys:
+        for status, count in sorted(snapshot[key].statuses.items()):
+            lines.append('banking_http_requests_total%s %d' % (_labels(*key, status=status), count))
+
+    for name, attribute, help_text in (
+        ('banking_http_response_bytes_total', 'response_bytes', 'Response body bytes (not counting streams).'),
+        ('banking_db_queries_total', 'queries', 'Database queries issued by requests.'),
+        ('banking_db_query_seconds_total', 'query_seconds', 'Time requests spent in database queries.'),
+    ):
+        lines += ['# HELP %s %s' % (name, help_text), '# TYPE %s counter' % name]
+        for key in keys:
+            lines.append('%s%s %s' % (name, _labels(*key), _number(getattr(snapshot[key], attribute))))
+    return '\n'.join(lines) + '\n'
+
+
+class _QueryTimer:
+    """``execute_wrapper`` that counts a request's queries and their time."""
+    __slots__ = ('queries', 'seconds')
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.queries += 1
+
+
+class MetricsMiddleware:
+    """Record latency, status, size and database work per URL name."""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'BANKING_METRICS_ENABLED', True):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = _QueryTimer()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        endpoint = match.view_name if match is not None and match.view_name else UNMATCHED
+        size = 0 if response.streaming else len(response.content)
+        registry.observe(endpoint, request.method, response.status_code, elapsed,
+                         timer.queries, timer.seconds, size)
+        return response
+
+
+def metrics_view(request):
+    """Serve ``render()`` to addresses in ``INTERNAL_IPS``; everyone else gets a 404."""
+    if request.META.get('REMOTE_ADDR') not in getattr(settings, 'INTERNAL_IPS', ()):
+        raise Http404()
+    return HttpResponse(render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-17 04:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('banking', '0002_transaction_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='moneytransfer',
+            index=models.Index(fields=['from_account', 'created_at'], name='banking_trf_from_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='moneytransfer',
+            index=models.Index(fields=['to_account', 'created_at'], name='banking_trf_to_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='statement',
+            index=models.Index(fields=['account', 'generated_at'], name='banking_stmt_acct_gen_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['account', 'transaction_type', 'created_at', 'amount'], name='banking_txn_acct_type_idx'),
+        ),
+    ]
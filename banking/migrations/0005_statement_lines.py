@@ -0,0 +1,78 @@
+# Generated by Django 4.2.7 on 2026-10-17 04:35
+
+from datetime import datetime, time, timedelta
+
+from django.db import migrations, models
+from django.utils import timezone
+import django.db.models.deletion
+
+
+def freeze_existing_statements(apps, schema_editor):
+    """Give statements generated before this migration the lines they used to query for."""
+    Statement = apps.get_model('banking', 'Statement')
+    StatementLine = apps.get_model('banking', 'StatementLine')
+    Transaction = apps.get_model('banking', 'Transaction')
+
+    for statement in Statement.objects.iterator():
+        start = timezone.make_aware(datetime.combine(statement.statement_period_start, time.min))
+        end = timezone.make_aware(datetime.combine(statement.statement_period_end + timedelta(days=1), time.min))
+        entries = Transaction.objects.filter(
+            account_id=statement.account_id, created_at__gte=start, created_at__lt=end
+        ).order_by('created_at', 'id')
+        lines = [
+            StatementLine(
+                statement_id=statement.id,
+                position=position,
+                entry_id=entry.id,
+                transaction_id=entry.transaction_id,
+                transaction_type=entry.transaction_type,
+                amount=entry.amount,
+                description=entry.description,
+                reference_number=entry.reference_number,
+                balance_after=entry.balance_after,
+                created_at=entry.created_at
+            )
+            for position, entry in enumerate(entries)
+        ]
+        StatementLine.objects.bulk_create(lines, batch_size=1000)
+        Statement.objects.filter(id=statement.id).update(line_count=len(lines))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('banking', '0004_daily_balance_checkpoints'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='statement',
+            name='line_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='StatementLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField()),
+                ('transaction_id', models.CharField(max_length=20)),
+                ('transaction_type', models.CharField(choices=[('DEPOSIT', 'Deposit'), ('WITHDRAWAL', 'Withdrawal'), ('TRANSFER_IN', 'Transfer In'), ('TRANSFER_OUT', 'Transfer Out')], max_length=12)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('description', models.TextField(blank=True)),
+                ('reference_number', models.CharField(blank=True, max_length=50)),
+                ('balance_after', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('created_at', models.DateTimeField()),
+                ('entry', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='statement_lines', to='banking.transaction')),
+                ('statement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='banking.statement')),
+            ],
+            options={
+                'ordering': ['position'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='statementline',
+            constraint=models.UniqueConstraint(fields=('statement', 'position'), name='banking_stmt_line_unique'),
+        ),
+        migrations.RunPython(freeze_existing_statements, migrations.RunPython.noop,
+                             hints={'model_name': 'statementline'}),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 05:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('banking', '0007_daily_rollups'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='statement',
+            index=models.Index(fields=['statement_period_start', 'statement_period_end', 'account'], name='banking_stmt_period_idx'),
+        ),
+    ]
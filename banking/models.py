@@ -3,8 +3,11 @@ from django.db import models
 # Create your models here.
 from django.db import models
 from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinValueValidator
+from django.utils import timezone
 from decimal import Decimal
+from datetime import datetime, time, timedelta
 import uuid
 
 class AccountHolder(models.Model):
@@ -26,12 +29,16 @@ class Account(models.Model):
     ]
 
     account_number = models.CharField(max_length=20, unique=True)
-    account_holder = models.ForeignKey(AccountHolder, on_delete=models.CASCADE, related_name='accounts')
+    # Holders stay on the default database while accounts live on their shard
+    account_holder = models.ForeignKey(AccountHolder, on_delete=models.CASCADE, related_name='accounts',
+                                       db_constraint=False)
     account_type = models.CharField(max_length=10, choices=ACCOUNT_TYPES)
     balance = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Bumped by every ledger posting and statement; see banking.conditional
+    version = models.PositiveBigIntegerField(default=0)
 
     def save(self, *args, **kwargs):
         if not self.account_number:
@@ -41,6 +48,24 @@ class Account(models.Model):
     def __str__(self):
         return f"{self.account_number} - {self.account_holder}"
 
+class TransactionQuerySet(models.QuerySet):
+    def in_period(self, start_date, end_date):
+        """
+        Transactions created on ``start_date`` through ``end_date`` inclusive.
+
+        Filters on a half-open datetime range rather than ``created_at__date``
+        so the comparison can use the created_at indexes.
+        """
+        start, end = self.period_bounds(start_date, end_date)
+        return self.filter(created_at__gte=start, created_at__lt=end)
+
+    @staticmethod
+    def period_bounds(start_date, end_date):
+        """The aware ``[start, end)`` datetimes covering ``start_date`` through ``end_date``."""
+        start = timezone.make_aware(datetime.combine(start_date, time.min))
+        end = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min))
+        return start, end
+
 class Transaction(models.Model):
     TRANSACTION_TYPES = [
         ('DEPOSIT', 'Deposit'),
@@ -48,6 +73,8 @@ class Transaction(models.Model):
         ('TRANSFER_IN', 'Transfer In'),
         ('TRANSFER_OUT', 'Transfer Out'),
     ]
+    CREDIT_TYPES = ('DEPOSIT', 'TRANSFER_IN')
+    DEBIT_TYPES = ('WITHDRAWAL', 'TRANSFER_OUT')
 
     transaction_id = models.CharField(max_length=20, unique=True)
     account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='transactions')
@@ -58,9 +85,15 @@ class Transaction(models.Model):
     balance_after = models.DecimalField(max_digits=12, decimal_places=2)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = TransactionQuerySet.as_manager()
+
+    @staticmethod
+    def generate_transaction_id():
+        return f"TXN{uuid.uuid4().hex[:10].upper()}"
+
     def save(self, *args, **kwargs):
         if not self.transaction_id:
-            self.transaction_id = f"TXN{uuid.uuid4().hex[:10].upper()}"
+            self.transaction_id = self.generate_transaction_id()
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -68,6 +101,13 @@ class Transaction(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of an account's ledger
+            models.Index(fields=['account', 'created_at', 'id'], name='banking_txn_acct_created_idx'),
+            # Per-type period totals; carries amount so SUMs never touch the table
+            models.Index(fields=['account', 'transaction_type', 'created_at', 'amount'],
+                         name='banking_txn_acct_type_idx'),
+        ]
 
 class MoneyTransfer(models.Model):
     STATUS_CHOICES = [
@@ -77,22 +117,35 @@ class MoneyTransfer(models.Model):
     ]
 
     transfer_id = models.CharField(max_length=20, unique=True)
-    from_account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='outgoing_transfers')
-    to_account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='incoming_transfers')
+    # Either side may be an account on another shard
+    from_account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='outgoing_transfers',
+                                     db_constraint=False)
+    to_account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='incoming_transfers',
+                                   db_constraint=False)
     amount = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0.01)])
     description = models.TextField(blank=True)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
     created_at = models.DateTimeField(auto_now_add=True)
     completed_at = models.DateTimeField(null=True, blank=True)
 
+    @staticmethod
+    def generate_transfer_id():
+        return f"TRF{uuid.uuid4().hex[:10].upper()}"
+
     def save(self, *args, **kwargs):
         if not self.transfer_id:
-            self.transfer_id = f"TRF{uuid.uuid4().hex[:10].upper()}"
+            self.transfer_id = self.generate_transfer_id()
         super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.transfer_id} - {self.amount}"
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['from_account', 'created_at'], name='banking_trf_from_created_idx'),
+            models.Index(fields=['to_account', 'created_at'], name='banking_trf_to_created_idx'),
+        ]
+
 class Card(models.Model):
     CARD_TYPES = [
         ('DEBIT', 'Debit'),
@@ -125,6 +178,7 @@ class Statement(models.Model):
     closing_balance = models.DecimalField(max_digits=12, decimal_places=2)
     total_deposits = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
     total_withdrawals = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
+    line_count = models.PositiveIntegerField(default=0)
     generated_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -132,3 +186,112 @@ class Statement(models.Model):
 
     class Meta:
         ordering = ['-generated_at']
+        indexes = [
+            models.Index(fields=['account', 'generated_at'], name='banking_stmt_acct_gen_idx'),
+            # Month-end runs look up which accounts already have the period's statement
+            models.Index(fields=['statement_period_start', 'statement_period_end', 'account'],
+                         name='banking_stmt_period_idx'),
+        ]
+
+class StatementLine(models.Model):
+    """A transaction as it stood when its statement was generated."""
+    statement = models.ForeignKey(Statement, on_delete=models.CASCADE, related_name='lines')
+    position = models.PositiveIntegerField()
+    entry = models.ForeignKey(Transaction, on_delete=models.SET_NULL, null=True, related_name='statement_lines')
+    transaction_id = models.CharField(max_length=20)
+    transaction_type = models.CharField(max_length=12, choices=Transaction.TRANSACTION_TYPES)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    description = models.TextField(blank=True)
+    reference_number = models.CharField(max_length=50, blank=True)
+    balance_after = models.DecimalField(max_digits=12, decimal_places=2)
+    created_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.transaction_id} (statement {self.statement_id} line {self.position})"
+
+    class Meta:
+        ordering = ['position']
+        constraints = [
+            models.UniqueConstraint(fields=['statement', 'position'], name='banking_stmt_line_unique'),
+        ]
+
+class DailyBalance(models.Model):
+    """End-of-day checkpoint of an account, maintained on every ledger write."""
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='daily_balances')
+    date = models.DateField()
+    closing_balance = models.DecimalField(max_digits=12, decimal_places=2)
+    total_deposits = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
+    total_withdrawals = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
+
+    @property
+    def opening_balance(self):
+        return self.closing_balance - self.total_deposits + self.total_withdrawals
+
+    def __str__(self):
+        return f"{self.account.account_number} - {self.date}: {self.closing_balance}"
+
+    class Meta:
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['account', 'date'], name='banking_daily_balance_unique'),
+        ]
+
+class DailyRollup(models.Model):
+    """Count and sum of one account's postings of one type on one day, maintained on every ledger write."""
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='daily_rollups')
+    date = models.DateField()
+    transaction_type = models.CharField(max_length=12, choices=Transaction.TRANSACTION_TYPES)
+    count = models.PositiveIntegerField(default=0)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0.00)
+
+    def __str__(self):
+        return f"{self.account_id} - {self.date} {self.transaction_type}: {self.count} / {self.total}"
+
+    class Meta:
+        ordering = ['date', 'transaction_type']
+        constraints = [
+            models.UniqueConstraint(fields=['account', 'date', 'transaction_type'],
+                                    name='banking_daily_rollup_unique'),
+        ]
+
+class IdempotencyKey(models.Model):
+    """A client-supplied Idempotency-Key and the response it first produced."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)  # null while in progress
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.user_id}:{self.key}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='banking_idempotency_key_unique'),
+        ]
+
+class OutboxMessage(models.Model):
+    """The credit leg of a cross-shard transfer, committed with its debit and delivered afterwards."""
+    message_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.message_id} - {self.payload.get('transfer_id')}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['delivered_at', 'id'], name='banking_outbox_pending_idx'),
+        ]
+
+class InboxMessage(models.Model):
+    """An outbox message already applied on this shard, so redelivering it is a no-op."""
+    message_id = models.UUIDField(unique=True)
+    applied = models.BooleanField()  # False when the credit was rejected and the sender refunds
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.message_id} - {'applied' if self.applied else 'rejected'}"
@@ -0,0 +1,233 @@
+"""
+Keyset pagination for append-only ledgers.
+
+``PageNumberPagination`` pays for a ``COUNT(*)`` and an ``OFFSET`` scan that
+grows with page depth. Keyset pagination instead remembers the
+``(created_at, id)`` of the last row served and asks for the rows strictly
+after it, so every page is one bounded index range scan.
+"""
+import base64
+import json
+
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Newest-first pagination keyed on ``(created_at, id)``.
+
+    Cursors are opaque url-safe tokens carrying the boundary row's key and the
+    direction to read in. Requires an index on the filter columns followed by
+    ``(created_at, id)`` to stay constant-cost.
+    """
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self._finish_page(list(self._page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """``paginate_queryset`` through the async ORM."""
+        return self._finish_page([row async for row in self._page_queryset(queryset, request)])
+
+    def _page_queryset(self, queryset, request):
+        self.base_url = request.build_absolute_uri()
+        position, reverse = self.decode_cursor(request)
+        self.position, self.reverse = position, reverse
+
+        if reverse:
+            queryset = queryset.order_by('created_at', 'id')
+        else:
+            queryset = queryset.order_by('-created_at', '-id')
+
+        if position is not None:
+            created_at, pk = position
+            # Written as a range on created_at plus a tie-break so the planner
+            # can keep using the (account, created_at, id) index.
+            if reverse:
+                queryset = queryset.filter(created_at__gte=created_at).exclude(
+                    Q(created_at=created_at) & Q(id__lte=pk)
+                )
+            else:
+                queryset = queryset.filter(created_at__lte=created_at).exclude(
+                    Q(created_at=created_at) & Q(id__gte=pk)
+                )
+        return queryset[:self.page_size + 1]
+
+    def _finish_page(self, rows):
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.reverse:
+            rows.reverse()
+            self.has_next = self.position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.position is not None
+        self.page = rows
+        return rows
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        last = self.page[-1]
+        return self.encode_cursor(last.created_at, last.pk, reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        first = self.page[0]
+        return self.encode_cursor(first.created_at, first.pk, reverse=True)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            data = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+            created_at = parse_datetime(data['c'])
+            pk = int(data['i'])
+            reverse = bool(data.get('r'))
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return (created_at, pk), reverse
+
+    def encode_cursor(self, created_at, pk, reverse):
+        data = {'c': created_at.isoformat(), 'i': pk}
+        if reverse:
+            data['r'] = 1
+        token = base64.urlsafe_b64encode(json.dumps(data, separators=(',', ':')).encode('ascii'))
+        return replace_query_param(self.base_url, self.cursor_query_param,
+                                   token.decode('ascii').rstrip('='))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+
+class AsyncPageNumberPagination(PageNumberPagination):
+    """``PageNumberPagination`` that can also page through the async ORM."""
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        # Prime the paginator's cached count so page() never queries synchronously.
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+        self.page.object_list = [row async for row in self.page.object_list]
+
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        self.request = request
+        return list(self.page)
+
+
+class LedgerPagination(KeysetPagination):
+    """
+    Keyset pagination that falls back to page numbers for older clients.
+
+    Requests carrying ``?page=`` keep getting ``PageNumberPagination``
+    responses (with ``count``); everything else is paged by cursor.
+    """
+    legacy_class = AsyncPageNumberPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.legacy = None
+        if self.legacy_class.page_query_param in request.query_params:
+            self.legacy = self.legacy_class()
+            return self.legacy.paginate_queryset(queryset.order_by('-created_at', '-id'),
+                                                 request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        self.legacy = None
+        if self.legacy_class.page_query_param in request.query_params:
+            self.legacy = self.legacy_class()
+            return await self.legacy.apaginate_queryset(queryset.order_by('-created_at', '-id'),
+                                                        request, view)
+        return await super().apaginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.legacy is not None:
+            return self.legacy.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class PositionPagination(BasePagination):
+    """
+    Forward-only keyset pagination over a dense ``position`` column.
+
+    Used for statement lines, whose order is fixed when the statement is
+    generated, so ``?after=<position>`` is all a client needs to resume.
+    """
+    page_size = api_settings.PAGE_SIZE
+    after_query_param = 'after'
+    invalid_position_message = 'Invalid position'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        after = request.query_params.get(self.after_query_param)
+        queryset = queryset.order_by('position')
+        if after is not None:
+            try:
+                queryset = queryset.filter(position__gt=int(after))
+            except ValueError:
+                raise NotFound(self.invalid_position_message)
+
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(self.base_url, self.after_query_param, self.page[-1].position)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
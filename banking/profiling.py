@@ -0,0 +1,193 @@
+"""
+On-demand request profiling.
+
+``ProfilingMiddleware`` runs a request under ``cProfile`` when it is sampled
+(``BANKING_PROFILE_SAMPLE_RATE``, 0.0 to 1.0) or when a staff user's request
+carries an ``X-Profile-Request`` header. Each profile is written to
+``BANKING_PROFILE_DIR`` as a ``.prof`` file loadable by ``pstats`` or
+snakeviz, plus a ``.json`` file with the request, the hottest functions and
+every SQL statement executed with its timing. Statements are logged with
+their placeholders only: parameter values carry password hashes, balances and
+holders' personal details, and the files outlive the request. Only the newest
+``BANKING_PROFILE_KEEP`` profiles are kept.
+
+Staff browse and download them at ``/admin/profiles/``. With
+``BANKING_PROFILE_ENABLED`` off the middleware removes itself from the stack,
+so it costs nothing.
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import re
+import time
+import uuid
+from contextlib import ExitStack
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import FileResponse, Http404
+from django.template.response import TemplateResponse
+from rest_framework.exceptions import APIException
+
+from .authentication import StatelessHolderAuthentication, is_staff
+
+HEADER = 'HTTP_X_PROFILE_REQUEST'
+RESPONSE_HEADER = 'X-Profile-Id'
+TOP_FUNCTIONS = 30
+
+_NAME = re.compile(r'^[0-9]{8}T[0-9]{12}-[0-9a-f]{8}\.(prof|json)$')
+
+
+def profile_dir():
+    return str(getattr(settings, 'BANKING_PROFILE_DIR', os.path.join(settings.BASE_DIR, 'profiles')))
+
+
+class _QueryLog:
+    """``execute_wrapper`` that keeps every statement a request runs, without its parameter values."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'alias': context['connection'].alias,
+                'sql': sql,
+                'param_count': None if many else len(params or ()),
+                'many': many,
+                'ms': round((time.perf_counter() - started) * 1000, 3),
+            })
+
+
+def _is_staff_request(request):
+    # The middleware runs before DRF authenticates, so check the bearer token here.
+    try:
+        result = StatelessHolderAuthentication().authenticate(request)
+    except APIException:
+        return False
+    return result is not None and is_staff(result[0])
+
+
+class ProfilingMiddleware:
+    """Profile sampled or explicitly requested requests and save the results."""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'BANKING_PROFILE_ENABLED', False):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'BANKING_PROFILE_SAMPLE_RATE', 0.0)
+        self.keep = getattr(settings, 'BANKING_PROFILE_KEEP', 100)
+
+    def __call__(self, request):
+        if HEADER in request.META:
+            if _is_staff_request(request):
+                response, profile_id = self.profile(request)
+                if profile_id:
+                    # Only explicit requests learn where their profile went
+                    response[RESPONSE_HEADER] = profile_id
+                return response
+        elif self.sample_rate > 0 and random.random() < self.sample_rate:
+            return self.profile(request)[0]
+        return self.get_response(request)
+
+    def profile(self, request):
+        """Run the request under cProfile; returns ``(response, profile id or None)``."""
+        log = _QueryLog()
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(log))
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another profiler (e.g. a debugger) owns the hook
+                return self.get_response(request), None
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        elapsed = time.perf_counter() - started
+
+        stem = '%s-%s' % (datetime.now(dt_timezone.utc).strftime('%Y%m%dT%H%M%S%f'), uuid.uuid4().hex[:8])
+        match = getattr(request, 'resolver_match', None)
+        summary = io.StringIO()
+        pstats.Stats(profiler, stream=summary).sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+        directory = profile_dir()
+        os.makedirs(directory, exist_ok=True)
+        profiler.dump_stats(os.path.join(directory, stem + '.prof'))
+        with open(os.path.join(directory, stem + '.json'), 'w') as f:
+            json.dump({
+                'id': stem,
+                'method': request.method,
+                'path': request.get_full_path(),
+                'endpoint': match.view_name if match is not None else None,
+                'status': response.status_code,
+                'ms': round(elapsed * 1000, 3),
+                'query_count': len(log.queries),
+                'query_ms': round(sum(query['ms'] for query in log.queries), 3),
+                'queries': log.queries,
+                'top': summary.getvalue(),
+            }, f, indent=1)
+        rotate(directory, self.keep)
+        return response, stem
+
+
+def rotate(directory, keep):
+    """Delete all but the newest ``keep`` profiles in ``directory``."""
+    stems = sorted({name.rsplit('.', 1)[0] for name in os.listdir(directory) if _NAME.match(name)})
+    for stem in stems[:max(len(stems) - keep, 0)]:
+        for suffix in ('.prof', '.json'):
+            try:
+                os.remove(os.path.join(directory, stem + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def saved_profiles():
+    """Summaries of the saved profiles, newest first."""
+    directory = profile_dir()
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(directory), reverse=True):
+        if not (_NAME.match(name) and name.endswith('.json')):
+            continue
+        try:
+            with open(os.path.join(directory, name)) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        data.pop('queries', None)
+        profiles.append(data)
+    return profiles
+
+
+@staff_member_required
+def profile_list(request):
+    return TemplateResponse(request, 'admin/banking/profiles.html', {
+        **admin.site.each_context(request),
+        'title': 'Request profiles',
+        'profiles': saved_profiles(),
+        'directory': profile_dir(),
+    })
+
+
+@staff_member_required
+def profile_download(request, name):
+    if not _NAME.match(name):
+        raise Http404()
+    path = os.path.join(profile_dir(), name)
+    if not os.path.isfile(path):
+        raise Http404()
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=name)
@@ -0,0 +1,184 @@
+"""
+Daily per-account, per-type rollups.
+
+The ledger calls ``record`` for every posting, which folds the new entries
+into one ``DailyRollup`` row per (account, day, transaction type) holding the
+count and sum of those postings. Analytics over any range, such as monthly
+deposits, withdrawals and net flow, then read at most a few rows per day
+instead of scanning raw ``Transaction`` rows. ``reconcile`` recomputes the
+rollups from the raw ledger and rewrites the accounts that drifted.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import CharField, F, Sum, Value
+from django.db.models.functions import Cast, Substr
+from django.utils import timezone
+
+from . import sharding
+from .models import DailyRollup, Transaction
+
+ZERO = Decimal('0.00')
+CENT = Decimal('0.01')
+
+GROUPS = ('day', 'month', 'year', 'total')
+
+# Length of the ISO date prefix that names each period ('2024-01' for a month)
+PERIOD_LENGTHS = {'day': 10, 'month': 7, 'year': 4}
+
+
+def _fold(entries):
+    """Fold ledger entries into {(account_id, day, transaction_type): [count, total]}."""
+    rollups = defaultdict(lambda: [0, ZERO])
+    for entry in entries:
+        key = (entry.account_id, timezone.localdate(entry.created_at), entry.transaction_type)
+        rollup = rollups[key]
+        rollup[0] += 1
+        rollup[1] += entry.amount
+    return rollups
+
+
+def record(entries):
+    """
+    Add freshly written ledger entries to their rollups.
+
+    Runs in the posting's transaction. One upsert statement covers every key
+    the posting touched (up to the backend's parameter limit), so a transfer
+    costs a single extra query.
+    """
+    rollups = _fold(entries)
+    if not rollups:
+        return
+    connection = sharding.connection()
+    if not connection.features.supports_update_conflicts_with_target:
+        _record_each(rollups)
+        return
+
+    ops = connection.ops
+    table = ops.quote_name(DailyRollup._meta.db_table)
+    columns = [ops.quote_name(DailyRollup._meta.get_field(name).column)
+               for name in ('account', 'date', 'transaction_type', 'count', 'total')]
+    count_column, total_column = columns[3], columns[4]
+    rows = [
+        [account_id, ops.adapt_datefield_value(day), transaction_type, count, ops.adapt_decimalfield_value(total)]
+        for (account_id, day, transaction_type), (count, total) in rollups.items()
+    ]
+    # Five parameters a row; a large ingest chunk would pass SQLite's limit
+    batch_size = (connection.features.max_query_params or 5 * len(rows)) // 5
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            sql = (
+                'INSERT INTO %s (%s) VALUES %s ON CONFLICT (%s) DO UPDATE SET '
+                '%s = %s.%s + excluded.%s, %s = ROUND(%s.%s + excluded.%s, 2)' % (
+                    table,
+                    ', '.join(columns),
+                    ', '.join(['(%s, %s, %s, %s, %s)'] * len(batch)),
+                    ', '.join(columns[:3]),
+                    count_column, table, count_column, count_column,
+                    total_column, table, total_column, total_column,
+                )
+            )
+            cursor.execute(sql, [param for row in batch for param in row])
+
+
+def _record_each(rollups):
+    """``record`` for backends without ON CONFLICT: update, then create what was missing."""
+    for (account_id, day, transaction_type), (count, total) in rollups.items():
+        updated = DailyRollup.objects.filter(
+            account_id=account_id, date=day, transaction_type=transaction_type
+        ).update(count=F('count') + count, total=F('total') + total)
+        if not updated:
+            DailyRollup.objects.create(
+                account_id=account_id, date=day, transaction_type=transaction_type,
+                count=count, total=total
+            )
+
+
+def _empty():
+    return {
+        'deposits': ZERO, 'withdrawals': ZERO, 'net_flow': ZERO,
+        'deposit_count': 0, 'withdrawal_count': 0, 'by_type': {},
+    }
+
+
+def _add(summary, transaction_type, count, total):
+    if transaction_type in Transaction.CREDIT_TYPES:
+        summary['deposits'] += total
+        summary['deposit_count'] += count
+        summary['net_flow'] += total
+    else:
+        summary['withdrawals'] += total
+        summary['withdrawal_count'] += count
+        summary['net_flow'] -= total
+    by_type = summary['by_type'].setdefault(transaction_type, {'count': 0, 'total': ZERO})
+    by_type['count'] += count
+    by_type['total'] += total
+
+
+def flows(account_ids, start_date, end_date, group='month'):
+    """
+    Deposits, withdrawals and net flow of ``account_ids`` from ``start_date``
+    through ``end_date``, per ``group`` ('day', 'month', 'year') plus overall.
+
+    Returns ``{'periods': [{'period': ..., **summary}, ...], 'totals': summary}``.
+    Deposits are all credit types (deposits and incoming transfers);
+    withdrawals are all debit types. ``by_type`` breaks each down further.
+    """
+    if group not in GROUPS:
+        raise ValueError(f'group must be one of {", ".join(GROUPS)}')
+    rows = DailyRollup.objects.filter(
+        account_id__in=account_ids, date__range=[start_date, end_date]
+    ).order_by()
+    # Sum in the database so a year of rollups comes back as a few dozen rows
+    if group == 'total':
+        rows = rows.annotate(period=Value(None, output_field=CharField()))
+    else:
+        rows = rows.annotate(period=Substr(Cast('date', CharField()), 1, PERIOD_LENGTHS[group]))
+    rows = rows.values_list('period', 'transaction_type').annotate(
+        count_sum=Sum('count'), total_sum=Sum('total')
+    ).order_by('period', 'transaction_type')
+
+    periods = {}
+    totals = _empty()
+    for period, transaction_type, count, total in rows:
+        total = total.quantize(CENT)
+        if period is not None:
+            _add(periods.setdefault(period, _empty()), transaction_type, count, total)
+        _add(totals, transaction_type, count, total)
+    return {
+        'periods': [{'period': period, **summary} for period, summary in periods.items()],
+        'totals': totals,
+    }
+
+
+def reconcile(account_ids, fix=True):
+    """
+    Recompute the rollups of ``account_ids`` from their raw transactions.
+
+    Returns the number of (account, day, type) rows that were wrong or
+    missing. With ``fix`` the drifted accounts are rewritten from the ledger.
+    """
+    entries = Transaction.objects.filter(account_id__in=account_ids).only(
+        'account_id', 'transaction_type', 'amount', 'created_at'
+    )
+    with transaction.atomic(using=sharding.current()):
+        expected = {key: tuple(value) for key, value in _fold(entries.iterator(chunk_size=2000)).items()}
+        actual = {
+            (account_id, day, transaction_type): (count, total)
+            for account_id, day, transaction_type, count, total in DailyRollup.objects.filter(
+                account_id__in=account_ids
+            ).values_list('account_id', 'date', 'transaction_type', 'count', 'total')
+        }
+        drifted = {key for key in expected.keys() | actual.keys() if expected.get(key) != actual.get(key)}
+        if fix and drifted:
+            accounts = {account_id for account_id, _, _ in drifted}
+            DailyRollup.objects.filter(account_id__in=accounts).delete()
+            DailyRollup.objects.bulk_create([
+                DailyRollup(account_id=account_id, date=day, transaction_type=transaction_type,
+                            count=count, total=total)
+                for (account_id, day, transaction_type), (count, total) in expected.items()
+                if account_id in accounts
+            ], batch_size=500)
+    return len(drifted)
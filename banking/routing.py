@@ -0,0 +1,172 @@
+"""
+Primary/replica read routing.
+
+When ``DATABASES`` has a ``BANKING_REPLICA_ALIAS`` entry, views that opt in
+with ``replica_reads`` (the transaction, statement and card lists and the
+admin changelists) send their reads to it. Money movement never competes
+with them on the primary. Everything else uses ``default``:
+
+- every write;
+- reads inside ``transaction.atomic()`` on the primary;
+- reads after a write earlier in the same request;
+- reads by a user who made a write request within the last
+  ``BANKING_REPLICA_STICKY_SECONDS``, so a client always sees its own
+  deposits and transfers even while the replica lags.
+
+Stickiness is remembered per process, like the holder cache. Without a
+replica alias the router does nothing.
+
+A ledger database (``banking.sharding``) can have a replica of its own,
+named in ``BANKING_SHARD_REPLICAS``. ``ShardRouter`` picks the ledger
+database first and then asks ``read_alias`` for its replica under the same
+rules, so ledger reads are offloaded too.
+
+``replicate`` is a local stand-in for real replication: it copies each
+primary SQLite database into its replica file with SQLite's backup API. The
+``sync_replica`` command runs it in a loop.
+"""
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.permissions import SAFE_METHODS
+
+_state = threading.local()
+
+
+class StickyWrites:
+    """Remembers which users wrote recently, for ``window`` seconds."""
+
+    def __init__(self, window):
+        self.window = window
+        self._written = {}
+        self._lock = threading.Lock()
+
+    def mark(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            self._written[user_id] = now
+            cutoff = now - self.window
+            for key in [key for key, at in self._written.items() if at < cutoff]:
+                del self._written[key]
+
+    def is_sticky(self, user_id):
+        written = self._written.get(user_id)
+        return written is not None and time.monotonic() - written < self.window
+
+    def clear(self):
+        with self._lock:
+            self._written.clear()
+
+
+sticky = StickyWrites(window=getattr(settings, 'BANKING_REPLICA_STICKY_SECONDS', 5))
+
+
+def _configured():
+    """{primary alias: replica alias} as configured, usable or not."""
+    pairs = {DEFAULT_DB_ALIAS: getattr(settings, 'BANKING_REPLICA_ALIAS', 'replica')}
+    pairs.update(getattr(settings, 'BANKING_SHARD_REPLICAS', {}))
+    return pairs
+
+
+def replica_alias(primary=DEFAULT_DB_ALIAS):
+    """``primary``'s replica alias, or None when it has no separate replica."""
+    alias = _configured().get(primary)
+    if alias not in connections.settings or primary not in connections.settings:
+        return None
+    # A test mirror points at the primary's database: nothing to offload
+    if connections[alias].settings_dict['NAME'] == connections[primary].settings_dict['NAME']:
+        return None
+    return alias
+
+
+def replicas():
+    """{primary alias: replica alias} for every primary with a usable replica."""
+    return {primary: replica_alias(primary) for primary in _configured() if replica_alias(primary)}
+
+
+@contextmanager
+def replica_reads(user_id=None):
+    """Let reads in this block go to the replica unless ``user_id`` wrote recently."""
+    previous = getattr(_state, 'replica', False)
+    _state.replica = not (user_id is not None and sticky.is_sticky(user_id))
+    try:
+        yield
+    finally:
+        _state.replica = previous
+
+
+def read_alias(primary):
+    """The replica to read ``primary``'s rows from right now, or None for the primary itself."""
+    if not getattr(_state, 'replica', False) or getattr(_state, 'wrote', False):
+        return None
+    if connections[primary].in_atomic_block:
+        return None
+    return replica_alias(primary)
+
+
+def note_write():
+    """Keep the rest of this request's reads on the primaries."""
+    _state.wrote = True
+
+
+class PrimaryReplicaRouter:
+    """Route opted-in reads to the replica and everything else to the primary."""
+
+    def db_for_read(self, model, **hints):
+        return read_alias(DEFAULT_DB_ALIAS)
+
+    def db_for_write(self, model, **hints):
+        note_write()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # the replica holds the same rows
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in _configured().values():
+            return False  # replicas get their schema from replication
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """Start each request on a clean slate and make writers sticky to the primary."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _state.wrote = False
+        response = self.get_response(request)
+        user = getattr(request, 'user', None)
+        if request.method not in SAFE_METHODS and user is not None and user.is_authenticated:
+            sticky.mark(user.id)
+        return response
+
+
+class ReplicaReadMixin:
+    """Serve a generic view's GET from the replica."""
+
+    def get(self, request, *args, **kwargs):
+        with replica_reads(request.user.id):
+            return super().get(request, *args, **kwargs)
+
+
+def replicate(alias=None):
+    """Copy each primary SQLite database (or just ``alias``'s) over its replica; returns seconds taken."""
+    pairs = {primary: replica for primary, replica in replicas().items() if alias in (None, replica)}
+    if not pairs:
+        raise ValueError('No replica database is configured')
+    started = time.perf_counter()
+    for primary, replica in pairs.items():
+        source = connections[primary]
+        source.ensure_connection()
+        target = sqlite3.connect(str(connections[replica].settings_dict['NAME']))
+        try:
+            source.connection.backup(target)
+        finally:
+            target.close()
+    return time.perf_counter() - started
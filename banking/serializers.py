@@ -1,7 +1,11 @@
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib.auth.password_validation import validate_password
-from .models import AccountHolder, Account, Transaction, MoneyTransfer, Card, Statement
+from django.core.exceptions import ObjectDoesNotExist
+from django.urls import reverse
+from . import sharding
+from .models import AccountHolder, Account, Transaction, MoneyTransfer, Card, Statement, StatementLine
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, validators=[validate_password])
@@ -46,7 +50,23 @@ class TransactionSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ['transaction_id', 'balance_after']
 
+class ShardedAccountField(serializers.PrimaryKeyRelatedField):
+    """An account id looked up on the shard its id range belongs to."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            alias = sharding.shard_for_account(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return self.get_queryset().using(alias).get(pk=data)
+        except ObjectDoesNotExist:
+            self.fail('does_not_exist', pk_value=data)
+
 class MoneyTransferSerializer(serializers.ModelSerializer):
+    serializer_related_field = ShardedAccountField
     from_account_number = serializers.CharField(source='from_account.account_number', read_only=True)
     to_account_number = serializers.CharField(source='to_account.account_number', read_only=True)
 
@@ -56,31 +76,51 @@ class MoneyTransferSerializer(serializers.ModelSerializer):
                  'to_account_number', 'amount', 'description', 'status', 'created_at', 'completed_at']
         read_only_fields = ['transfer_id', 'status', 'completed_at']
 
+class BulkTransferSerializer(serializers.Serializer):
+    from_account = serializers.PrimaryKeyRelatedField(queryset=Account.objects.all())
+    # Items are validated in bulk by the ledger; only their shape is checked here
+    items = serializers.ListField(child=serializers.DictField(), allow_empty=False,
+                                  max_length=getattr(settings, 'BANKING_BULK_TRANSFER_MAX_ITEMS', 10000))
+    all_or_nothing = serializers.BooleanField(default=True)
+
 class CardSerializer(serializers.ModelSerializer):
     masked_card_number = serializers.SerializerMethodField()
 
     class Meta:
         model = Card
-        fields = ['id', 'card_number', 'masked_card_number', 'card_type', 'cardholder_name',
+        fields = ['id', 'account', 'card_number', 'masked_card_number', 'card_type', 'cardholder_name',
                  'expiry_date', 'is_active', 'credit_limit', 'created_at']
-        read_only_fields = ['card_number']
+        read_only_fields = ['card_number', 'expiry_date']
 
     def get_masked_card_number(self, obj):
         return f"****-****-****-{obj.card_number[-4:]}"
 
+class StatementLineSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='entry_id', read_only=True)
+    account = serializers.IntegerField(source='statement.account_id', read_only=True)
+
+    class Meta:
+        model = StatementLine
+        fields = ['id', 'transaction_id', 'account', 'transaction_type', 'amount', 'description',
+                 'reference_number', 'balance_after', 'created_at', 'position']
+
 class StatementSerializer(serializers.ModelSerializer):
+    # A statement can hold a year of postings; its lines are paged at ``lines``
     account_number = serializers.CharField(source='account.account_number', read_only=True)
-    transactions = serializers.SerializerMethodField()
+    lines = serializers.SerializerMethodField()
 
     class Meta:
         model = Statement
         fields = ['id', 'account', 'account_number', 'statement_period_start',
                  'statement_period_end', 'opening_balance', 'closing_balance',
-                 'total_deposits', 'total_withdrawals', 'generated_at', 'transactions']
-
-    def get_transactions(self, obj):
-        transactions = Transaction.objects.filter(
-            account=obj.account,
-            created_at__date__range=[obj.statement_period_start, obj.statement_period_end]
-        )
-        return TransactionSerializer(transactions, many=True).data
+                 'total_deposits', 'total_withdrawals', 'line_count', 'generated_at', 'lines']
+
+    def get_lines(self, obj):
+        return reverse('statement-lines', kwargs={'account_id': obj.account_id, 'pk': obj.pk})
+
+class StatementDetailSerializer(StatementSerializer):
+    """One statement with its lines inline, as generate-statement answers."""
+    transactions = StatementLineSerializer(source='lines', many=True, read_only=True)
+
+    class Meta(StatementSerializer.Meta):
+        fields = StatementSerializer.Meta.fields + ['transactions']
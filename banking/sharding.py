@@ -0,0 +1,207 @@
+"""
+Horizontal sharding of the ledger by account holder.
+
+``BANKING_SHARDS`` lists the database aliases that hold ledger data. A
+holder's accounts and everything hanging off them (transactions, transfers,
+cards, statements, checkpoints, rollups and the cross-shard outbox) live on
+``shard_for_holder(holder_id)``. Users, holders, idempotency keys and
+Django's contrib tables (sessions, admin log, permissions) stay on
+``default``. ``default`` may itself be a shard; any other shard migrates only
+the ledger tables.
+
+A single shard other than ``default`` is a dedicated ledger database: ledger
+writes then never queue behind logins, signups or admin activity for the
+same SQLite write lock.
+
+Account ids name their shard: shard ``n`` hands out ids from
+``n * SHARD_SPAN``, so ``shard_for_account`` needs no lookup and a transfer
+can find its destination on any shard.
+
+``ShardRouter`` sends sharded models to the active shard, and opted-in reads
+on to that shard's replica (``banking.routing``). ``holder_context``
+activates the requesting holder's shard, and ``using`` activates one for a
+block. Ledger postings pick the shard from the account id themselves. When
+``default`` is the only shard (the default) the router stands aside and
+nothing changes.
+
+Transfers between shards are two local transactions tied together by a
+durable outbox; see ``ledger.transfer``.
+"""
+from contextlib import contextmanager
+
+from asgiref.local import Local
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import request_finished, request_started
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models.signals import post_migrate
+from django.dispatch import receiver
+
+from . import routing
+from .models import AccountHolder, Account
+
+# Size of each shard's account id range
+SHARD_SPAN = 10 ** 12
+
+SHARDED_MODELS = {
+    'account', 'transaction', 'moneytransfer', 'card', 'statement', 'statementline',
+    'dailybalance', 'dailyrollup', 'outboxmessage', 'inboxmessage',
+}
+
+# Local, unlike threading.local, follows async views into sync_to_async
+_state = Local()
+
+
+def shards():
+    """The configured shard aliases, in shard-number order."""
+    return tuple(getattr(settings, 'BANKING_SHARDS', None) or (DEFAULT_DB_ALIAS,))
+
+
+def is_sharded():
+    """Whether the ledger is split over more than one database."""
+    return len(shards()) > 1
+
+
+def is_routed():
+    """Whether any ledger data lives outside ``default``."""
+    return shards() != (DEFAULT_DB_ALIAS,)
+
+
+def shard_for_holder(holder_id):
+    """The shard that holds ``holder_id``'s accounts."""
+    aliases = shards()
+    return aliases[int(holder_id) % len(aliases)]
+
+
+def shard_for_account(account_id):
+    """The shard whose id range contains ``account_id``."""
+    aliases = shards()
+    index = int(account_id) // SHARD_SPAN
+    # Ids outside every range simply miss on the first shard
+    return aliases[index] if index < len(aliases) else aliases[0]
+
+
+def current():
+    """The active shard alias."""
+    return getattr(_state, 'alias', None) or shards()[0]
+
+
+def connection():
+    """The connection to the active shard, for hand-written SQL."""
+    return connections[current()]
+
+
+def activate(alias):
+    _state.alias = alias
+
+
+def deactivate():
+    _state.alias = None
+
+
+@contextmanager
+def using(alias):
+    """Route sharded models to ``alias`` inside the block."""
+    previous = getattr(_state, 'alias', None)
+    _state.alias = alias
+    try:
+        yield alias
+    finally:
+        _state.alias = previous
+
+
+class ShardRouter:
+    """Send sharded models to their shard and global banking models to ``default``."""
+
+    def _route(self, model, hints):
+        if not is_routed() or model._meta.app_label != 'banking':
+            return None
+        if model._meta.model_name not in SHARDED_MODELS:
+            return DEFAULT_DB_ALIAS
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            if instance._meta.model_name in SHARDED_MODELS:
+                return instance._state.db
+            if isinstance(instance, AccountHolder):
+                return shard_for_holder(instance.pk)
+        return current()
+
+    def db_for_read(self, model, **hints):
+        alias = self._route(model, hints)
+        if alias is None:
+            return None
+        # Opted-in reads go to the chosen database's replica, if it has one
+        return routing.read_alias(alias) or alias
+
+    def db_for_write(self, model, **hints):
+        alias = self._route(model, hints)
+        if alias is not None:
+            routing.note_write()
+        return alias
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # holders and cross-shard transfers point across databases
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if not is_routed() or db == DEFAULT_DB_ALIAS and db in shards():
+            return None
+        # Data migrations without a model_name hint run wherever their app's tables are
+        ledger = app_label == 'banking' and (model_name is None or model_name in SHARDED_MODELS)
+        if db in shards():
+            return ledger
+        if db == DEFAULT_DB_ALIAS:
+            return model_name is None or not ledger
+        return None
+
+
+def prepare(alias):
+    """Start ``alias``'s account ids at the bottom of its range."""
+    base = shards().index(alias) * SHARD_SPAN
+    if not base:
+        return
+    conn = connections[alias]
+    if conn.vendor != 'sqlite':
+        raise ImproperlyConfigured(
+            f'Start the account id sequence on shard {alias!r} at {base + 1} by hand'
+        )
+    table = Account._meta.db_table
+    with conn.cursor() as cursor:
+        cursor.execute('SELECT seq FROM sqlite_sequence WHERE name = %s', [table])
+        row = cursor.fetchone()
+        if row is None:
+            cursor.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)', [table, base])
+        elif row[0] < base:
+            cursor.execute('UPDATE sqlite_sequence SET seq = %s WHERE name = %s', [base, table])
+
+
+def attach_accounts(objects, *fields):
+    """
+    Fill the account foreign keys ``fields`` of ``objects`` with one query
+    per shard involved, where ``select_related`` could only join local rows.
+    """
+    wanted = {}
+    for obj in objects:
+        for name in fields:
+            account_id = getattr(obj, f'{name}_id')
+            wanted.setdefault(shard_for_account(account_id), set()).add(account_id)
+    accounts = {}
+    for alias, ids in wanted.items():
+        accounts.update(Account.objects.using(alias).in_bulk(ids))
+    for obj in objects:
+        for name in fields:
+            account = accounts.get(getattr(obj, f'{name}_id'))
+            if account is not None:
+                obj._meta.get_field(name).set_cached_value(obj, account)
+    return objects
+
+
+@receiver(post_migrate)
+def _prepare_shard(sender, using, **kwargs):
+    if sender.name == 'banking' and using in shards():
+        prepare(using)
+
+
+@receiver(request_started)
+@receiver(request_finished)
+def _reset(**kwargs):
+    deactivate()
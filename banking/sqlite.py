@@ -0,0 +1,36 @@
+"""
+SQLite connection tuning.
+
+Django opens SQLite with the library defaults: a rollback journal, so a
+writer locks readers out, and a full fsync per commit. When
+``BANKING_SQLITE_PRAGMAS`` is set (the production settings do), every new
+SQLite connection runs those pragmas first, in order. ``journal_mode=WAL``
+lets readers keep reading the last committed snapshot while one writer
+appends, and ``synchronous=NORMAL`` is crash-safe under WAL while syncing
+only at checkpoints.
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+def pragmas(connection):
+    """The current value of each configured pragma on ``connection``."""
+    values = {}
+    with connection.cursor() as cursor:
+        for name in getattr(settings, 'BANKING_SQLITE_PRAGMAS', {}):
+            cursor.execute('PRAGMA %s' % name)
+            values[name] = cursor.fetchone()[0]
+    return values
+
+
+@receiver(connection_created)
+def _configure(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    configured = getattr(settings, 'BANKING_SQLITE_PRAGMAS', None)
+    if not configured:
+        return
+    with connection.cursor() as cursor:
+        for name, value in configured.items():
+            cursor.execute('PRAGMA %s = %s' % (name, value))
@@ -0,0 +1,109 @@
+from asgiref.sync import sync_to_async
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from banking import holders, ledger, statements
+from banking.authentication import revocations
+from banking.models import AccountHolder, Account
+from decimal import Decimal
+from datetime import date
+import json
+
+class AsyncReadPathTestCase(TestCase):
+    """The async endpoints return the same payloads as their sync counterparts"""
+
+    def setUp(self):
+        holders.cache.clear()
+        revocations.clear()
+        self.user = User.objects.create_user(
+            username='asyncuser',
+            email='async@example.com',
+            password='testpass123'
+        )
+        self.account_holder = AccountHolder.objects.create(
+            user=self.user,
+            phone_number='+1234567890',
+            address='123 Async St',
+            date_of_birth=date(1990, 1, 1)
+        )
+        self.account = Account.objects.create(
+            account_holder=self.account_holder,
+            account_type='CHECKING',
+            balance=Decimal('100.00')
+        )
+        for _ in range(25):
+            ledger.credit(self.account.id, Decimal('1.00'))
+        statements.generate(self.account, timezone.localdate(), timezone.localdate())
+
+        refresh = RefreshToken.for_user(self.user)
+        self.access_token = refresh.access_token
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access_token}')
+
+    async def get_async(self, url, data=None, token=None):
+        response = await self.async_client.get(
+            url, data, headers={'Authorization': f'Bearer {token or self.access_token}'}
+        )
+        return response.status_code, json.loads(response.content)
+
+    async def sync_get(self, url, data=None):
+        return await sync_to_async(self.sync_data)(url, data)
+
+    def sync_data(self, url, data=None):
+        return json.loads(json.dumps(self.client.get(url, data).data))
+
+    async def test_account_list_matches_sync(self):
+        status_code, data = await self.get_async('/api/async/accounts/')
+
+        self.assertEqual(status_code, 200)
+        self.assertEqual(data, await self.sync_get('/api/accounts/'))
+
+    async def test_transaction_list_matches_sync(self):
+        url = f'/api/accounts/{self.account.id}/transactions/'
+        status_code, data = await self.get_async(f'/api/async/accounts/{self.account.id}/transactions/')
+
+        self.assertEqual(status_code, 200)
+        self.assertEqual(len(data['results']), 20)
+        self.assertEqual(data['results'], (await self.sync_get(url))['results'])
+
+        _, second = await self.get_async(data['next'])
+        self.assertEqual(len(second['results']), 5)
+
+        _, legacy = await self.get_async(f'/api/async/accounts/{self.account.id}/transactions/', {'page': 2})
+        self.assertEqual(legacy['count'], 25)
+        self.assertEqual(legacy['results'], (await self.sync_get(url, {'page': 2}))['results'])
+
+    async def test_statement_list_matches_sync(self):
+        status_code, data = await self.get_async(f'/api/async/accounts/{self.account.id}/statements/')
+
+        self.assertEqual(status_code, 200)
+        self.assertEqual(data['results'][0]['line_count'], 25)
+        self.assertEqual(data['results'][0]['lines'],
+                         f'/api/accounts/{self.account.id}/statements/{data["results"][0]["id"]}/lines/')
+        self.assertEqual(data, await self.sync_get(f'/api/accounts/{self.account.id}/statements/'))
+
+    async def test_profile(self):
+        status_code, data = await self.get_async('/api/async/profile/')
+
+        self.assertEqual(status_code, 200)
+        self.assertEqual(data['user']['username'], 'asyncuser')
+
+    async def test_other_holders_account_is_not_found(self):
+        status_code, data = await self.get_async(f'/api/async/accounts/{self.account.id + 1000}/transactions/')
+        self.assertEqual(status_code, 404)
+        self.assertEqual(data, {'detail': 'Account not found'})
+
+    async def test_requires_authentication(self):
+        response = await self.async_client.get('/api/async/accounts/')
+        self.assertEqual(response.status_code, 401)
+
+        status_code, _ = await self.get_async('/api/async/accounts/', token='not-a-token')
+        self.assertEqual(status_code, 401)
+
+    async def test_revoked_token_is_rejected(self):
+        revocations.revoke_user(self.user.id)
+
+        status_code, _ = await self.get_async('/api/async/accounts/')
+        self.assertEqual(status_code, 401)
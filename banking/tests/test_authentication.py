@@ -0,0 +1,140 @@
+from django.test import TestCase
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from banking import holders
+from banking.authentication import revocations
+from banking.models import AccountHolder, Account
+from django.utils import timezone
+from unittest import mock
+from decimal import Decimal
+from datetime import date, timedelta
+import time
+
+class StatelessAuthenticationTestCase(TestCase):
+    """Tests for claim-carrying JWTs and the revocation list"""
+
+    def setUp(self):
+        holders.cache.clear()
+        holders.changes.clear()
+        revocations.clear()
+        self.user = User.objects.create_user(
+            username='jwtuser',
+            email='jwt@example.com',
+            password='testpass123'
+        )
+        self.account_holder = AccountHolder.objects.create(
+            user=self.user,
+            phone_number='+1234567890',
+            address='123 Token St',
+            date_of_birth=date(1990, 1, 1)
+        )
+        self.account = Account.objects.create(
+            account_holder=self.account_holder,
+            account_type='CHECKING',
+            balance=Decimal('100.00')
+        )
+        # The setup writes mark the holder's account set as changed; forget
+        # that so the login token's claims are trusted.
+        holders.changes.clear()
+
+        self.client = APIClient()
+        self.tokens = self.login()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.tokens["access"]}')
+
+    def login(self):
+        response = self.client.post('/api/auth/login/', {
+            'username': 'jwtuser',
+            'password': 'testpass123'
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_login_embeds_holder_claims(self):
+        token = AccessToken(self.tokens['access'])
+
+        self.assertEqual(token['holder_id'], self.account_holder.id)
+        self.assertEqual(token['account_ids'], [self.account.id])
+
+    def test_hot_reads_run_no_auth_queries(self):
+        holders.cache.clear()
+
+        # The account version lookup for conditional GET, then the page
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/accounts/{self.account.id}/transactions/')
+        self.assertEqual(response.status_code, 200)
+
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/accounts/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_claims_ignored_after_account_set_changes(self):
+        response = self.client.post('/api/accounts/', {'account_type': 'SAVINGS'}, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        response = self.client.get('/api/cards/')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(f'/api/accounts/{Account.objects.latest("id").id}/transactions/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_logout_revokes_access_and_refresh(self):
+        response = self.client.post('/api/auth/logout/', {'refresh': self.tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get('/api/accounts/')
+        self.assertEqual(response.status_code, 401)
+
+        response = self.client.post('/api/auth/refresh/', {'refresh': self.tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+    def test_logout_leaves_other_sessions(self):
+        other_session = self.login()
+        self.client.post('/api/auth/logout/', format='json')
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {other_session["access"]}')
+        response = self.client.get('/api/accounts/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_deactivated_user_is_rejected(self):
+        self.user.is_active = False
+        self.user.save()
+
+        response = self.client.get('/api/accounts/')
+        self.assertEqual(response.status_code, 401)
+
+    def test_refresh_keeps_working(self):
+        response = self.client.post('/api/auth/refresh/', {'refresh': self.tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+        response = self.client.get(f'/api/accounts/{self.account.id}/transactions/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_rotated_tokens_pick_up_new_accounts(self):
+        # Log in, then open an account, a few seconds ago; the refreshes below
+        # then rotate to tokens issued after the change
+        now = time.time()
+        with mock.patch('rest_framework_simplejwt.tokens.aware_utcnow',
+                        return_value=timezone.now() - timedelta(seconds=10)), \
+                mock.patch('banking.authentication.time.time', return_value=now - 10):
+            tokens = self.login()
+        with mock.patch('banking.holders.time.time', return_value=now - 5):
+            response = self.client.post('/api/accounts/', {'account_type': 'SAVINGS'}, format='json')
+        savings = response.data['id']
+        response = self.client.post('/api/cards/', {
+            'account': savings, 'card_type': 'DEBIT', 'cardholder_name': 'Jwt User',
+            'expiry_date': '2030-01-01'
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        refresh = tokens['refresh']
+        for _ in range(2):
+            response = self.client.post('/api/auth/refresh/', {'refresh': refresh}, format='json')
+            self.assertEqual(response.status_code, 200)
+            refresh = response.data['refresh']
+        self.assertIn(savings, AccessToken(response.data['access'])['account_ids'])
+
+        holders.cache.clear()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+        response = self.client.get('/api/cards/')
+        self.assertEqual(len(response.data['results']), 1)
@@ -0,0 +1,159 @@
+from django.test import TestCase
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from banking import holders, ledger
+from banking.models import AccountHolder, Account, Transaction, MoneyTransfer, DailyBalance
+from unittest import mock
+from decimal import Decimal
+from datetime import date
+
+class BulkTransferTestCase(TestCase):
+    """Tests for one-source, many-destination payroll transfers"""
+
+    def setUp(self):
+        holders.cache.clear()
+        self.user = User.objects.create_user(
+            username='payrolluser',
+            email='payroll@example.com',
+            password='testpass123'
+        )
+        self.account_holder = AccountHolder.objects.create(
+            user=self.user,
+            phone_number='+1234567890',
+            address='123 Payroll St',
+            date_of_birth=date(1990, 1, 1)
+        )
+        self.business = Account.objects.create(
+            account_holder=self.account_holder,
+            account_type='BUSINESS',
+            balance=Decimal('1000.00')
+        )
+        employee = AccountHolder.objects.create(
+            user=User.objects.create_user(username='employee', password='testpass123'),
+            phone_number='+1987654321',
+            address='456 Employee St',
+            date_of_birth=date(1990, 1, 1)
+        )
+        self.employees = [
+            Account.objects.create(account_holder=employee, account_type='CHECKING', balance=Decimal('10.00'))
+            for _ in range(12)
+        ]
+
+        self.client = APIClient()
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+    def payroll(self, amount='50.00'):
+        return [{'to_account': account.id, 'amount': amount, 'description': 'Salary'}
+                for account in self.employees]
+
+    def test_pays_every_destination(self):
+        response = self.client.post('/api/transfers/bulk/', {
+            'from_account': self.business.id,
+            'items': self.payroll()
+        }, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['completed'], 12)
+        self.assertEqual(response.data['total_amount'], '600.00')
+        self.business.refresh_from_db()
+        self.assertEqual(self.business.balance, Decimal('400.00'))
+        for account in self.employees:
+            account.refresh_from_db()
+            self.assertEqual(account.balance, Decimal('60.00'))
+        self.assertEqual(MoneyTransfer.objects.filter(status='COMPLETED').count(), 12)
+
+    def test_running_balances_on_ledger_legs(self):
+        items = [
+            {'to_account': self.employees[0].id, 'amount': '100.00'},
+            {'to_account': self.employees[1].id, 'amount': '30.00'},
+            {'to_account': self.employees[0].id, 'amount': '20.00'},
+        ]
+        results = ledger.bulk_transfer(self.business, items)
+
+        out_legs = Transaction.objects.filter(account=self.business).order_by('id')
+        self.assertEqual([leg.balance_after for leg in out_legs],
+                         [Decimal('900.00'), Decimal('870.00'), Decimal('850.00')])
+        in_legs = Transaction.objects.filter(account=self.employees[0]).order_by('id')
+        self.assertEqual([leg.balance_after for leg in in_legs], [Decimal('110.00'), Decimal('130.00')])
+        self.assertEqual(in_legs[1].reference_number, results[2]['transfer'].transfer_id)
+
+        checkpoint = DailyBalance.objects.get(account=self.business)
+        self.assertEqual(checkpoint.closing_balance, Decimal('850.00'))
+        self.assertEqual(checkpoint.total_withdrawals, Decimal('150.00'))
+
+    def test_all_or_nothing_rejects_invalid_items(self):
+        items = self.payroll()
+        items[3]['to_account'] = 999999
+        items[5]['amount'] = '-1'
+
+        response = self.client.post('/api/transfers/bulk/', {
+            'from_account': self.business.id,
+            'items': items
+        }, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        failed = [result['index'] for result in response.data['results'] if result['status'] == 'FAILED']
+        self.assertEqual(failed, [3, 5])
+        self.business.refresh_from_db()
+        self.assertEqual(self.business.balance, Decimal('1000.00'))
+        self.assertFalse(MoneyTransfer.objects.exists())
+
+    def test_all_or_nothing_overdraft_applies_nothing(self):
+        response = self.client.post('/api/transfers/bulk/', {
+            'from_account': self.business.id,
+            'items': self.payroll(amount='100.00')
+        }, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'Insufficient funds')
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_partial_mode_reports_per_item_results(self):
+        items = self.payroll(amount='100.00')
+        items[0]['to_account'] = self.business.id
+
+        response = self.client.post('/api/transfers/bulk/', {
+            'from_account': self.business.id,
+            'items': items,
+            'all_or_nothing': False
+        }, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['completed'], 10)
+        self.assertEqual(response.data['results'][0]['error'], 'Cannot transfer to the same account')
+        self.assertEqual(response.data['results'][11]['error'], 'Insufficient funds')
+        self.business.refresh_from_db()
+        self.assertEqual(self.business.balance, Decimal('0.00'))
+
+    def test_partial_mode_sizes_the_batch_from_the_locked_balance(self):
+        bulk_transfer_once = ledger._bulk_transfer_once
+
+        def debited_concurrently(*args):
+            # Another request withdraws after the batch was parsed, before it is paid
+            ledger.debit(self.business.id, Decimal('950.00'))
+            return bulk_transfer_once(*args)
+
+        with mock.patch('banking.ledger._bulk_transfer_once', debited_concurrently):
+            results = ledger.bulk_transfer(self.business, self.payroll(amount='20.00'), all_or_nothing=False)
+
+        self.assertEqual([result['status'] for result in results], ['COMPLETED'] * 2 + ['FAILED'] * 10)
+        self.assertEqual(results[2]['error'], 'Insufficient funds')
+        self.business.refresh_from_db()
+        self.assertEqual(self.business.balance, Decimal('10.00'))
+
+    def test_only_own_source_account(self):
+        response = self.client.post('/api/transfers/bulk/', {
+            'from_account': self.employees[0].id,
+            'items': [{'to_account': self.business.id, 'amount': '1.00'}]
+        }, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(MoneyTransfer.objects.exists())
+
+    def test_query_count_does_not_grow_with_destinations(self):
+        # savepoint, destination lookup, source debit, batched credit,
+        # transfer and leg inserts, checkpoint upsert, rollup upsert, release
+        with self.assertNumQueries(9):
+            ledger.bulk_transfer(self.business, self.payroll(amount='1.00'))
@@ -0,0 +1,118 @@
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from banking import checkpoints, holders, ledger
+from banking.models import AccountHolder, Account, Transaction, DailyBalance
+from decimal import Decimal
+from datetime import date, timedelta
+from io import StringIO
+
+class DailyBalanceCheckpointTestCase(TestCase):
+    """Tests for incrementally maintained daily balance checkpoints"""
+
+    def setUp(self):
+        holders.cache.clear()
+        self.user = User.objects.create_user(
+            username='checkpointuser',
+            email='checkpoint@example.com',
+            password='testpass123'
+        )
+        self.account_holder = AccountHolder.objects.create(
+            user=self.user,
+            phone_number='+1234567890',
+            address='123 Checkpoint St',
+            date_of_birth=date(1990, 1, 1)
+        )
+        self.account = Account.objects.create(
+            account_holder=self.account_holder,
+            account_type='CHECKING',
+            balance=Decimal('100.00')
+        )
+        self.other = Account.objects.create(
+            account_holder=self.account_holder,
+            account_type='SAVINGS',
+            balance=Decimal('0.00')
+        )
+
+        self.client = APIClient()
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+    def backdate(self, entry, days):
+        """Move a ledger entry ``days`` into the past."""
+        created_at = timezone.now() - timedelta(days=days)
+        Transaction.objects.filter(pk=entry.pk).update(created_at=created_at)
+        return timezone.localdate(created_at)
+
+    def test_ledger_writes_maintain_todays_checkpoint(self):
+        ledger.credit(self.account.id, Decimal('50.00'))
+        ledger.debit(self.account.id, Decimal('20.00'))
+        ledger.transfer(self.account, self.other, Decimal('10.00'))
+
+        checkpoint = DailyBalance.objects.get(account=self.account)
+        self.assertEqual(checkpoint.date, timezone.localdate())
+        self.assertEqual(checkpoint.closing_balance, Decimal('120.00'))
+        self.assertEqual(checkpoint.total_deposits, Decimal('50.00'))
+        self.assertEqual(checkpoint.total_withdrawals, Decimal('30.00'))
+        self.assertEqual(checkpoint.opening_balance, Decimal('100.00'))
+
+        incoming = DailyBalance.objects.get(account=self.other)
+        self.assertEqual(incoming.closing_balance, Decimal('10.00'))
+        self.assertEqual(incoming.total_deposits, Decimal('10.00'))
+
+    def test_balance_as_of_date(self):
+        first_day = self.backdate(ledger.credit(self.account.id, Decimal('50.00')), days=10)
+        second_day = self.backdate(ledger.debit(self.account.id, Decimal('30.00')), days=5)
+        ledger.credit(self.account.id, Decimal('5.00'))
+        checkpoints.rebuild([self.account.id])
+
+        self.assertEqual(checkpoints.balance_as_of(self.account, first_day - timedelta(days=1)), Decimal('100.00'))
+        self.assertEqual(checkpoints.balance_as_of(self.account, first_day), Decimal('150.00'))
+        self.assertEqual(checkpoints.balance_as_of(self.account, second_day + timedelta(days=1)), Decimal('120.00'))
+        self.assertEqual(checkpoints.balance_as_of(self.account, timezone.localdate()), Decimal('125.00'))
+
+    def test_statement_ignores_transactions_after_period(self):
+        day = self.backdate(ledger.credit(self.account.id, Decimal('50.00')), days=3)
+        ledger.debit(self.account.id, Decimal('70.00'))
+        checkpoints.rebuild([self.account.id])
+
+        response = self.client.post(f'/api/accounts/{self.account.id}/generate-statement/', {
+            'start_date': day.isoformat(),
+            'end_date': day.isoformat()
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Decimal(response.data['opening_balance']), Decimal('100.00'))
+        self.assertEqual(Decimal(response.data['closing_balance']), Decimal('150.00'))
+        self.assertEqual(Decimal(response.data['total_deposits']), Decimal('50.00'))
+        self.assertEqual(Decimal(response.data['total_withdrawals']), Decimal('0.00'))
+
+    def test_balance_endpoint(self):
+        day = self.backdate(ledger.credit(self.account.id, Decimal('50.00')), days=3)
+        ledger.credit(self.account.id, Decimal('25.00'))
+        checkpoints.rebuild([self.account.id])
+
+        response = self.client.get(f'/api/accounts/{self.account.id}/balance/', {'date': day.isoformat()})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['balance'], '150.00')
+
+        response = self.client.get(f'/api/accounts/{self.account.id}/balance/')
+        self.assertEqual(response.data['balance'], '175.00')
+
+    def test_backfill_command_rebuilds_checkpoints(self):
+        ledger.credit(self.account.id, Decimal('50.00'))
+        ledger.transfer(self.account, self.other, Decimal('10.00'))
+        expected = list(DailyBalance.objects.order_by('account_id').values_list(
+            'account_id', 'date', 'closing_balance', 'total_deposits', 'total_withdrawals'
+        ))
+        DailyBalance.objects.all().delete()
+
+        call_command('backfill_checkpoints', chunk_size=1, stdout=StringIO())
+
+        rebuilt = list(DailyBalance.objects.order_by('account_id').values_list(
+            'account_id', 'date', 'closing_balance', 'total_deposits', 'total_withdrawals'
+        ))
+        self.assertEqual(rebuilt, expected)
@@ -0,0 +1,109 @@
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from banking import holders, ledger, statements
+from banking.models import AccountHolder, Account
+from decimal import Decimal
+from datetime import date
+
+class ConditionalGetTestCase(TestCase):
+    """ETag / Last-Modified on account, transaction and statement reads"""
+
+    def setUp(self):
+        holders.cache.clear()
+        self.user = User.objects.create_user(
+            username='etaguser',
+            email='etag@example.com',
+            password='testpass123'
+        )
+        self.account_holder = AccountHolder.objects.create(
+            user=self.user,
+            phone_number='+1234567890',
+            address='123 Etag St',
+            date_of_birth=date(1990, 1, 1)
+        )
+        self.account = Account.objects.create(account_holder=self.account_holder, account_type='CHECKING')
+        self.savings = Account.objects.create(account_holder=self.account_holder, account_type='SAVINGS')
+        ledger.credit(self.account.id, Decimal('100.00'))
+
+        self.client = APIClient()
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        self.transactions = f'/api/accounts/{self.account.id}/transactions/'
+
+    def revalidate(self, url, etag):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_reads_answer_304_with_one_query(self):
+        for url in ('/api/accounts/', f'/api/accounts/{self.account.id}/', self.transactions,
+                    f'/api/accounts/{self.account.id}/statements/'):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('Last-Modified', response)
+            self.assertIn('private', response['Cache-Control'])
+
+            # Just the version lookup: no list query, no serializer
+            with self.assertNumQueries(1):
+                revalidated = self.revalidate(url, response['ETag'])
+            self.assertEqual(revalidated.status_code, 304, url)
+            self.assertEqual(revalidated['ETag'], response['ETag'])
+            self.assertEqual(revalidated.content, b'')
+
+    def test_postings_change_only_their_account(self):
+        listed = self.client.get('/api/accounts/')['ETag']
+        history = self.client.get(self.transactions)['ETag']
+
+        ledger.credit(self.savings.id, Decimal('5.00'))
+        self.assertEqual(self.revalidate(self.transactions, history).status_code, 304)
+        response = self.revalidate('/api/accounts/', listed)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], listed)
+
+        ledger.debit(self.account.id, Decimal('5.00'))
+        response = self.revalidate(self.transactions, history)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['amount'], '5.00')
+
+    def test_statements_change_the_statement_list(self):
+        url = f'/api/accounts/{self.account.id}/statements/'
+        etag = self.client.get(url)['ETag']
+        statements.generate(self.account, timezone.localdate(), timezone.localdate())
+        response = self.revalidate(url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_new_account_changes_the_account_list(self):
+        etag = self.client.get('/api/accounts/')['ETag']
+        self.client.post('/api/accounts/', {'account_type': 'BUSINESS'}, format='json')
+        self.assertEqual(self.revalidate('/api/accounts/', etag).status_code, 200)
+
+    def test_each_page_has_its_own_etag(self):
+        first = self.client.get(self.transactions)['ETag']
+        response = self.client.get(self.transactions, {'page': 1}, HTTP_IF_NONE_MATCH=first)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], first)
+
+    def test_if_modified_since(self):
+        response = self.client.get(self.transactions)
+        response = self.client.get(self.transactions, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_other_holders_account_is_still_not_found(self):
+        etag = self.client.get(self.transactions)['ETag']
+        other = User.objects.create_user(username='etagother', password='testpass123')
+        AccountHolder.objects.create(user=other, phone_number='+1234567890', address='1 Other St',
+                                     date_of_birth=date(1990, 1, 1))
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(other).access_token}')
+        response = client.get(self.transactions, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 404)
+
+    async def test_async_lists_revalidate(self):
+        url = f'/api/async/accounts/{self.account.id}/transactions/'
+        headers = {'Authorization': self.client._credentials['HTTP_AUTHORIZATION']}
+        response = await self.async_client.get(url, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        response = await self.async_client.get(url, headers={**headers, 'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
@@ -0,0 +1,108 @@
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from banking import holders, ledger
+from banking.models import AccountHolder, Account, Transaction
+from decimal import Decimal
+from datetime import date, timedelta
+import csv
+import io
+import json
+
+class TransactionExportTestCase(TestCase):
+    """Tests for the streaming CSV/NDJSON export endpoints"""
+
+    def setUp(self):
+        holders.cache.clear()
+        self.user = User.objects.create_user(
+            username='exportuser',
+            email='export@example.com',
+            password='testpass123'
+        )
+        self.account_holder = AccountHolder.objects.create(
+            user=self.user,
+            phone_number='+1234567890',
+            address='123 Export St',
+            date_of_birth=date(1990, 1, 1)
+        )
+        self.account = Account.objects.create(
+            account_holder=self.account_holder,
+            account_type='CHECKING',
+            balance=Decimal('100.00')
+        )
+        self.savings = Account.objects.create(
+            account_holder=self.account_holder,
+            account_type='SAVINGS',
+            balance=Decimal('0.00')
+        )
+        ledger.credit(self.account.id, Decimal('50.00'), description='Paycheck, January')
+        ledger.debit(self.account.id, Decimal('20.00'))
+        ledger.transfer(self.account, self.savings, Decimal('10.00'))
+
+        self.client = APIClient()
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        self.url = f'/api/accounts/{self.account.id}/transactions/export/'
+
+    def read(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def test_csv_export(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.DictReader(io.StringIO(self.read(response))))
+
+        self.assertEqual([row['transaction_type'] for row in rows], ['DEPOSIT', 'WITHDRAWAL', 'TRANSFER_OUT'])
+        self.assertEqual(rows[0]['description'], 'Paycheck, January')
+        self.assertEqual(rows[0]['amount'], '50.00')
+        self.assertEqual(rows[2]['balance_after'], '120.00')
+
+    def test_ndjson_export(self):
+        response = self.client.get(self.url, {'output': 'ndjson'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        records = [json.loads(line) for line in self.read(response).splitlines()]
+
+        self.assertEqual(len(records), 3)
+        self.assertEqual(records[1]['amount'], '20.00')
+        self.assertEqual(records[1]['account_id'], self.account.id)
+
+    def test_type_and_date_filters(self):
+        entry = Transaction.objects.filter(account=self.account, transaction_type='DEPOSIT').get()
+        Transaction.objects.filter(pk=entry.pk).update(created_at=timezone.now() - timedelta(days=10))
+        today = timezone.localdate().isoformat()
+
+        response = self.client.get(self.url, {'output': 'ndjson', 'start_date': today})
+        types = [json.loads(line)['transaction_type'] for line in self.read(response).splitlines()]
+        self.assertEqual(types, ['WITHDRAWAL', 'TRANSFER_OUT'])
+
+        response = self.client.get(self.url, {'output': 'ndjson', 'type': 'DEPOSIT,TRANSFER_OUT'})
+        types = [json.loads(line)['transaction_type'] for line in self.read(response).splitlines()]
+        self.assertEqual(types, ['DEPOSIT', 'TRANSFER_OUT'])
+
+    def test_holder_export_covers_all_accounts(self):
+        response = self.client.get('/api/accounts/transactions/export/', {'output': 'ndjson'})
+        records = [json.loads(line) for line in self.read(response).splitlines()]
+
+        self.assertEqual({record['account_id'] for record in records}, {self.account.id, self.savings.id})
+        self.assertEqual(len(records), 4)
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get(self.url, {'output': 'xml'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'type': 'REFUND'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'start_date': '01/02/2024'}).status_code, 400)
+
+    def test_other_holders_account_is_not_found(self):
+        other = AccountHolder.objects.create(
+            user=User.objects.create_user(username='otherexport', password='testpass123'),
+            phone_number='+1987654321',
+            address='456 Other St',
+            date_of_birth=date(1990, 1, 1)
+        )
+        account = Account.objects.create(account_holder=other, account_type='CHECKING')
+
+        response = self.client.get(f'/api/accounts/{account.id}/transactions/export/')
+        self.assertEqual(response.status_code, 404)
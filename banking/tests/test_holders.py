@@ -0,0 +1,129 @@
+from django.test import TestCase, SimpleTestCase
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from banking import holders
+from banking.holders import HolderCache, HolderContext
+from banking.models import AccountHolder, Account, Card
+from decimal import Decimal
+from datetime import date, timedelta
+
+class HolderCacheTestCase(SimpleTestCase):
+    """Unit tests for the bounded LRU"""
+
+    def test_evicts_least_recently_used(self):
+        cache = HolderCache(max_size=2, ttl=60)
+        cache.set(HolderContext(1, 10, [100]))
+        cache.set(HolderContext(2, 20, [200]))
+        cache.get(1)
+        cache.set(HolderContext(3, 30, [300]))
+
+        self.assertIsNotNone(cache.get(1))
+        self.assertIsNone(cache.get(2))
+        self.assertIsNotNone(cache.get(3))
+        self.assertEqual(len(cache), 2)
+
+    def test_expired_entries_are_dropped(self):
+        cache = HolderCache(max_size=2, ttl=-1)
+        cache.set(HolderContext(1, 10, [100]))
+        self.assertIsNone(cache.get(1))
+
+    def test_invalidate_by_holder(self):
+        cache = HolderCache(max_size=2, ttl=60)
+        cache.set(HolderContext(1, 10, [100]))
+        cache.invalidate_holder(10)
+        self.assertIsNone(cache.get(1))
+
+    def test_zero_size_disables_cache(self):
+        cache = HolderCache(max_size=0, ttl=60)
+        cache.set(HolderContext(1, 10, [100]))
+        self.assertIsNone(cache.get(1))
+
+class HolderResolutionTestCase(TestCase):
+    """Endpoints resolve the holder once and then filter by account id"""
+
+    def setUp(self):
+        holders.cache.clear()
+        self.user = User.objects.create_user(
+            username='holderuser',
+            email='holder@example.com',
+            password='testpass123'
+        )
+        self.account_holder = AccountHolder.objects.create(
+            user=self.user,
+            phone_number='+1234567890',
+            address='123 Holder St',
+            date_of_birth=date(1990, 1, 1)
+        )
+        self.account = Account.objects.create(
+            account_holder=self.account_holder,
+            account_type='CHECKING',
+            balance=Decimal('100.00')
+        )
+        Card.objects.create(
+            account=self.account,
+            card_type='DEBIT',
+            cardholder_name='Holder User',
+            expiry_date=date.today() + timedelta(days=1825),
+            cvv='123'
+        )
+
+        self.client = APIClient()
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+    def test_context_is_cached_across_requests(self):
+        self.client.get('/api/accounts/')
+
+        context = holders.cache.get(self.user.id)
+        self.assertEqual(context.holder_id, self.account_holder.id)
+        self.assertEqual(context.account_ids, {self.account.id})
+
+    def test_warm_cache_query_counts(self):
+        # Warm the cache, then each request costs only the endpoint's own
+        # queries and nothing for holder resolution. Account and transaction
+        # reads start with the version lookup for conditional GET.
+        self.client.get('/api/accounts/')
+
+        with self.assertNumQueries(3):
+            self.client.get('/api/accounts/')
+        with self.assertNumQueries(2):
+            self.client.get('/api/cards/')
+        with self.assertNumQueries(2):
+            self.client.get(f'/api/accounts/{self.account.id}/transactions/')
+        # SAVEPOINT, UPDATE ... RETURNING, INSERT, checkpoint upsert, rollup
+        # upsert, RELEASE
+        with self.assertNumQueries(6):
+            self.client.post(f'/api/accounts/{self.account.id}/deposit/', {'amount': 5}, format='json')
+
+    def test_cold_cache_costs_one_resolution_query(self):
+        with self.assertNumQueries(4):
+            self.client.get('/api/accounts/')
+
+    def test_new_account_invalidates_cache(self):
+        self.client.get('/api/accounts/')
+        response = self.client.post('/api/accounts/', {'account_type': 'SAVINGS'}, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        self.assertIsNone(holders.cache.get(self.user.id))
+        response = self.client.get(f'/api/accounts/{response.data["id"]}/transactions/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_closed_account_invalidates_cache(self):
+        self.client.get('/api/accounts/')
+        response = self.client.delete(f'/api/accounts/{self.account.id}/')
+        self.assertEqual(response.status_code, 204)
+
+        self.assertIsNone(holders.cache.get(self.user.id))
+        response = self.client.get(f'/api/accounts/{self.account.id}/transactions/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_stale_entry_refreshed_on_ownership_miss(self):
+        # Simulate an account opened by another process: the row exists but
+        # this process never saw the signal.
+        self.client.get('/api/accounts/')
+        other = Account.objects.create(account_holder=self.account_holder, account_type='SAVINGS')
+        holders.cache.set(HolderContext(self.user.id, self.account_holder.id, [self.account.id]))
+
+        response = self.client.get(f'/api/accounts/{other.id}/transactions/')
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,189 @@
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.contrib.auth.models import User
+from django.db import OperationalError
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from banking import holders, idempotency
+from banking.benchmarks import run_threads
+from banking.models import AccountHolder, Account, Transaction, MoneyTransfer, IdempotencyKey
+from unittest import mock
+from decimal import Decimal
+from datetime import date, timedelta
+import time
+
+class IdempotencyTestCase(TestCase):
+    """Tests for Idempotency-Key handling on money-moving endpoints"""
+
+    def setUp(self):
+        holders.cache.clear()
+        idempotency.cache.clear()
+        self.user = User.objects.create_user(
+            username='idemuser',
+            email='idem@example.com',
+            password='testpass123'
+        )
+        self.account_holder = AccountHolder.objects.create(
+            user=self.user,
+            phone_number='+1234567890',
+            address='123 Retry St',
+            date_of_birth=date(1990, 1, 1)
+        )
+        self.account = Account.objects.create(
+            account_holder=self.account_holder,
+            account_type='CHECKING',
+            balance=Decimal('100.00')
+        )
+        self.savings = Account.objects.create(
+            account_holder=self.account_holder,
+            account_type='SAVINGS',
+            balance=Decimal('0.00')
+        )
+
+        self.client = APIClient()
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+    def deposit(self, key, amount=25):
+        return self.client.post(f'/api/accounts/{self.account.id}/deposit/', {'amount': amount},
+                                format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_replay_returns_original_response(self):
+        first = self.deposit('dep-1')
+        idempotency.cache.clear()
+        second = self.deposit('dep-1')
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('125.00'))
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_cached_replay_skips_database(self):
+        self.deposit('dep-1')
+        with self.assertNumQueries(0):
+            response = self.deposit('dep-1')
+        self.assertEqual(response.data['new_balance'], '125.00')
+
+    def test_key_reused_for_different_request(self):
+        self.deposit('dep-1')
+        response = self.deposit('dep-1', amount=30)
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_transfer_replay(self):
+        data = {'from_account': self.account.id, 'to_account': self.savings.id, 'amount': '40.00'}
+        first = self.client.post('/api/transfers/', data, format='json', HTTP_IDEMPOTENCY_KEY='t-1')
+        second = self.client.post('/api/transfers/', data, format='json', HTTP_IDEMPOTENCY_KEY='t-1')
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.data['transfer_id'], first.data['transfer_id'])
+        self.assertEqual(MoneyTransfer.objects.count(), 1)
+
+    def test_rejected_request_is_replayed(self):
+        first = self.client.post(f'/api/accounts/{self.account.id}/withdraw/', {'amount': 500},
+                                 format='json', HTTP_IDEMPOTENCY_KEY='w-1')
+        self.deposit('dep-1', amount=1000)
+        second = self.client.post(f'/api/accounts/{self.account.id}/withdraw/', {'amount': 500},
+                                  format='json', HTTP_IDEMPOTENCY_KEY='w-1')
+        self.assertEqual(first.status_code, 400)
+        self.assertEqual(second.status_code, 400)
+        self.assertEqual(second.data, {'error': 'Insufficient funds'})
+
+    def test_in_progress_key_conflicts(self):
+        self.deposit('dep-1')
+        IdempotencyKey.objects.update(status_code=None, response_body=None)
+        idempotency.cache.clear()
+
+        response = self.deposit('dep-1')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    @override_settings(BANKING_IDEMPOTENCY_LEASE=60)
+    def test_abandoned_claim_is_reclaimed_after_its_lease(self):
+        # The request dies after its posting commits, before storing the response
+        with mock.patch('banking.idempotency._store'):
+            self.deposit('dep-1')
+        claim = IdempotencyKey.objects.get()
+        self.assertIsNone(claim.status_code)
+        self.assertLessEqual(claim.expires_at, timezone.now() + timedelta(seconds=60))
+        self.assertEqual(self.deposit('dep-1').status_code, 409)
+
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        response = self.deposit('dep-1')
+        self.assertEqual(response.status_code, 200)
+        stored = IdempotencyKey.objects.get()
+        self.assertEqual(stored.status_code, 200)
+        self.assertGreater(stored.expires_at, timezone.now() + timedelta(hours=23))
+
+    def test_keys_are_scoped_per_user(self):
+        other = User.objects.create_user(username='other', password='testpass123')
+        IdempotencyKey.objects.create(
+            user=other, key='dep-1', fingerprint='x', status_code=200, response_body={},
+            expires_at=timezone.now() + timedelta(hours=1)
+        )
+        self.assertEqual(self.deposit('dep-1').data['new_balance'], '125.00')
+
+    def test_expired_key_is_purged_and_reclaimed(self):
+        self.deposit('dep-1')
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        idempotency.cache.clear()
+
+        self.assertEqual(self.deposit('dep-1').data['new_balance'], '150.00')
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(idempotency.purge(), 1)
+
+    def test_requests_without_key_are_not_recorded(self):
+        self.deposit('')
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+
+class ConcurrentIdempotencyTestCase(TransactionTestCase):
+    """The same key fired concurrently posts exactly once"""
+
+    def setUp(self):
+        holders.cache.clear()
+        idempotency.cache.clear()
+        self.user = User.objects.create_user(username='raceuser', password='testpass123')
+        holder = AccountHolder.objects.create(
+            user=self.user,
+            phone_number='+1234567890',
+            address='123 Race St',
+            date_of_birth=date(1990, 1, 1)
+        )
+        self.account = Account.objects.create(
+            account_holder=holder, account_type='CHECKING', balance=Decimal('100.00')
+        )
+        self.token = RefreshToken.for_user(self.user).access_token
+
+    def test_concurrent_retries_post_once(self):
+        statuses = []
+
+        def retry(index):
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+            for _ in range(100):
+                try:
+                    response = client.post(f'/api/accounts/{self.account.id}/deposit/', {'amount': 10},
+                                           format='json', HTTP_IDEMPOTENCY_KEY='race-1')
+                except OperationalError:
+                    response = None
+                # The shared in-memory test database reports lock contention
+                # instead of waiting; retry like a client would.
+                if response is None or response.status_code == 503:
+                    time.sleep(0.01)
+                    continue
+                statuses.append(response.status_code)
+                return
+
+        elapsed, errors = run_threads(retry, 8)
+
+        self.assertEqual(errors, [])
+        self.assertEqual(statuses.count(200) + statuses.count(409), 8)
+        self.assertGreaterEqual(statuses.count(200), 1)
+        self.assertEqual(Transaction.objects.count(), 1)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('110.00'))
@@ -0,0 +1,158 @@
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from banking import checkpoints, holders, ingestion, ledger
+from banking.models import AccountHolder, Account, Transaction, DailyBalance
+from decimal import Decimal
+from datetime import date
+from django.utils import timezone
+from unittest import mock
+
+class IngestionTestCase(TestCase):
+    """Tests for batch settlement ingestion"""
+
+    def setUp(self):
+        holders.cache.clear()
+        self.user = User.objects.create_user(
+            username='ingestuser',
+            email='ingest@example.com',
+            password='testpass123'
+        )
+        self.account_holder = AccountHolder.objects.create(
+            user=self.user,
+            phone_number='+1234567890',
+            address='123 Ingest St',
+            date_of_birth=date(1990, 1, 1)
+        )
+        self.account = Account.objects.create(
+            account_holder=self.account_holder,
+            account_type='CHECKING',
+            balance=Decimal('100.00')
+        )
+        self.other = Account.objects.create(
+            account_holder=self.account_holder,
+            account_type='SAVINGS',
+            balance=Decimal('0.00')
+        )
+
+    def test_applies_net_change_with_running_balances(self):
+        result = ingestion.ingest([
+            {'account': self.account.id, 'type': 'DEPOSIT', 'amount': '50.00'},
+            {'account': self.other.id, 'type': 'DEPOSIT', 'amount': '5.00'},
+            {'account': self.account.id, 'type': 'WITHDRAWAL', 'amount': '30.00', 'reference_number': 'ACH1'},
+            {'account_number': self.account.account_number, 'type': 'deposit', 'amount': '1.50'},
+        ])
+
+        self.assertEqual(result.applied, 4)
+        self.assertEqual(result.failures, [])
+        self.account.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('121.50'))
+        self.assertEqual(self.other.balance, Decimal('5.00'))
+        entries = Transaction.objects.filter(account=self.account).order_by('id')
+        self.assertEqual([entry.balance_after for entry in entries],
+                         [Decimal('150.00'), Decimal('120.00'), Decimal('121.50')])
+        self.assertEqual(entries[1].reference_number, 'ACH1')
+        self.assertEqual(DailyBalance.objects.get(account=self.account).closing_balance, Decimal('121.50'))
+
+    def test_bad_lines_fail_individually(self):
+        result = ingestion.ingest([
+            {'account': self.account.id, 'type': 'WITHDRAWAL', 'amount': '500.00'},
+            {'account': 999999, 'type': 'DEPOSIT', 'amount': '1.00'},
+            {'account': self.account.id, 'type': 'DEPOSIT', 'amount': 'abc'},
+            {'account': self.account.id, 'type': 'FEE', 'amount': '1.00'},
+            {'account': self.account.id, 'type': 'WITHDRAWAL', 'amount': '40.00'},
+        ], chunk_size=2)
+
+        self.assertEqual(result.applied, 1)
+        self.assertEqual([(failure['line'], failure['error']) for failure in result.failures], [
+            (1, 'Insufficient funds'),
+            (2, 'Account not found'),
+            (3, 'Invalid amount'),
+            (4, 'Type must be DEPOSIT or WITHDRAWAL'),
+        ])
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('60.00'))
+
+    def test_zero_net_change_checks_the_real_balance(self):
+        resolve = ingestion._resolve_accounts
+
+        def stale(refs):
+            resolved = resolve(refs)
+            # Another posting lands after the batch read the balance
+            ledger.credit(self.account.id, Decimal('50.00'))
+            return resolved
+
+        with mock.patch.object(ingestion, '_resolve_accounts', stale):
+            result = ingestion.ingest([
+                {'account': self.account.id, 'type': 'WITHDRAWAL', 'amount': '10.00', 'reference_number': 'ACH'},
+                {'account': self.account.id, 'type': 'DEPOSIT', 'amount': '10.00', 'reference_number': 'ACH'},
+            ])
+
+        self.assertEqual(result.failures, [])
+        entries = Transaction.objects.filter(reference_number='ACH').order_by('id')
+        self.assertEqual([entry.balance_after for entry in entries], [Decimal('140.00'), Decimal('150.00')])
+        self.assertEqual(checkpoints.balance_as_of(self.account, timezone.localdate()), Decimal('150.00'))
+
+    def test_parse_formats(self):
+        csv_lines = ingestion.parse(b'account,type,amount\n1,DEPOSIT,2.00\n')
+        ndjson_lines = ingestion.parse('{"account": 1, "type": "DEPOSIT", "amount": "2.00"}\n')
+        self.assertEqual(csv_lines, [{'account': '1', 'type': 'DEPOSIT', 'amount': '2.00'}])
+        self.assertEqual(ndjson_lines[0]['amount'], '2.00')
+
+    def test_endpoint_is_staff_only(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+        response = client.post('/api/ingest/transactions/', [], format='json')
+        self.assertEqual(response.status_code, 403)
+
+    def test_demoted_staff_token_is_refused(self):
+        ops = User.objects.create_user(username='demoted', password='testpass123', is_staff=True)
+        client = APIClient()
+        login = client.post('/api/auth/login/', {'username': 'demoted', 'password': 'testpass123'}, format='json')
+        ops.is_staff = False
+        ops.save()
+
+        # The refreshed token still claims is_staff
+        refreshed = client.post('/api/auth/refresh/', {'refresh': login.data['refresh']}, format='json')
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {refreshed.data["access"]}')
+        response = client.post('/api/ingest/transactions/', [], format='json')
+        self.assertEqual(response.status_code, 403)
+
+    def test_endpoint_accepts_file(self):
+        User.objects.create_user(username='ops', password='testpass123', is_staff=True)
+        client = APIClient()
+        login = client.post('/api/auth/login/', {'username': 'ops', 'password': 'testpass123'}, format='json')
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {login.data["access"]}')
+
+        upload = SimpleUploadedFile('settlement.csv', (
+            'account,type,amount\n'
+            f'{self.account.id},DEPOSIT,10.00\n'
+            f'{self.account.id},WITHDRAWAL,1000.00\n'
+        ).encode())
+        response = client.post('/api/ingest/transactions/', {'file': upload}, format='multipart')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['applied'], 1)
+        self.assertEqual(response.data['failures'], [{'line': 2, 'error': 'Insufficient funds'}])
+
+    def test_idempotency_key_covers_file_contents(self):
+        User.objects.create_user(username='ops', password='testpass123', is_staff=True)
+        client = APIClient()
+        login = client.post('/api/auth/login/', {'username': 'ops', 'password': 'testpass123'}, format='json')
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {login.data["access"]}')
+
+        def upload(amount):
+            content = f'account,type,amount\n{self.account.id},DEPOSIT,{amount}\n'.encode()
+            return client.post('/api/ingest/transactions/', {'file': SimpleUploadedFile('settlement.csv', content)},
+                               format='multipart', HTTP_IDEMPOTENCY_KEY='settlement-1')
+
+        self.assertEqual(upload('10.00').data['applied'], 1)
+        replayed = upload('10.00')
+        self.assertEqual(replayed['Idempotent-Replayed'], 'true')
+        # Same file name, different file
+        self.assertEqual(upload('20.00').status_code, 422)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('110.00'))
@@ -0,0 +1,163 @@
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.contrib.auth.models import User
+from django.db import OperationalError
+from banking import ledger
+from banking.models import AccountHolder, Account, Transaction, MoneyTransfer
+from decimal import Decimal
+from datetime import date
+from unittest import mock
+
+class LedgerTestCase(TestCase):
+    """Tests for the conditional-UPDATE balance mutation service"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='ledgeruser',
+            email='ledger@example.com',
+            password='testpass123'
+        )
+        self.account_holder = AccountHolder.objects.create(
+            user=self.user,
+            phone_number='+1234567890',
+            address='123 Ledger St',
+            date_of_birth=date(1990, 1, 1)
+        )
+        self.account = Account.objects.create(
+            account_holder=self.account_holder,
+            account_type='CHECKING',
+            balance=Decimal('100.00')
+        )
+
+    def test_credit_returns_new_balance(self):
+        entry = ledger.credit(self.account.id, Decimal('25.50'), description='Paycheck')
+
+        self.assertEqual(entry.balance_after, Decimal('125.50'))
+        self.assertEqual(entry.transaction_type, 'DEPOSIT')
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('125.50'))
+
+    def test_debit_returns_new_balance(self):
+        entry = ledger.debit(self.account.id, Decimal('40.00'))
+
+        self.assertEqual(entry.balance_after, Decimal('60.00'))
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('60.00'))
+
+    def test_debit_insufficient_funds_leaves_balance(self):
+        with self.assertRaises(ledger.InsufficientFunds):
+            ledger.debit(self.account.id, Decimal('100.01'))
+
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('100.00'))
+        self.assertFalse(Transaction.objects.filter(account=self.account).exists())
+
+    def test_debit_entire_balance(self):
+        entry = ledger.debit(self.account.id, Decimal('100.00'))
+        self.assertEqual(entry.balance_after, Decimal('0.00'))
+
+    def test_holder_mismatch_is_not_found(self):
+        with self.assertRaises(Account.DoesNotExist):
+            ledger.credit(self.account.id, Decimal('1.00'), holder_id=self.account_holder.id + 1)
+        with self.assertRaises(Account.DoesNotExist):
+            ledger.debit(self.account.id, Decimal('1.00'), holder_id=self.account_holder.id + 1)
+
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('100.00'))
+
+    def test_missing_account(self):
+        with self.assertRaises(Account.DoesNotExist):
+            ledger.debit(99999, Decimal('1.00'))
+
+    def test_repeated_postings_accumulate(self):
+        for _ in range(10):
+            ledger.credit(self.account.id, Decimal('0.10'))
+
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('101.00'))
+        self.assertEqual(Transaction.objects.filter(account=self.account).count(), 10)
+
+class TransferEngineTestCase(TransactionTestCase):
+    """Tests for the lock-ordered transfer engine"""
+
+    def setUp(self):
+        user = User.objects.create_user(username='engineuser', password='testpass123')
+        self.account_holder = AccountHolder.objects.create(
+            user=user,
+            phone_number='+1234567890',
+            address='123 Engine St',
+            date_of_birth=date(1990, 1, 1)
+        )
+        # Create the destination first so the source has the higher id and
+        # the engine has to apply the credit leg before the debit leg.
+        self.to_account = Account.objects.create(
+            account_holder=self.account_holder,
+            account_type='SAVINGS',
+            balance=Decimal('50.00')
+        )
+        self.from_account = Account.objects.create(
+            account_holder=self.account_holder,
+            account_type='CHECKING',
+            balance=Decimal('100.00')
+        )
+
+    def test_transfer_moves_funds_and_records_legs(self):
+        money_transfer = ledger.transfer(self.from_account, self.to_account, Decimal('30.00'),
+                                         description='Rent')
+
+        self.assertEqual(money_transfer.status, 'COMPLETED')
+        self.assertIsNotNone(money_transfer.completed_at)
+        self.from_account.refresh_from_db()
+        self.to_account.refresh_from_db()
+        self.assertEqual(self.from_account.balance, Decimal('70.00'))
+        self.assertEqual(self.to_account.balance, Decimal('80.00'))
+
+        legs = Transaction.objects.filter(reference_number=money_transfer.transfer_id)
+        self.assertEqual(legs.get(transaction_type='TRANSFER_OUT').balance_after, Decimal('70.00'))
+        self.assertEqual(legs.get(transaction_type='TRANSFER_IN').balance_after, Decimal('80.00'))
+
+    def test_insufficient_funds_rolls_back_credit_leg(self):
+        with self.assertRaises(ledger.InsufficientFunds):
+            ledger.transfer(self.from_account, self.to_account, Decimal('100.01'))
+
+        self.to_account.refresh_from_db()
+        self.assertEqual(self.to_account.balance, Decimal('50.00'))
+        self.assertEqual(MoneyTransfer.objects.count(), 0)
+        self.assertEqual(Transaction.objects.count(), 0)
+
+    def test_same_account_rejected(self):
+        with self.assertRaises(ValueError):
+            ledger.transfer(self.from_account, self.from_account, Decimal('1.00'))
+
+    @override_settings(BANKING_TRANSFER_BACKOFF=0)
+    def test_retries_when_database_is_locked(self):
+        real_transfer = ledger._transfer_once
+        calls = []
+
+        def flaky(*args):
+            calls.append(args)
+            if len(calls) < 3:
+                raise OperationalError('database is locked')
+            return real_transfer(*args)
+
+        with mock.patch.object(ledger, '_transfer_once', side_effect=flaky):
+            ledger.transfer(self.from_account, self.to_account, Decimal('10.00'))
+
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(MoneyTransfer.objects.count(), 1)
+
+    @override_settings(BANKING_TRANSFER_RETRIES=2, BANKING_TRANSFER_BACKOFF=0)
+    def test_gives_up_after_bounded_retries(self):
+        error = OperationalError('database is locked')
+        with mock.patch.object(ledger, '_transfer_once', side_effect=error) as attempt:
+            with self.assertRaises(OperationalError):
+                ledger.transfer(self.from_account, self.to_account, Decimal('10.00'))
+
+        self.assertEqual(attempt.call_count, 3)
+
+    def test_other_operational_errors_not_retried(self):
+        error = OperationalError('no such table: banking_account')
+        with mock.patch.object(ledger, '_transfer_once', side_effect=error) as attempt:
+            with self.assertRaises(OperationalError):
+                ledger.transfer(self.from_account, self.to_account, Decimal('10.00'))
+
+        self.assertEqual(attempt.call_count, 1)
@@ -0,0 +1,158 @@
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.db import connections
+from rest_framework.test import APIClient
+from banking import benchmarks, holders, sharding
+from banking.models import AccountHolder, Account, Transaction, MoneyTransfer
+from contextlib import contextmanager
+from unittest import mock
+import os
+import shutil
+import tempfile
+
+LEDGER = 'ledger_under_test'
+
+class ScratchDatabaseTestCase(SimpleTestCase):
+    """Benchmarks swap out every database that ledger rows can reach"""
+
+    def scratched(self):
+        swapped = []
+
+        @contextmanager
+        def scratch(alias):
+            swapped.append(alias)
+            yield f'/tmp/{alias}.sqlite3'
+
+        with mock.patch.object(benchmarks, '_scratch', scratch), benchmarks.scratch_database() as path:
+            self.assertEqual(path, '/tmp/default.sqlite3')
+        return swapped
+
+    def test_single_database(self):
+        self.assertEqual(self.scratched(), ['default'])
+
+    @override_settings(BANKING_SHARDS=[LEDGER])
+    def test_ledger_database(self):
+        self.assertEqual(self.scratched(), ['default', LEDGER])
+
+    @override_settings(BANKING_SHARDS=['default', 'shard1', 'shard2'])
+    def test_shards(self):
+        self.assertEqual(self.scratched(), ['default', 'shard1', 'shard2'])
+
+@override_settings(BANKING_SHARDS=[LEDGER])
+class LedgerDatabaseTestCase(TransactionTestCase):
+    """
+    The ledger in a real second SQLite file of its own, with users, holders
+    and sessions left on ``default``.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.mkdtemp(prefix='banking-ledger-')
+        connections.settings[LEDGER] = connections.configure_settings({
+            'default': dict(connections.settings['default']),
+            LEDGER: {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': os.path.join(cls.directory, 'ledger.sqlite3'),
+            },
+        })[LEDGER]
+        call_command('migrate', database=LEDGER, verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        connections[LEDGER].close()
+        del connections[LEDGER]
+        del connections.settings[LEDGER]
+        shutil.rmtree(cls.directory, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        holders.cache.clear()
+        self.client = APIClient()
+
+    def tearDown(self):
+        call_command('flush', database=LEDGER, interactive=False, verbosity=0)
+
+    def tables(self, alias):
+        return set(connections[alias].introspection.table_names())
+
+    def test_ledger_database_holds_only_ledger_tables(self):
+        self.assertTrue(sharding.is_routed())
+        self.assertFalse(sharding.is_sharded())
+        ledger_tables = self.tables(LEDGER)
+        for model in (Account, Transaction, MoneyTransfer):
+            self.assertIn(model._meta.db_table, ledger_tables)
+        for table in ('auth_user', 'django_session', 'django_admin_log', 'banking_accountholder'):
+            self.assertNotIn(table, ledger_tables)
+
+    def test_banking_workflow_writes_the_ledger_database(self):
+        response = self.client.post('/api/auth/signup/', {
+            'user': {
+                'username': 'ledgeruser',
+                'email': 'ledger@example.com',
+                'first_name': 'Ledger',
+                'last_name': 'User',
+                'password': 'testpass123',
+                'password_confirm': 'testpass123'
+            },
+            'phone_number': '+1234567890',
+            'address': '123 Ledger St',
+            'date_of_birth': '1990-01-01'
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        response = self.client.post('/api/auth/login/', {
+            'username': 'ledgeruser',
+            'password': 'testpass123'
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+
+        checking = self.client.post('/api/accounts/', {'account_type': 'CHECKING'}, format='json').data['id']
+        savings = self.client.post('/api/accounts/', {'account_type': 'SAVINGS'}, format='json').data['id']
+        response = self.client.post(f'/api/accounts/{checking}/deposit/', {'amount': '100.00'}, format='json')
+        self.assertEqual(response.data['new_balance'], '100.00')
+        response = self.client.post('/api/transfers/', {
+            'from_account': checking,
+            'to_account': savings,
+            'amount': '40.00',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['status'], 'COMPLETED')
+
+        response = self.client.get(f'/api/accounts/{checking}/transactions/')
+        self.assertEqual(len(response.data['results']), 2)
+        response = self.client.get('/api/accounts/')
+        self.assertEqual(sorted(row['balance'] for row in response.data['results']), ['40.00', '60.00'])
+
+        self.assertEqual(User.objects.using('default').filter(username='ledgeruser').count(), 1)
+        self.assertEqual(AccountHolder.objects.using('default').count(), 1)
+        self.assertEqual(Account.objects.using(LEDGER).count(), 2)
+        self.assertEqual(Transaction.objects.using(LEDGER).count(), 3)
+        self.assertEqual(MoneyTransfer.objects.using(LEDGER).count(), 1)
+        for model in (Account, Transaction, MoneyTransfer):
+            self.assertFalse(model.objects.using('default').exists())
+
+    def test_admin_reads_the_ledger_database(self):
+        user = User.objects.create_user(username='ledgerholder', password='testpass123')
+        holder = AccountHolder.objects.create(
+            user=user,
+            phone_number='+1234567890',
+            address='123 Ledger St',
+            date_of_birth='1990-01-01'
+        )
+        account = Account.objects.create(account_holder=holder, account_type='CHECKING')
+        self.assertEqual(account._state.db, LEDGER)
+        User.objects.create_user(username='ledgerops', password='testpass123', is_staff=True, is_superuser=True)
+
+        admin = APIClient()
+        admin.login(username='ledgerops', password='testpass123')
+        self.assertEqual(Session.objects.using('default').count(), 1)
+        response = admin.get('/admin/banking/account/')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, account.account_number)
+        response = admin.get('/admin/banking/account/', {'q': account.account_number})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, account.account_number)
@@ -0,0 +1,114 @@
+from django.test import TestCase, SimpleTestCase
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from banking import holders, metrics
+from banking.metrics import Registry
+from banking.models import AccountHolder, Account
+from decimal import Decimal
+from datetime import date
+import threading
+
+class RegistryTestCase(SimpleTestCase):
+    """Unit tests for the sharded registry and the text format"""
+
+    def test_threads_record_into_their_own_shards(self):
+        registry = Registry()
+
+        def record():
+            for _ in range(100):
+                registry.observe('transactions', 'GET', 200, 0.004, queries=2, query_seconds=0.001)
+
+        threads = [threading.Thread(target=record) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        series = registry.snapshot()[('transactions', 'GET')]
+        self.assertEqual(series.count, 400)
+        self.assertEqual(series.queries, 800)
+        self.assertEqual(series.statuses, {200: 400})
+        # Exited threads' shards are folded into the retired total
+        self.assertEqual(registry._shards, [])
+
+    def test_thread_per_request_servers_do_not_grow_the_shards(self):
+        registry = Registry()
+        registry.observe('transactions', 'GET', 200, 0.004)
+        for _ in range(50):
+            thread = threading.Thread(target=registry.observe, args=('transactions', 'GET', 200, 0.004))
+            thread.start()
+            thread.join()
+
+        self.assertEqual(len(registry._shards), 1)
+        self.assertEqual(registry.snapshot()[('transactions', 'GET')].count, 51)
+        registry.clear()
+        self.assertEqual(registry.snapshot(), {})
+
+    def test_render_histogram_is_cumulative(self):
+        registry = Registry()
+        registry.observe('deposit', 'POST', 200, 0.003, response_bytes=10)
+        registry.observe('deposit', 'POST', 400, 0.2, response_bytes=5)
+
+        text = metrics.render(registry.snapshot())
+        self.assertIn('banking_http_request_duration_seconds_bucket{endpoint="deposit",method="POST",le="0.005"} 1', text)
+        self.assertIn('banking_http_request_duration_seconds_bucket{endpoint="deposit",method="POST",le="0.25"} 2', text)
+        self.assertIn('banking_http_request_duration_seconds_bucket{endpoint="deposit",method="POST",le="+Inf"} 2', text)
+        self.assertIn('banking_http_request_duration_seconds_count{endpoint="deposit",method="POST"} 2', text)
+        self.assertIn('banking_http_requests_total{endpoint="deposit",method="POST",status="400"} 1', text)
+        self.assertIn('banking_http_response_bytes_total{endpoint="deposit",method="POST"} 15', text)
+
+class MetricsMiddlewareTestCase(TestCase):
+    """Requests are recorded under their URL name and served at /metrics"""
+
+    def setUp(self):
+        holders.cache.clear()
+        metrics.registry.clear()
+        self.user = User.objects.create_user(
+            username='metricsuser',
+            email='metrics@example.com',
+            password='testpass123'
+        )
+        self.account_holder = AccountHolder.objects.create(
+            user=self.user,
+            phone_number='+1234567890',
+            address='123 Metrics St',
+            date_of_birth=date(1990, 1, 1)
+        )
+        self.account = Account.objects.create(
+            account_holder=self.account_holder,
+            account_type='CHECKING',
+            balance=Decimal('100.00')
+        )
+        self.client = APIClient()
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+    def test_records_latency_queries_and_size_per_url_name(self):
+        self.client.get(f'/api/accounts/{self.account.id}/transactions/')
+        response = self.client.post(f'/api/accounts/{self.account.id}/deposit/', {'amount': 5}, format='json')
+        self.client.get('/api/no-such-endpoint/')
+
+        snapshot = metrics.registry.snapshot()
+        deposit = snapshot[('deposit', 'POST')]
+        self.assertEqual(deposit.count, 1)
+        self.assertEqual(deposit.statuses, {200: 1})
+        self.assertGreater(deposit.queries, 0)
+        self.assertGreater(deposit.query_seconds, 0)
+        self.assertEqual(deposit.response_bytes, len(response.content))
+        self.assertIn(('transactions', 'GET'), snapshot)
+        self.assertEqual(snapshot[(metrics.UNMATCHED, 'GET')].statuses, {404: 1})
+
+    def test_metrics_endpoint(self):
+        self.client.get(f'/api/accounts/{self.account.id}/transactions/')
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        body = response.content.decode()
+        self.assertIn('# TYPE banking_http_request_duration_seconds histogram', body)
+        self.assertIn('banking_db_queries_total{endpoint="transactions",method="GET"}', body)
+
+    def test_metrics_endpoint_is_internal_only(self):
+        response = self.client.get('/metrics', REMOTE_ADDR='203.0.113.9')
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,103 @@
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from banking.models import AccountHolder, Account, Transaction
+from decimal import Decimal
+from datetime import date, timedelta
+
+class KeysetPaginationTestCase(TestCase):
+    """Tests for cursor pagination of the transaction ledger"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='pageuser',
+            email='page@example.com',
+            password='testpass123'
+        )
+        self.account_holder = AccountHolder.objects.create(
+            user=self.user,
+            phone_number='+1234567890',
+            address='123 Page St',
+            date_of_birth=date(1990, 1, 1)
+        )
+        self.account = Account.objects.create(
+            account_holder=self.account_holder,
+            account_type='CHECKING'
+        )
+        Transaction.objects.bulk_create([
+            Transaction(
+                transaction_id=Transaction.generate_transaction_id(),
+                account=self.account,
+                transaction_type='DEPOSIT',
+                amount=Decimal('1.00'),
+                balance_after=Decimal(i + 1)
+            )
+            for i in range(45)
+        ])
+        # Spread rows over time but leave runs of identical timestamps so the
+        # id tie-break is exercised.
+        base = timezone.now() - timedelta(days=1)
+        for i, pk in enumerate(Transaction.objects.order_by('id').values_list('id', flat=True)):
+            Transaction.objects.filter(pk=pk).update(created_at=base + timedelta(minutes=i // 4))
+        self.expected = list(
+            Transaction.objects.order_by('-created_at', '-id').values_list('id', flat=True)
+        )
+
+        self.client = APIClient()
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        self.url = f'/api/accounts/{self.account.id}/transactions/'
+
+    def walk(self, url, link):
+        ids, pages = [], []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append(response.data)
+            ids.extend(row['id'] for row in response.data['results'])
+            url = response.data[link]
+        return ids, pages
+
+    def test_forward_walk_returns_every_row_once(self):
+        ids, pages = self.walk(self.url, 'next')
+
+        self.assertEqual(ids, self.expected)
+        self.assertEqual([len(p['results']) for p in pages], [20, 20, 5])
+        self.assertIsNone(pages[0]['previous'])
+        self.assertNotIn('count', pages[0])
+
+    def test_backward_walk_from_last_page(self):
+        _, pages = self.walk(self.url, 'next')
+        ids, back_pages = self.walk(pages[-1]['previous'], 'previous')
+
+        self.assertEqual(ids, self.expected[20:40] + self.expected[:20])
+        self.assertIsNotNone(back_pages[-1]['next'])
+
+    def test_cursor_is_opaque(self):
+        response = self.client.get(self.url)
+        cursor = response.data['next'].split('cursor=')[1]
+
+        self.assertNotIn(str(self.expected[19]), cursor)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_deep_pages_cost_the_same(self):
+        response = self.client.get(self.url)
+        second = response.data['next']
+
+        # The account version lookup plus the page
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+        with self.assertNumQueries(2):
+            self.client.get(second)
+
+    def test_page_number_mode_for_old_clients(self):
+        response = self.client.get(self.url, {'page': 3})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 45)
+        self.assertEqual([row['id'] for row in response.data['results']], self.expected[40:])
@@ -2,7 +2,7 @@ from django.test import TestCase
 from django.contrib.auth.models import User
 from rest_framework.test import APIClient
 from rest_framework_simplejwt.tokens import RefreshToken
-from banking.models import AccountHolder, Account, Transaction
+from banking.models import AccountHolder, Account, Transaction, Card
 from decimal import Decimal
 from datetime import date
 
@@ -105,6 +105,18 @@ class PermissionTestCase(TestCase):
         response = self.client.post('/api/transfers/', transfer_data, format='json')
         self.assertEqual(response.status_code, 400)
 
+    def test_user_cannot_move_card_to_other_user_account(self):
+        """Test that a card cannot be reassigned to another user's account"""
+        card = Card.objects.create(account=self.account1, card_type='DEBIT', cardholder_name='User One',
+                                   expiry_date=date(2030, 1, 1), cvv='123')
+        token = self.get_token_for_user(self.user1)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+        response = self.client.patch(f'/api/cards/{card.id}/', {'account': self.account2.id}, format='json')
+        self.assertEqual(response.status_code, 400)
+        card.refresh_from_db()
+        self.assertEqual(card.account_id, self.account1.id)
+
     def test_user_cannot_see_other_user_transactions(self):
         """Test that user cannot see another user's transactions"""
         token = self.get_token_for_user(self.user1)
@@ -0,0 +1,135 @@
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.conf import settings
+from rest_framework.test import APIClient
+from banking import holders, profiling
+from banking.authentication import BankingTokenObtainPairSerializer
+from banking.models import AccountHolder, Account
+from decimal import Decimal
+from datetime import date
+import json
+import os
+import pstats
+import shutil
+import tempfile
+
+class ProfilingTestCase(TestCase):
+    """Sampled and staff-requested requests are profiled and listed in the admin"""
+
+    def setUp(self):
+        holders.cache.clear()
+        self.directory = tempfile.mkdtemp(prefix='banking-profiles-')
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.user = User.objects.create_user(
+            username='profileuser',
+            email='profile@example.com',
+            password='testpass123'
+        )
+        self.account_holder = AccountHolder.objects.create(
+            user=self.user,
+            phone_number='+1234567890',
+            address='123 Profile St',
+            date_of_birth=date(1990, 1, 1)
+        )
+        self.account = Account.objects.create(
+            account_holder=self.account_holder,
+            account_type='CHECKING',
+            balance=Decimal('100.00')
+        )
+        self.staff = User.objects.create_user(username='profileops', password='testpass123', is_staff=True)
+        self.url = f'/api/accounts/{self.account.id}/transactions/'
+
+    def profiled(self, **overrides):
+        options = dict(BANKING_PROFILE_ENABLED=True, BANKING_PROFILE_DIR=self.directory,
+                       BANKING_PROFILE_SAMPLE_RATE=0.0, BANKING_PROFILE_KEEP=100)
+        options.update(overrides)
+        return override_settings(**options)
+
+    def client_for(self, user):
+        client = APIClient()
+        token = BankingTokenObtainPairSerializer.get_token(user).access_token
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        return client
+
+    def saved(self):
+        return sorted(os.listdir(self.directory))
+
+    def test_disabled_middleware_is_removed(self):
+        self.assertIn('banking.profiling.ProfilingMiddleware', settings.MIDDLEWARE)
+        response = self.client_for(self.user).get(self.url, HTTP_X_PROFILE_REQUEST='1')
+        self.assertNotIn(profiling.RESPONSE_HEADER, response)
+        self.assertEqual(self.saved(), [])
+
+    def test_staff_header_writes_profile_and_sql(self):
+        with self.profiled():
+            # The header only counts on a staff token
+            response = self.client_for(self.user).get(self.url, HTTP_X_PROFILE_REQUEST='1')
+            self.assertNotIn(profiling.RESPONSE_HEADER, response)
+            self.assertEqual(self.saved(), [])
+
+            client = self.client_for(self.staff)
+            response = client.get('/api/ingest/transactions/', HTTP_X_PROFILE_REQUEST='1')
+
+        profile_id = response[profiling.RESPONSE_HEADER]
+        self.assertEqual(self.saved(), [profile_id + '.json', profile_id + '.prof'])
+        pstats.Stats(os.path.join(self.directory, profile_id + '.prof'))
+        with open(os.path.join(self.directory, profile_id + '.json')) as f:
+            data = json.load(f)
+        self.assertEqual(data['endpoint'], 'ingest-transactions')
+        self.assertEqual(data['status'], 405)
+        self.assertEqual(data['query_count'], len(data['queries']))
+
+    def test_sql_is_logged_without_parameter_values(self):
+        with self.profiled():
+            response = self.client_for(self.staff).post('/api/auth/login/', {
+                'username': 'profileops', 'password': 'testpass123'
+            }, format='json', HTTP_X_PROFILE_REQUEST='1')
+
+        self.assertEqual(response.status_code, 200)
+        with open(os.path.join(self.directory, response[profiling.RESPONSE_HEADER] + '.json')) as f:
+            data = json.load(f)
+        login = [query for query in data['queries'] if 'auth_user' in query['sql']]
+        self.assertTrue(login)
+        self.assertNotIn('profileops', json.dumps(data['queries']))
+        self.assertNotIn('params', login[0])
+        self.assertGreater(login[0]['param_count'], 0)
+
+    def test_demoted_staff_header_is_ignored(self):
+        client = self.client_for(self.staff)
+        self.staff.is_staff = False
+        self.staff.save()
+        with self.profiled():
+            response = client.get('/api/ingest/transactions/', HTTP_X_PROFILE_REQUEST='1')
+        self.assertNotIn(profiling.RESPONSE_HEADER, response)
+        self.assertEqual(self.saved(), [])
+
+    def test_sampled_requests_rotate(self):
+        client = self.client_for(self.user)
+        with self.profiled(BANKING_PROFILE_SAMPLE_RATE=1.0, BANKING_PROFILE_KEEP=2):
+            for _ in range(3):
+                response = client.get(self.url)
+                self.assertEqual(response.status_code, 200)
+                # Sampled clients are not told about the profile
+                self.assertNotIn(profiling.RESPONSE_HEADER, response)
+
+        profiles = self.saved()
+        self.assertEqual(len(profiles), 4)
+        with open(os.path.join(self.directory, profiles[0])) as f:
+            self.assertGreater(json.load(f)['query_count'], 0)
+
+    def test_admin_lists_and_downloads_profiles(self):
+        with self.profiled(BANKING_PROFILE_SAMPLE_RATE=1.0):
+            self.client_for(self.user).get(self.url)
+            profile_id = self.saved()[0].rsplit('.', 1)[0]
+
+            self.assertEqual(self.client.get('/admin/profiles/').status_code, 302)
+            self.client.force_login(self.staff)
+            response = self.client.get('/admin/profiles/')
+            self.assertContains(response, profile_id)
+            self.assertContains(response, 'transactions')
+
+            response = self.client.get(f'/admin/profiles/{profile_id}.prof')
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('attachment', response['Content-Disposition'])
+            response.close()
+            self.assertEqual(self.client.get('/admin/profiles/..%2Fsettings.py').status_code, 404)
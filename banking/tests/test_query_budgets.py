@@ -0,0 +1,182 @@
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from django.db import connection
+from django.urls import get_resolver
+from django.utils import timezone
+from rest_framework.test import APIClient
+from banking import budgets, holders, idempotency, ledger, statements
+from banking.authentication import BankingTokenObtainPairSerializer, revocations
+from banking.models import AccountHolder, Account, Card, Statement
+from decimal import Decimal
+from datetime import date, timedelta
+
+# Rows seeded per relation at each scale; the larger one overflows a page.
+SCALES = (2, 30)
+
+
+def _page_rows(response):
+    data = getattr(response, 'data', None)
+    if isinstance(data, dict) and isinstance(data.get('results'), list):
+        return len(data['results'])
+    return 0
+
+
+class QueryBudgetTestCase(TestCase):
+    """
+    Calls every URL in banking/urls.py at two data scales and holds each
+    request to its budget in banking.budgets. A request that issues more
+    queries against the larger dataset is an N+1.
+    """
+
+    def setUp(self):
+        holders.cache.clear()
+        revocations.clear()
+        idempotency.cache.clear()
+        self.user = User.objects.create_user(
+            username='budgetuser',
+            email='budget@example.com',
+            password='testpass123'
+        )
+        self.account_holder = AccountHolder.objects.create(
+            user=self.user,
+            phone_number='+1234567890',
+            address='123 Budget St',
+            date_of_birth=date(1990, 1, 1)
+        )
+        self.account = Account.objects.create(
+            account_holder=self.account_holder,
+            account_type='CHECKING',
+            balance=Decimal('100000.00')
+        )
+        self.savings = Account.objects.create(
+            account_holder=self.account_holder,
+            account_type='SAVINGS'
+        )
+        self.staff = User.objects.create_user(username='budgetops', password='testpass123', is_staff=True)
+        self.seeded = 0
+        self.calls = 0
+
+    def seed(self, rows):
+        """Grow every relation the endpoints read to ``rows`` rows."""
+        today = timezone.localdate()
+        for n in range(self.seeded, rows):
+            Account.objects.create(account_holder=self.account_holder, account_type='SAVINGS')
+            Card.objects.create(
+                account=self.account,
+                card_type='DEBIT',
+                cardholder_name='Budget User',
+                expiry_date=today + timedelta(days=1825),
+                cvv='123'
+            )
+            ledger.credit(self.account.id, Decimal('10.00'))
+            ledger.debit(self.account.id, Decimal('1.00'))
+            ledger.transfer(self.account, self.savings, Decimal('1.00'))
+            ledger.transfer(self.savings, self.account, Decimal('0.50'))
+            statements.generate(self.account, today - timedelta(days=n + 1), today)
+        self.seeded = rows
+        # Steady state: holder claims in the token and a warm holder cache
+        self.client = self.client_for(self.user)
+        self.client.get('/api/accounts/')
+
+    def client_for(self, user):
+        client = APIClient()
+        token = BankingTokenObtainPairSerializer.get_token(user)
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token.access_token}')
+        client.refresh_token = str(token)
+        return client
+
+    def requests(self):
+        """(url name, method, path, body, client) for every endpoint."""
+        self.calls += 1
+        n = self.calls
+        account = self.account.id
+        statement = Statement.objects.filter(account=self.account).order_by('-id').values_list('id', flat=True)[0]
+        card = Card.objects.filter(account=self.account).values_list('id', flat=True)[0]
+        today = timezone.localdate().isoformat()
+        leaving = self.client_for(self.user)
+        staff = self.client_for(self.staff)
+        client = self.client
+        return [
+            ('signup', 'post', '/api/auth/signup/', {
+                'user': {'username': f'budgetsignup{n}', 'email': f'signup{n}@example.com',
+                         'password': 'Complex!Pass123', 'password_confirm': 'Complex!Pass123'},
+                'phone_number': '+1234567890', 'address': '1 Signup St', 'date_of_birth': '1990-01-01'
+            }, APIClient()),
+            ('login', 'post', '/api/auth/login/', {'username': 'budgetuser', 'password': 'testpass123'}, APIClient()),
+            ('token_refresh', 'post', '/api/auth/refresh/', {'refresh': leaving.refresh_token}, APIClient()),
+            ('logout', 'post', '/api/auth/logout/', {}, leaving),
+            ('profile', 'get', '/api/profile/', None, client),
+            ('account-list', 'get', '/api/accounts/', None, client),
+            ('account-list', 'post', '/api/accounts/', {'account_type': 'SAVINGS'}, client),
+            ('account-detail', 'get', f'/api/accounts/{account}/', None, client),
+            ('account-detail', 'patch', f'/api/accounts/{account}/', {'is_active': True}, client),
+            ('holder-transaction-export', 'get', '/api/accounts/transactions/export/', None, client),
+            ('transactions', 'get', f'/api/accounts/{account}/transactions/', None, client),
+            ('transaction-export', 'get', f'/api/accounts/{account}/transactions/export/', None, client),
+            ('deposit', 'post', f'/api/accounts/{account}/deposit/', {'amount': '5.00'}, client),
+            ('withdraw', 'post', f'/api/accounts/{account}/withdraw/', {'amount': '1.00'}, client),
+            ('account-balance', 'get', f'/api/accounts/{account}/balance/?date={today}', None, client),
+            ('holder-analytics', 'get', '/api/analytics/', None, client),
+            ('account-analytics', 'get', f'/api/accounts/{account}/analytics/', None, client),
+            ('transfers', 'get', '/api/transfers/', None, client),
+            ('transfers', 'post', '/api/transfers/', {
+                'from_account': account, 'to_account': self.savings.id, 'amount': '1.00'
+            }, client),
+            ('bulk-transfer', 'post', '/api/transfers/bulk/', {
+                'from_account': account,
+                'items': [{'to_account': self.savings.id, 'amount': '1.00'}] * 3
+            }, client),
+            ('ingest-transactions', 'post', '/api/ingest/transactions/', [
+                {'account': account, 'type': 'DEPOSIT', 'amount': '1.00'},
+                {'account': self.savings.id, 'type': 'DEPOSIT', 'amount': '1.00'},
+            ], staff),
+            ('card-list', 'get', '/api/cards/', None, client),
+            ('card-list', 'post', '/api/cards/', {
+                'account': account, 'card_type': 'DEBIT', 'cardholder_name': 'Budget User',
+                'expiry_date': '2030-01-01'
+            }, client),
+            ('card-detail', 'get', f'/api/cards/{card}/', None, client),
+            ('card-detail', 'patch', f'/api/cards/{card}/', {'is_active': True}, client),
+            ('statements', 'get', f'/api/accounts/{account}/statements/', None, client),
+            ('statement-lines', 'get', f'/api/accounts/{account}/statements/{statement}/lines/', None, client),
+            ('generate-statement', 'post', f'/api/accounts/{account}/generate-statement/', {
+                'start_date': today, 'end_date': today
+            }, client),
+            ('async-profile', 'get', '/api/async/profile/', None, client),
+            ('async-account-list', 'get', '/api/async/accounts/', None, client),
+            ('async-transactions', 'get', f'/api/async/accounts/{account}/transactions/', None, client),
+            ('async-statements', 'get', f'/api/async/accounts/{account}/statements/', None, client),
+        ]
+
+    def measure(self, method, path, body, client):
+        with CaptureQueriesContext(connection) as captured:
+            response = getattr(client, method)(path, body, format='json')
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertLess(response.status_code, 300, getattr(response, 'data', response))
+        return len(captured), response
+
+    def test_every_url_has_a_budget(self):
+        names = {pattern.name for pattern in get_resolver('banking.urls').url_patterns}
+        self.assertEqual(names, set(budgets.BUDGETS))
+        self.seed(1)
+        exercised = {(name, method.upper()) for name, method, *_ in self.requests()}
+        declared = {(name, method) for name, methods in budgets.BUDGETS.items() for method in methods}
+        self.assertEqual(exercised, declared)
+
+    def test_query_counts_stay_within_budget_and_flat(self):
+        counts = {}
+        for scale in SCALES:
+            self.seed(scale)
+            for name, method, path, body, client in self.requests():
+                limit = budgets.budget(name, method)
+                queries, response = self.measure(method, path, body, client)
+                rows = _page_rows(response) or (len(body) if isinstance(body, list) else 0)
+                with self.subTest(endpoint=name, method=method, scale=scale):
+                    self.assertLessEqual(queries, limit.limit(rows))
+                counts.setdefault((name, method), []).append(queries)
+
+        for (name, method), (small, large) in counts.items():
+            with self.subTest(endpoint=name, method=method):
+                self.assertLessEqual(large, small, 'query count grows with row count')
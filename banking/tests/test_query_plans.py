@@ -0,0 +1,123 @@
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from django.db import connection
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from banking import ledger, statements
+from banking.models import AccountHolder, Account, Transaction, Card
+from banking.pagination import KeysetPagination
+from decimal import Decimal
+from datetime import date, timedelta
+import unittest
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN is SQLite syntax')
+class QueryPlanTestCase(TestCase):
+    """
+    Runs every hot endpoint, EXPLAINs each SELECT it issued and fails when a
+    banking table is read by full scan or results are sorted in a temp B-tree.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='planuser',
+            email='plan@example.com',
+            password='testpass123'
+        )
+        self.account_holder = AccountHolder.objects.create(
+            user=self.user,
+            phone_number='+1234567890',
+            address='123 Plan St',
+            date_of_birth=date(1990, 1, 1)
+        )
+        self.account = Account.objects.create(
+            account_holder=self.account_holder,
+            account_type='CHECKING'
+        )
+        self.savings = Account.objects.create(
+            account_holder=self.account_holder,
+            account_type='SAVINGS'
+        )
+        for _ in range(3):
+            ledger.credit(self.account.id, Decimal('100.00'))
+            ledger.debit(self.account.id, Decimal('10.00'))
+            ledger.transfer(self.account, self.savings, Decimal('5.00'))
+        Card.objects.create(
+            account=self.account,
+            card_type='DEBIT',
+            cardholder_name='Plan User',
+            expiry_date=date.today() + timedelta(days=1825),
+            cvv='123'
+        )
+        self.statement = statements.generate(self.account, date.today() - timedelta(days=30), date.today())
+
+        self.client = APIClient()
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertPlansUseIndexes(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as captured:
+            response = getattr(self.client, method)(url, data, format='json')
+        self.assertLess(response.status_code, 300, response.data)
+
+        for query in captured.captured_queries:
+            sql = query['sql']
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            for detail in self.explain(sql):
+                with self.subTest(url=url, sql=sql, plan=detail):
+                    self.assertFalse(detail.startswith('SCAN banking_'), 'full table scan')
+                    self.assertNotIn('TEMP B-TREE', detail)
+
+    def test_account_list(self):
+        self.assertPlansUseIndexes('get', '/api/accounts/')
+
+    def test_account_detail(self):
+        self.assertPlansUseIndexes('get', f'/api/accounts/{self.account.id}/')
+
+    def test_transaction_list(self):
+        self.assertPlansUseIndexes('get', f'/api/accounts/{self.account.id}/transactions/')
+
+    def test_transaction_list_cursor_pages(self):
+        url = f'/api/accounts/{self.account.id}/transactions/'
+        paginator = KeysetPagination()
+        paginator.base_url = url
+        boundary = Transaction.objects.filter(account=self.account).order_by('-created_at', '-id')[1]
+
+        self.assertPlansUseIndexes('get', paginator.encode_cursor(boundary.created_at, boundary.pk, reverse=False))
+        self.assertPlansUseIndexes('get', paginator.encode_cursor(boundary.created_at, boundary.pk, reverse=True))
+
+    def test_transaction_list_page_number_mode(self):
+        self.assertPlansUseIndexes('get', f'/api/accounts/{self.account.id}/transactions/?page=1')
+
+    def test_transfer_list(self):
+        self.assertPlansUseIndexes('get', '/api/transfers/')
+
+    def test_card_list(self):
+        self.assertPlansUseIndexes('get', '/api/cards/')
+
+    def test_statement_list(self):
+        self.assertPlansUseIndexes('get', f'/api/accounts/{self.account.id}/statements/')
+
+    def test_statement_lines(self):
+        self.assertPlansUseIndexes('get', f'/api/accounts/{self.account.id}/statements/{self.statement.id}/lines/?after=2')
+
+    def test_generate_statement(self):
+        self.assertPlansUseIndexes(
+            'post', f'/api/accounts/{self.account.id}/generate-statement/',
+            {'start_date': '2020-01-01', 'end_date': '2030-12-31'}
+        )
+
+    def test_balance_as_of(self):
+        self.assertPlansUseIndexes('get', f'/api/accounts/{self.account.id}/balance/?date=2020-01-01')
+
+    def test_deposit(self):
+        self.assertPlansUseIndexes('post', f'/api/accounts/{self.account.id}/deposit/', {'amount': 10})
+
+    def test_withdraw(self):
+        self.assertPlansUseIndexes('post', f'/api/accounts/{self.account.id}/withdraw/', {'amount': 10})
@@ -0,0 +1,145 @@
+from django.test import TestCase
+from django.db import connection
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from banking import holders, ledger, rollups
+from banking.models import AccountHolder, Account, Transaction, DailyRollup
+from decimal import Decimal
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
+
+class DailyRollupTestCase(TestCase):
+    """Tests for per-type daily rollups and the analytics endpoints"""
+
+    def setUp(self):
+        holders.cache.clear()
+        self.user = User.objects.create_user(
+            username='rollupuser',
+            email='rollup@example.com',
+            password='testpass123'
+        )
+        self.account_holder = AccountHolder.objects.create(
+            user=self.user,
+            phone_number='+1234567890',
+            address='123 Rollup St',
+            date_of_birth=date(1990, 1, 1)
+        )
+        self.account = Account.objects.create(
+            account_holder=self.account_holder,
+            account_type='CHECKING',
+            balance=Decimal('100.00')
+        )
+        self.other = Account.objects.create(
+            account_holder=self.account_holder,
+            account_type='SAVINGS',
+            balance=Decimal('0.00')
+        )
+
+        self.client = APIClient()
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+    def test_ledger_writes_maintain_rollups(self):
+        ledger.credit(self.account.id, Decimal('50.00'))
+        ledger.credit(self.account.id, Decimal('25.50'))
+        ledger.debit(self.account.id, Decimal('20.00'))
+        ledger.transfer(self.account, self.other, Decimal('10.00'))
+
+        rollup = {row.transaction_type: (row.count, row.total)
+                  for row in DailyRollup.objects.filter(account=self.account, date=timezone.localdate())}
+        self.assertEqual(rollup, {
+            'DEPOSIT': (2, Decimal('75.50')),
+            'WITHDRAWAL': (1, Decimal('20.00')),
+            'TRANSFER_OUT': (1, Decimal('10.00')),
+        })
+        self.assertEqual(DailyRollup.objects.get(account=self.other).total, Decimal('10.00'))
+
+    def test_monthly_flows(self):
+        today = timezone.localdate()
+        last_month = today.replace(day=1) - timedelta(days=1)
+        DailyRollup.objects.create(account=self.account, date=last_month, transaction_type='DEPOSIT',
+                                   count=3, total=Decimal('300.00'))
+        DailyRollup.objects.create(account=self.account, date=last_month, transaction_type='WITHDRAWAL',
+                                   count=1, total=Decimal('40.00'))
+        ledger.credit(self.account.id, Decimal('10.00'))
+        ledger.transfer(self.account, self.other, Decimal('5.00'))
+
+        flows = rollups.flows([self.account.id], last_month - timedelta(days=40), today)
+
+        self.assertEqual([period['period'] for period in flows['periods']],
+                         [last_month.strftime('%Y-%m'), today.strftime('%Y-%m')])
+        self.assertEqual(flows['periods'][0]['net_flow'], Decimal('260.00'))
+        self.assertEqual(flows['periods'][1]['withdrawals'], Decimal('5.00'))
+        self.assertEqual(flows['totals']['deposits'], Decimal('310.00'))
+        self.assertEqual(flows['totals']['deposit_count'], 4)
+        self.assertEqual(flows['totals']['by_type']['TRANSFER_OUT'], {'count': 1, 'total': Decimal('5.00')})
+
+    def test_flows_read_one_query(self):
+        ledger.credit(self.account.id, Decimal('10.00'))
+        with self.assertNumQueries(1):
+            rollups.flows([self.account.id], timezone.localdate() - timedelta(days=365), timezone.localdate())
+
+    def test_account_analytics_endpoint(self):
+        ledger.credit(self.account.id, Decimal('50.00'))
+        ledger.debit(self.account.id, Decimal('20.00'))
+
+        response = self.client.get(f'/api/accounts/{self.account.id}/analytics/', {'group': 'day'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['periods'][0]['period'], timezone.localdate().isoformat())
+        self.assertEqual(response.data['totals']['net_flow'], '30.00')
+        self.assertEqual(response.data['totals']['by_type']['DEPOSIT'], {'count': 1, 'total': '50.00'})
+
+    def test_holder_analytics_spans_accounts(self):
+        ledger.credit(self.account.id, Decimal('50.00'))
+        ledger.transfer(self.account, self.other, Decimal('20.00'))
+
+        response = self.client.get('/api/analytics/', {'group': 'total'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['periods'], [])
+        self.assertEqual(response.data['totals']['deposits'], '70.00')
+        self.assertEqual(response.data['totals']['net_flow'], '50.00')
+
+    def test_analytics_rejects_foreign_account_and_bad_group(self):
+        stranger = User.objects.create_user(username='stranger', password='testpass123')
+        holder = AccountHolder.objects.create(user=stranger, phone_number='+1987654321',
+                                              address='456 Other St', date_of_birth=date(1990, 1, 1))
+        foreign = Account.objects.create(account_holder=holder, account_type='CHECKING')
+
+        self.assertEqual(self.client.get(f'/api/accounts/{foreign.id}/analytics/').status_code, 404)
+        self.assertEqual(self.client.get('/api/analytics/', {'group': 'week'}).status_code, 400)
+
+    def test_reconcile_repairs_drift(self):
+        entry = ledger.credit(self.account.id, Decimal('50.00'))
+        ledger.credit(self.other.id, Decimal('5.00'))
+        backdated = timezone.now() - timedelta(days=3)
+        Transaction.objects.filter(pk=entry.pk).update(created_at=backdated)
+        DailyRollup.objects.filter(account=self.other).update(count=7)
+
+        self.assertEqual(rollups.reconcile([self.account.id, self.other.id], fix=False), 3)
+        out = StringIO()
+        call_command('rebuild_rollups', stdout=out)
+
+        self.assertIn('Repaired 3 drifted rollups', out.getvalue())
+        rollup = DailyRollup.objects.get(account=self.account)
+        self.assertEqual((rollup.date, rollup.count), (timezone.localdate(backdated), 1))
+        self.assertEqual(DailyRollup.objects.get(account=self.other).count, 1)
+        self.assertEqual(rollups.reconcile([self.account.id, self.other.id]), 0)
+
+    def test_record_splits_at_the_parameter_limit(self):
+        now = timezone.now()
+        entries = [
+            Transaction(account_id=self.account.id, transaction_type='DEPOSIT', amount=Decimal('1.00'),
+                        created_at=now - timedelta(days=day))
+            for day in range(7)
+        ]
+        # Two rows' worth of parameters a statement: seven keys take four
+        with mock.patch.object(connection.features, 'max_query_params', 10), \
+                self.assertNumQueries(4):
+            rollups.record(entries)
+        self.assertEqual(DailyRollup.objects.filter(account=self.account).count(), 7)
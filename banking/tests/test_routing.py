@@ -0,0 +1,214 @@
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connections, router, transaction
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from banking import holders, ledger, routing
+from banking.models import AccountHolder, Account, Transaction
+from banking.routing import StickyWrites
+from decimal import Decimal
+from datetime import date
+import os
+import shutil
+import tempfile
+
+REPLICA = 'replica_under_test'
+LEDGER = 'ledger_under_test'
+LEDGER_REPLICA = 'ledger_replica_under_test'
+
+class StickyWritesTestCase(SimpleTestCase):
+    """Unit tests for the read-your-writes window"""
+
+    def test_window(self):
+        writes = StickyWrites(window=60)
+        writes.mark(1)
+        self.assertTrue(writes.is_sticky(1))
+        self.assertFalse(writes.is_sticky(2))
+
+        expired = StickyWrites(window=0)
+        expired.mark(1)
+        self.assertFalse(expired.is_sticky(1))
+
+    @override_settings(BANKING_REPLICA_ALIAS='no_such_alias')
+    def test_no_replica_configured(self):
+        self.assertIsNone(routing.replica_alias())
+        with routing.replica_reads():
+            self.assertEqual(router.db_for_read(Transaction), 'default')
+
+@override_settings(BANKING_REPLICA_ALIAS=REPLICA)
+class ReplicaRoutingTestCase(TransactionTestCase):
+    """
+    List reads go to a real second SQLite file kept in sync by
+    ``routing.replicate``; writes and recent writers stay on the primary.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Added after the test case has fenced off undeclared aliases, so
+        # the replica is reachable like any configured database.
+        cls.directory = tempfile.mkdtemp(prefix='banking-replica-')
+        connections.settings[REPLICA] = connections.configure_settings({
+            'default': dict(connections.settings['default']),
+            REPLICA: {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': os.path.join(cls.directory, 'replica.sqlite3'),
+            },
+        })[REPLICA]
+
+    @classmethod
+    def tearDownClass(cls):
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.settings[REPLICA]
+        shutil.rmtree(cls.directory, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        holders.cache.clear()
+        routing.sticky.clear()
+        self.user = User.objects.create_user(
+            username='replicauser',
+            email='replica@example.com',
+            password='testpass123'
+        )
+        self.account_holder = AccountHolder.objects.create(
+            user=self.user,
+            phone_number='+1234567890',
+            address='123 Replica St',
+            date_of_birth=date(1990, 1, 1)
+        )
+        self.account = Account.objects.create(
+            account_holder=self.account_holder,
+            account_type='CHECKING'
+        )
+        ledger.credit(self.account.id, Decimal('10.00'))
+        routing.replicate()
+        # Committed on the primary but not yet replicated
+        ledger.credit(self.account.id, Decimal('20.00'))
+
+        self.url = f'/api/accounts/{self.account.id}/transactions/'
+        self.client = APIClient()
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+    def amounts(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return sorted(row['amount'] for row in response.data['results'])
+
+    def test_list_reads_come_from_the_replica(self):
+        self.assertEqual(routing.replica_alias(), REPLICA)
+        self.assertEqual(self.amounts(), ['10.00'])
+
+        routing.replicate()
+        self.assertEqual(self.amounts(), ['10.00', '20.00'])
+
+    def test_writer_reads_its_own_writes(self):
+        response = self.client.post(f'/api/accounts/{self.account.id}/deposit/', {'amount': '5.00'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.amounts(), ['10.00', '20.00', '5.00'])
+
+        # Once the window has passed the replica serves them again
+        routing.sticky.mark(self.user.id)
+        window, routing.sticky.window = routing.sticky.window, 0
+        try:
+            self.assertEqual(self.amounts(), ['10.00'])
+        finally:
+            routing.sticky.window = window
+
+    def test_primary_inside_atomic_and_after_a_write(self):
+        routing._state.wrote = False  # as the middleware does per request
+        with routing.replica_reads():
+            self.assertEqual(router.db_for_read(Transaction), REPLICA)
+            with transaction.atomic():
+                self.assertEqual(router.db_for_read(Transaction), 'default')
+            router.db_for_write(Transaction)
+            self.assertEqual(router.db_for_read(Transaction), 'default')
+        routing._state.wrote = False
+        # Outside replica_reads nothing is offloaded
+        self.assertEqual(router.db_for_read(Transaction), 'default')
+
+    def test_admin_changelist_reads_the_replica(self):
+        User.objects.create_user(username='replicaops', password='testpass123', is_staff=True, is_superuser=True)
+        routing.replicate()
+        ledger.credit(self.account.id, Decimal('30.00'))
+        unreplicated = Transaction.objects.get(amount=Decimal('30.00')).transaction_id
+
+        admin = APIClient()
+        admin.login(username='replicaops', password='testpass123')
+        response = admin.get('/admin/banking/transaction/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, unreplicated)
+        self.assertContains(response, Transaction.objects.get(amount=Decimal('20.00')).transaction_id)
+
+@override_settings(BANKING_SHARDS=[LEDGER], BANKING_SHARD_REPLICAS={LEDGER: LEDGER_REPLICA})
+class LedgerReplicaRoutingTestCase(TransactionTestCase):
+    """With the ledger in its own database, its reads go to the ledger's replica"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.mkdtemp(prefix='banking-ledger-replica-')
+        configured = connections.configure_settings({
+            'default': dict(connections.settings['default']),
+            LEDGER: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': os.path.join(cls.directory, 'ledger.sqlite3')},
+            LEDGER_REPLICA: {'ENGINE': 'django.db.backends.sqlite3',
+                             'NAME': os.path.join(cls.directory, 'ledger-replica.sqlite3')},
+        })
+        for alias in (LEDGER, LEDGER_REPLICA):
+            connections.settings[alias] = configured[alias]
+        call_command('migrate', database=LEDGER, verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        for alias in (LEDGER, LEDGER_REPLICA):
+            connections[alias].close()
+            del connections[alias]
+            del connections.settings[alias]
+        shutil.rmtree(cls.directory, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        holders.cache.clear()
+        routing.sticky.clear()
+        self.user = User.objects.create_user(username='ledgerreplica', password='testpass123')
+        holder = AccountHolder.objects.create(
+            user=self.user,
+            phone_number='+1234567890',
+            address='123 Replica St',
+            date_of_birth=date(1990, 1, 1)
+        )
+        self.account = Account.objects.create(account_holder=holder, account_type='CHECKING')
+        ledger.credit(self.account.id, Decimal('10.00'))
+        routing.replicate()
+        ledger.credit(self.account.id, Decimal('20.00'))
+
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def tearDown(self):
+        call_command('flush', database=LEDGER, interactive=False, verbosity=0)
+
+    def amounts(self):
+        response = self.client.get(f'/api/accounts/{self.account.id}/transactions/')
+        self.assertEqual(response.status_code, 200)
+        return sorted(row['amount'] for row in response.data['results'])
+
+    def test_ledger_reads_come_from_the_ledger_replica(self):
+        self.assertEqual(routing.replicas(), {LEDGER: LEDGER_REPLICA})
+        self.assertEqual(self.amounts(), ['10.00'])
+        routing.replicate()
+        self.assertEqual(self.amounts(), ['10.00', '20.00'])
+
+    def test_ledger_writes_keep_reads_on_the_ledger(self):
+        routing._state.wrote = False
+        with routing.replica_reads():
+            self.assertEqual(router.db_for_read(Transaction), LEDGER_REPLICA)
+            with transaction.atomic(using=LEDGER):
+                self.assertEqual(router.db_for_read(Transaction), LEDGER)
+            self.assertEqual(router.db_for_write(Transaction), LEDGER)
+            self.assertEqual(router.db_for_read(Transaction), LEDGER)
+        routing._state.wrote = False
+        self.assertFalse(router.allow_migrate(LEDGER_REPLICA, 'banking', model_name='transaction'))
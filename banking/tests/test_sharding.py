@@ -0,0 +1,239 @@
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, router, transaction
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from banking import holders, ingestion, ledger, sharding, writer
+from banking.models import AccountHolder, Account, MoneyTransfer, OutboxMessage, InboxMessage, DailyBalance, DailyRollup
+from banking.sharding import SHARD_SPAN
+from unittest import mock
+from decimal import Decimal
+from io import StringIO
+from datetime import date
+import os
+import shutil
+import tempfile
+
+SHARD = 'shard_under_test'
+
+class ShardMapTestCase(SimpleTestCase):
+    """Unit tests for the shard map and the single-shard default"""
+
+    @override_settings(BANKING_SHARDS=['default', SHARD])
+    def test_map(self):
+        self.assertEqual(sharding.shard_for_holder(4), 'default')
+        self.assertEqual(sharding.shard_for_holder(7), SHARD)
+        self.assertEqual(sharding.shard_for_account(12), 'default')
+        self.assertEqual(sharding.shard_for_account(SHARD_SPAN + 12), SHARD)
+        with sharding.using(SHARD):
+            self.assertEqual(router.db_for_write(Account), SHARD)
+            self.assertEqual(router.db_for_read(AccountHolder), 'default')
+        self.assertEqual(router.db_for_read(Account), 'default')
+
+    def test_single_shard_router_stands_aside(self):
+        self.assertFalse(sharding.is_sharded())
+        self.assertIsNone(sharding.ShardRouter().db_for_read(Account))
+        self.assertEqual(sharding.shard_for_account(SHARD_SPAN * 3), 'default')
+
+@override_settings(BANKING_SHARDS=['default', SHARD])
+class CrossShardTransferTestCase(TransactionTestCase):
+    """
+    Two real SQLite databases: holders alternate between them and transfers
+    across them go through the outbox.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.mkdtemp(prefix='banking-shard-')
+        connections.settings[SHARD] = connections.configure_settings({
+            'default': dict(connections.settings['default']),
+            SHARD: {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': os.path.join(cls.directory, 'shard.sqlite3'),
+            },
+        })[SHARD]
+        call_command('migrate', database=SHARD, verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        connections[SHARD].close()
+        del connections[SHARD]
+        del connections.settings[SHARD]
+        shutil.rmtree(cls.directory, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        holders.cache.clear()
+        self.sender = self.create_holder('shardsender')
+        self.recipient = self.create_holder('shardrecipient')
+        if sharding.shard_for_holder(self.sender['holder'].id) == 'default':
+            self.sender, self.recipient = self.recipient, self.sender
+        self.source = self.open_account(self.sender, Decimal('100.00'))
+        self.destination = self.open_account(self.recipient, Decimal('0.00'))
+
+    def tearDown(self):
+        call_command('flush', database=SHARD, interactive=False, verbosity=0)
+
+    def create_holder(self, username):
+        user = User.objects.create_user(username=username, password='testpass123')
+        holder = AccountHolder.objects.create(
+            user=user,
+            phone_number='+1234567890',
+            address='123 Shard St',
+            date_of_birth=date(1990, 1, 1)
+        )
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+        return {'user': user, 'holder': holder, 'client': client}
+
+    def open_account(self, owner, balance):
+        with sharding.using(sharding.shard_for_holder(owner['holder'].id)):
+            return Account.objects.create(account_holder=owner['holder'], account_type='CHECKING', balance=balance)
+
+    def balance(self, account):
+        return Account.objects.using(sharding.shard_for_account(account.id)).get(pk=account.id).balance
+
+    def transfer(self, amount='30.00'):
+        return self.sender['client'].post('/api/transfers/', {
+            'from_account': self.source.id,
+            'to_account': self.destination.id,
+            'amount': amount,
+        }, format='json')
+
+    def test_accounts_live_on_their_holders_shard(self):
+        self.assertGreater(self.source.id, SHARD_SPAN)
+        self.assertEqual(self.source._state.db, SHARD)
+        self.assertFalse(Account.objects.using('default').filter(pk=self.source.id).exists())
+
+        response = self.sender['client'].post('/api/accounts/', {'account_type': 'SAVINGS'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(sharding.shard_for_account(response.data['id']), SHARD)
+        response = self.sender['client'].get('/api/accounts/')
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_cross_shard_transfer(self):
+        response = self.transfer()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['status'], 'COMPLETED')
+        self.assertEqual(response.data['to_account_number'], self.destination.account_number)
+
+        self.assertEqual(self.balance(self.source), Decimal('70.00'))
+        self.assertEqual(self.balance(self.destination), Decimal('30.00'))
+        self.assertFalse(OutboxMessage.objects.using(SHARD).filter(delivered_at__isnull=True).exists())
+        self.assertEqual(InboxMessage.objects.using('default').count(), 1)
+
+        # Each side lists the transfer, with the other shard's account number
+        listed = self.recipient['client'].get('/api/transfers/').data['results']
+        self.assertEqual([row['transfer_id'] for row in listed], [response.data['transfer_id']])
+        self.assertEqual(listed[0]['from_account_number'], self.source.account_number)
+        listed = self.sender['client'].get('/api/transfers/').data['results']
+        self.assertEqual(listed[0]['status'], 'COMPLETED')
+        history = self.recipient['client'].get(f'/api/accounts/{self.destination.id}/transactions/')
+        self.assertEqual(history.data['results'][0]['transaction_type'], 'TRANSFER_IN')
+
+    @override_settings(BANKING_LEDGER_GROUP_COMMIT=True)
+    def test_cross_shard_transfer_through_the_writer_lane(self):
+        try:
+            response = self.transfer()
+        finally:
+            writer.lane(SHARD).shutdown()
+        self.assertEqual(response.data['status'], 'COMPLETED')
+        self.assertEqual(writer.lane(SHARD).postings, 1)
+        self.assertEqual(self.balance(self.destination), Decimal('30.00'))
+
+    def test_failed_delivery_is_relayed_once(self):
+        with mock.patch.object(ledger, 'deliver', side_effect=OperationalError('disk I/O error')), \
+                self.assertLogs('django.db.backends.base', 'ERROR'):
+            response = self.transfer()
+        self.assertEqual(response.data['status'], 'PENDING')
+        self.assertEqual(self.balance(self.source), Decimal('70.00'))
+        self.assertEqual(self.balance(self.destination), Decimal('0.00'))
+
+        self.assertEqual(ledger.relay(), (1, 0))
+        self.assertEqual(ledger.relay(), (0, 0))
+        self.assertEqual(self.balance(self.destination), Decimal('30.00'))
+        self.assertEqual(MoneyTransfer.objects.using(SHARD).get().status, 'COMPLETED')
+
+        # A crash after the credit but before the settle: delivering again is a no-op
+        message = OutboxMessage.objects.using(SHARD).get()
+        OutboxMessage.objects.using(SHARD).update(delivered_at=None)
+        self.assertTrue(ledger.deliver(message))
+        self.assertEqual(self.balance(self.destination), Decimal('30.00'))
+        self.assertEqual(self.balance(self.source), Decimal('70.00'))
+
+    def test_rejected_credit_is_refunded(self):
+        with mock.patch.object(ledger, 'deliver', side_effect=OperationalError('disk I/O error')), \
+                self.assertLogs('django.db.backends.base', 'ERROR'):
+            self.transfer()
+        Account.objects.using('default').filter(pk=self.destination.id).delete()
+
+        self.assertEqual(ledger.relay(), (1, 0))
+        self.assertEqual(self.balance(self.source), Decimal('100.00'))
+        self.assertEqual(MoneyTransfer.objects.using(SHARD).get().status, 'FAILED')
+        self.assertFalse(InboxMessage.objects.using('default').get().applied)
+
+    def test_overdraft_leaves_nothing_queued(self):
+        response = self.transfer(amount='500.00')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(OutboxMessage.objects.using(SHARD).exists())
+        self.assertEqual(self.balance(self.source), Decimal('100.00'))
+
+    @override_settings(BANKING_TRANSFER_BACKOFF=0)
+    def test_retries_check_the_transaction_on_the_database_written(self):
+        locked = mock.Mock(side_effect=OperationalError('database is locked'))
+        with sharding.using(SHARD), transaction.atomic(using=DEFAULT_DB_ALIAS):
+            with self.assertRaises(OperationalError):
+                ledger.with_retries(locked, using=DEFAULT_DB_ALIAS)
+        self.assertEqual(locked.call_count, 1)
+
+    def test_bulk_transfer_pays_destinations_on_every_shard(self):
+        local = self.open_account(self.sender, Decimal('0.00'))
+        response = self.sender['client'].post('/api/transfers/bulk/', {
+            'from_account': self.source.id,
+            'all_or_nothing': False,
+            'items': [
+                {'to_account': self.destination.id, 'amount': '30.00'},
+                {'to_account': local.id, 'amount': '20.00'},
+                {'to_account': self.destination.id + 1000, 'amount': '1.00'},
+            ]
+        }, format='json')
+
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual([row['status'] for row in response.data['results']], ['COMPLETED', 'COMPLETED', 'FAILED'])
+        self.assertEqual(response.data['results'][2]['error'], 'Destination account not found')
+        self.assertEqual(self.balance(self.source), Decimal('50.00'))
+        self.assertEqual(self.balance(self.destination), Decimal('30.00'))
+        self.assertEqual(self.balance(local), Decimal('20.00'))
+        self.assertFalse(OutboxMessage.objects.using(SHARD).filter(delivered_at__isnull=True).exists())
+        self.assertEqual(set(MoneyTransfer.objects.using(SHARD).values_list('status', flat=True)), {'COMPLETED'})
+
+    def test_ingestion_applies_lines_on_every_shard(self):
+        result = ingestion.ingest([
+            {'account': self.source.id, 'type': 'DEPOSIT', 'amount': '5.00'},
+            {'account_number': self.destination.account_number, 'type': 'DEPOSIT', 'amount': '7.00'},
+            {'account': self.destination.id, 'type': 'WITHDRAWAL', 'amount': '100.00'},
+            {'account': SHARD_SPAN * 5, 'type': 'DEPOSIT', 'amount': '1.00'},
+        ])
+
+        self.assertEqual(result.applied, 2)
+        self.assertEqual([(failure['line'], failure['error']) for failure in result.failures],
+                         [(3, 'Insufficient funds'), (4, 'Account not found')])
+        self.assertEqual(self.balance(self.source), Decimal('105.00'))
+        self.assertEqual(self.balance(self.destination), Decimal('7.00'))
+
+    def test_backfills_and_rebuilds_cover_every_shard(self):
+        ledger.credit(self.source.id, Decimal('5.00'))
+        ledger.credit(self.destination.id, Decimal('5.00'))
+        for alias in ('default', SHARD):
+            DailyBalance.objects.using(alias).all().delete()
+            DailyRollup.objects.using(alias).all().delete()
+
+        call_command('backfill_checkpoints', stdout=StringIO())
+        call_command('rebuild_rollups', stdout=StringIO())
+        for account, alias in ((self.source, SHARD), (self.destination, 'default')):
+            self.assertEqual(
+                DailyBalance.objects.using(alias).get(account_id=account.id).closing_balance, self.balance(account)
+            )
+            self.assertTrue(DailyRollup.objects.using(alias).filter(account_id=account.id).exists())
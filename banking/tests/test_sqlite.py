@@ -0,0 +1,51 @@
+from django.test import SimpleTestCase, override_settings
+from django.db import connection, connections
+from banking import sqlite
+import os
+import shutil
+import tempfile
+import unittest
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'SQLite pragmas')
+class SQLitePragmaTestCase(SimpleTestCase):
+    """BANKING_SQLITE_PRAGMAS runs on every new connection"""
+    databases = {'default'}
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='banking-sqlite-')
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def open(self):
+        conn = connections.create_connection('default')
+        conn.settings_dict = dict(conn.settings_dict, NAME=os.path.join(self.directory, 'db.sqlite3'))
+        self.addCleanup(conn.close)
+        conn.ensure_connection()
+        return conn
+
+    def test_production_pragmas_applied_to_new_connections(self):
+        from banking_application import settings_production
+        with override_settings(BANKING_SQLITE_PRAGMAS=settings_production.BANKING_SQLITE_PRAGMAS):
+            values = sqlite.pragmas(self.open())
+
+        self.assertEqual(values['journal_mode'], 'wal')
+        self.assertEqual(values['synchronous'], 1)  # NORMAL
+        self.assertEqual(values['cache_size'], -65536)
+        self.assertEqual(values['mmap_size'], 268435456)
+
+    def test_no_pragmas_by_default(self):
+        conn = self.open()
+        with conn.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'delete')
+
+    def test_production_profile_uses_the_writer_lane(self):
+        from banking_application import settings_production
+        self.assertTrue(settings_production.BANKING_LEDGER_GROUP_COMMIT)
+        self.assertIsNone(settings_production.DATABASES['default']['CONN_MAX_AGE'])
+        self.assertGreater(settings_production.DATABASES['default']['OPTIONS']['timeout'], 0)
+
+    def test_production_profile_gives_the_ledger_its_own_database(self):
+        from banking_application import settings_production
+        self.assertEqual(settings_production.BANKING_SHARDS[0], 'ledger')
+        self.assertNotEqual(settings_production.DATABASES['ledger']['NAME'],
+                            settings_production.DATABASES['default']['NAME'])
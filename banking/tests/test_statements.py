@@ -0,0 +1,193 @@
+from django.test import TestCase
+from django.core.management import call_command
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from banking import checkpoints, holders, ledger, rollups, statements
+from banking.models import AccountHolder, Account, Transaction, Statement, StatementLine
+from decimal import Decimal
+from datetime import date, timedelta
+from io import StringIO
+
+class StatementLineTestCase(TestCase):
+    """Statements freeze their lines at generation time"""
+
+    def setUp(self):
+        holders.cache.clear()
+        self.user = User.objects.create_user(
+            username='statementuser',
+            email='statement@example.com',
+            password='testpass123'
+        )
+        self.account_holder = AccountHolder.objects.create(
+            user=self.user,
+            phone_number='+1234567890',
+            address='123 Statement St',
+            date_of_birth=date(1990, 1, 1)
+        )
+        self.account = Account.objects.create(
+            account_holder=self.account_holder,
+            account_type='CHECKING',
+            balance=Decimal('1000.00')
+        )
+        self.today = timezone.localdate()
+
+        self.client = APIClient()
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+    def post_entries(self, count):
+        for _ in range(count):
+            ledger.credit(self.account.id, Decimal('1.00'))
+
+    def test_generate_freezes_lines_in_order(self):
+        ledger.credit(self.account.id, Decimal('50.00'), description='Paycheck')
+        ledger.debit(self.account.id, Decimal('20.00'), description='Groceries')
+
+        statement = statements.generate(self.account, self.today, self.today)
+
+        self.assertEqual(statement.line_count, 2)
+        lines = list(statement.lines.all())
+        self.assertEqual([line.position for line in lines], [0, 1])
+        self.assertEqual([line.description for line in lines], ['Paycheck', 'Groceries'])
+        self.assertEqual(lines[1].balance_after, Decimal('1030.00'))
+
+    def test_lines_do_not_change_with_the_ledger(self):
+        entry = ledger.credit(self.account.id, Decimal('50.00'), description='Paycheck')
+        statement = statements.generate(self.account, self.today, self.today)
+
+        Transaction.objects.filter(pk=entry.pk).update(description='Edited')
+        ledger.credit(self.account.id, Decimal('5.00'))
+
+        response = self.client.get(f'/api/accounts/{self.account.id}/statements/')
+        listed = response.data['results'][0]
+        self.assertEqual(listed['line_count'], 1)
+        self.assertNotIn('transactions', listed)
+        lines = self.client.get(listed['lines']).data['results']
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(lines[0]['description'], 'Paycheck')
+        self.assertEqual(lines[0]['id'], entry.pk)
+        self.assertEqual(lines[0]['account'], self.account.id)
+        self.assertEqual(Statement.objects.get(pk=statement.pk).line_count, 1)
+
+    def test_statement_list_query_count_is_constant(self):
+        self.post_entries(3)
+        statements.generate(self.account, self.today, self.today)
+        url = f'/api/accounts/{self.account.id}/statements/'
+        self.client.get(url)
+
+        with CaptureQueriesContext(connection) as one_statement:
+            self.client.get(url)
+
+        self.post_entries(10)
+        for _ in range(19):
+            statements.generate(self.account, self.today - timedelta(days=1), self.today)
+
+        with CaptureQueriesContext(connection) as twenty_statements:
+            response = self.client.get(url)
+        self.assertEqual(len(response.data['results']), 20)
+        self.assertEqual(len(twenty_statements), len(one_statement))
+
+    def test_lines_endpoint_pages_by_position(self):
+        self.post_entries(25)
+        statement = statements.generate(self.account, self.today, self.today)
+        url = f'/api/accounts/{self.account.id}/statements/{statement.id}/lines/'
+
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual([line['position'] for line in first.data['results']], list(range(20)))
+        self.assertIsNotNone(first.data['next'])
+
+        second = self.client.get(first.data['next'])
+        self.assertEqual([line['position'] for line in second.data['results']], list(range(20, 25)))
+        self.assertIsNone(second.data['next'])
+
+    def test_lines_endpoint_hides_other_accounts_statements(self):
+        other_holder = AccountHolder.objects.create(
+            user=User.objects.create_user(username='otherstatement', password='testpass123'),
+            phone_number='+1987654321',
+            address='456 Other St',
+            date_of_birth=date(1990, 1, 1)
+        )
+        other_account = Account.objects.create(account_holder=other_holder, account_type='CHECKING')
+        statement = statements.generate(other_account, self.today, self.today)
+
+        response = self.client.get(f'/api/accounts/{self.account.id}/statements/{statement.id}/lines/')
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(StatementLine.objects.exists())
+
+
+class MonthEndStatementTestCase(TestCase):
+    """Set-based statement runs over ranges of accounts"""
+
+    def setUp(self):
+        holders.cache.clear()
+        user = User.objects.create_user(username='monthend', password='testpass123')
+        self.account_holder = AccountHolder.objects.create(
+            user=user,
+            phone_number='+1234567890',
+            address='123 Month End St',
+            date_of_birth=date(1990, 1, 1)
+        )
+        self.accounts = [
+            Account.objects.create(account_holder=self.account_holder, account_type='CHECKING',
+                                   balance=Decimal('100.00'))
+            for _ in range(4)
+        ]
+        self.today = timezone.localdate()
+        self.yesterday = self.today - timedelta(days=1)
+
+    def backdate(self, entry, days):
+        created_at = timezone.now() - timedelta(days=days)
+        Transaction.objects.filter(pk=entry.pk).update(created_at=created_at)
+        return created_at
+
+    def test_matches_single_account_generation(self):
+        active, quiet, later, idle = self.accounts
+        ledger.credit(active.id, Decimal('50.00'))
+        ledger.debit(active.id, Decimal('20.00'))
+        ledger.transfer(active, quiet, Decimal('5.00'))
+        ledger.credit(later.id, Decimal('7.00'))
+        # Move everything but ``later``'s credit into yesterday's period
+        for entry in Transaction.objects.exclude(account=later):
+            self.backdate(entry, 1)
+        account_ids = [account.id for account in self.accounts]
+        checkpoints.rebuild(account_ids)
+        rollups.reconcile(account_ids)
+
+        issued, lines = statements.generate_range(min(account_ids), max(account_ids) + 1,
+                                                  self.yesterday, self.yesterday)
+
+        self.assertEqual((issued, lines), (4, 4))
+        for account in self.accounts:
+            account.refresh_from_db()
+            expected = statements.generate(account, self.yesterday, self.yesterday)
+            issued_statement = Statement.objects.filter(account=account).exclude(pk=expected.pk).get()
+            for field in ('opening_balance', 'closing_balance', 'total_deposits', 'total_withdrawals', 'line_count'):
+                self.assertEqual(getattr(issued_statement, field), getattr(expected, field), (account.id, field))
+            self.assertEqual(
+                list(issued_statement.lines.values_list('entry_id', 'position', 'balance_after')),
+                list(expected.lines.values_list('entry_id', 'position', 'balance_after'))
+            )
+
+    def test_rerun_skips_issued_accounts(self):
+        account_ids = [account.id for account in self.accounts]
+        statements.generate_range(account_ids[0], account_ids[2], self.today, self.today)
+        issued, _ = statements.generate_range(account_ids[0], account_ids[-1] + 1, self.today, self.today)
+
+        self.assertEqual(issued, 2)
+        self.assertEqual(Statement.objects.count(), 4)
+
+    def test_command_issues_every_account(self):
+        ledger.credit(self.accounts[0].id, Decimal('10.00'))
+        out = StringIO()
+        call_command('month_end_statements', start_date=self.today.isoformat(), end_date=self.today.isoformat(),
+                     chunk_size=3, workers=1, stdout=out)
+
+        self.assertIn('Issued 4 statements with 1 lines', out.getvalue())
+        statement = Statement.objects.get(account=self.accounts[0])
+        self.assertEqual(statement.closing_balance, Decimal('110.00'))
+        self.assertEqual(statement.lines.get().amount, Decimal('10.00'))
@@ -0,0 +1,129 @@
+from django.test import TransactionTestCase, override_settings
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from banking import holders, ledger, writer
+from banking.models import AccountHolder, Account, Transaction
+from banking.writer import GroupCommitWriter
+from decimal import Decimal
+from datetime import date
+from unittest import mock
+import threading
+
+class GroupCommitWriterTestCase(TransactionTestCase):
+    """Tests for batching ledger postings into group commits"""
+
+    def setUp(self):
+        holders.cache.clear()
+        self.user = User.objects.create_user(username='writeruser', password='testpass123')
+        self.account_holder = AccountHolder.objects.create(
+            user=self.user,
+            phone_number='+1234567890',
+            address='123 Writer St',
+            date_of_birth=date(1990, 1, 1)
+        )
+        self.account = Account.objects.create(
+            account_holder=self.account_holder,
+            account_type='CHECKING',
+            balance=Decimal('100.00')
+        )
+        self.writer = GroupCommitWriter(max_batch=16, max_wait=0.05)
+        self.addCleanup(self.writer.shutdown)
+
+    def test_postings_share_one_commit(self):
+        futures = [self.writer.submit(ledger.credit, self.account.id, Decimal('1.00')) for _ in range(10)]
+        entries = [future.result(timeout=5) for future in futures]
+
+        self.assertEqual(sorted(entry.balance_after for entry in entries),
+                         [Decimal('100.00') + n for n in range(1, 11)])
+        self.assertEqual(self.writer.groups, 1)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('110.00'))
+
+    def test_failed_posting_only_fails_its_own_future(self):
+        ok = self.writer.submit(ledger.credit, self.account.id, Decimal('5.00'))
+        overdraft = self.writer.submit(ledger.debit, self.account.id, Decimal('500.00'))
+        missing = self.writer.submit(ledger.credit, self.account.id + 1000, Decimal('1.00'))
+
+        self.assertEqual(ok.result(timeout=5).balance_after, Decimal('105.00'))
+        with self.assertRaises(ledger.InsufficientFunds):
+            overdraft.result(timeout=5)
+        with self.assertRaises(Account.DoesNotExist):
+            missing.result(timeout=5)
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_failed_group_commit_retries_postings_individually(self):
+        real_atomic = writer.transaction.atomic
+        calls = []
+
+        def flaky_atomic(*args, **kwargs):
+            calls.append(1)
+            if len(calls) == 1:
+                raise writer.transaction.DatabaseError('database is locked')
+            return real_atomic(*args, **kwargs)
+
+        with mock.patch.object(writer.transaction, 'atomic', side_effect=flaky_atomic):
+            futures = [self.writer.submit(ledger.credit, self.account.id, Decimal('1.00')) for _ in range(3)]
+            results = [future.result(timeout=5) for future in futures]
+
+        self.assertEqual(len(results), 3)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('103.00'))
+
+    @override_settings(BANKING_LEDGER_GROUP_COMMIT=True)
+    def test_deposit_endpoint_goes_through_writer(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+        with mock.patch.object(writer, 'writer', self.writer):
+            response = client.post(f'/api/accounts/{self.account.id}/deposit/', {'amount': 25}, format='json')
+            overdraft = client.post(f'/api/accounts/{self.account.id}/withdraw/', {'amount': 500}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['new_balance'], '125.00')
+        self.assertEqual(overdraft.status_code, 400)
+        self.assertEqual(overdraft.data['error'], 'Insufficient funds')
+        self.assertEqual(self.writer.postings, 2)
+
+    def block_writer(self):
+        """Occupy the writer thread until the returned event is set."""
+        release = threading.Event()
+        started = threading.Event()
+
+        def wait():
+            started.set()
+            release.wait(5)
+
+        self.writer.submit(wait)
+        started.wait(5)
+        self.addCleanup(release.set)
+        return release
+
+    def test_timed_out_posting_is_cancelled(self):
+        release = self.block_writer()
+        with self.settings(BANKING_LEDGER_WRITE_TIMEOUT=0.05), self.assertRaises(writer.WriteTimeout):
+            self.writer.call(ledger.credit, self.account.id, Decimal('1.00'))
+        release.set()
+
+        self.assertEqual(self.writer.call(ledger.credit, self.account.id, Decimal('2.00')).balance_after,
+                         Decimal('102.00'))
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    @override_settings(BANKING_LEDGER_GROUP_COMMIT=True)
+    def test_timed_out_deposit_is_503_and_retryable(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+        url = f'/api/accounts/{self.account.id}/deposit/'
+
+        with mock.patch.object(writer, 'writer', self.writer):
+            release = self.block_writer()
+            with self.settings(BANKING_LEDGER_WRITE_TIMEOUT=0.05):
+                response = client.post(url, {'amount': 25}, format='json', HTTP_IDEMPOTENCY_KEY='slow-deposit')
+            self.assertEqual(response.status_code, 503)
+            release.set()
+            retried = client.post(url, {'amount': 25}, format='json', HTTP_IDEMPOTENCY_KEY='slow-deposit')
+
+        self.assertEqual(retried.status_code, 200)
+        self.assertNotIn('Idempotent-Replayed', retried)
+        self.assertEqual(retried.data['new_balance'], '125.00')
+        self.assertEqual(Transaction.objects.count(), 1)
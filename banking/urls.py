@@ -1,12 +1,12 @@
 from django.urls import path
-from rest_framework_simplejwt.views import TokenRefreshView
-from . import views
+from . import async_views, views
 
 urlpatterns = [
     # Authentication
     path('auth/signup/', views.SignUpView.as_view(), name='signup'),
     path('auth/login/', views.CustomTokenObtainPairView.as_view(), name='login'),
-    path('auth/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('auth/refresh/', views.CustomTokenRefreshView.as_view(), name='token_refresh'),
+    path('auth/logout/', views.logout, name='logout'),
 
     # Account Holders
     path('profile/', views.account_holder_profile, name='profile'),
@@ -16,12 +16,23 @@ urlpatterns = [
     path('accounts/<int:pk>/', views.AccountDetailView.as_view(), name='account-detail'),
 
     # Transactions
+    path('accounts/transactions/export/', views.export_holder_transactions, name='holder-transaction-export'),
     path('accounts/<int:account_id>/transactions/', views.TransactionListView.as_view(), name='transactions'),
+    path('accounts/<int:account_id>/transactions/export/', views.export_transactions, name='transaction-export'),
     path('accounts/<int:account_id>/deposit/', views.deposit_money, name='deposit'),
     path('accounts/<int:account_id>/withdraw/', views.withdraw_money, name='withdraw'),
+    path('accounts/<int:account_id>/balance/', views.account_balance, name='account-balance'),
+
+    # Analytics (served from daily rollups)
+    path('analytics/', views.holder_analytics, name='holder-analytics'),
+    path('accounts/<int:account_id>/analytics/', views.account_analytics, name='account-analytics'),
 
     # Money Transfers
     path('transfers/', views.MoneyTransferListCreateView.as_view(), name='transfers'),
+    path('transfers/bulk/', views.bulk_transfer, name='bulk-transfer'),
+
+    # Settlement ingestion (staff only)
+    path('ingest/transactions/', views.ingest_transactions, name='ingest-transactions'),
 
     # Cards
     path('cards/', views.CardListCreateView.as_view(), name='card-list'),
@@ -29,5 +40,12 @@ urlpatterns = [
 
     # Statements
     path('accounts/<int:account_id>/statements/', views.StatementListView.as_view(), name='statements'),
+    path('accounts/<int:account_id>/statements/<int:pk>/lines/', views.StatementLineListView.as_view(), name='statement-lines'),
     path('accounts/<int:account_id>/generate-statement/', views.generate_statement, name='generate-statement'),
+
+    # Async read path (served natively under ASGI)
+    path('async/profile/', async_views.account_holder_profile, name='async-profile'),
+    path('async/accounts/', async_views.account_list, name='async-account-list'),
+    path('async/accounts/<int:account_id>/transactions/', async_views.transaction_list, name='async-transactions'),
+    path('async/accounts/<int:account_id>/statements/', async_views.statement_list, name='async-statements'),
 ]
@@ -1,22 +1,33 @@
 from django.shortcuts import render
-from django.db.models import Q, Sum
+from django.db.models import Q
 # Create your views here.
 from rest_framework import generics, status, permissions
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
-from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from django.contrib.auth import authenticate
-from django.db import transaction
+from django.db import DatabaseError
 from django.utils import timezone
+from django.utils.decorators import method_decorator
 from decimal import Decimal
 from datetime import datetime, timedelta
 import uuid
 
+from . import checkpoints, exports, idempotency, ingestion, ledger, rollups, sharding, statements, writer
+from .conditional import ConditionalGetMixin
+from .routing import ReplicaReadMixin
+from .authentication import BankingTokenObtainPairSerializer, BankingTokenRefreshSerializer, IsStaff, revocations
+from .holders import holder_context, owns_account
 from .models import AccountHolder, Account, Transaction, MoneyTransfer, Card, Statement
+from .pagination import LedgerPagination, PositionPagination
 from .serializers import (
     UserRegistrationSerializer, AccountHolderSerializer, AccountSerializer,
-    TransactionSerializer, MoneyTransferSerializer, CardSerializer, StatementSerializer
+    TransactionSerializer, MoneyTransferSerializer, BulkTransferSerializer, CardSerializer,
+    StatementSerializer, StatementDetailSerializer, StatementLineSerializer
 )
 
 class SignUpView(generics.CreateAPIView):
@@ -26,50 +37,91 @@ class SignUpView(generics.CreateAPIView):
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     permission_classes = [permissions.AllowAny]
+    serializer_class = BankingTokenObtainPairSerializer
+
+class CustomTokenRefreshView(TokenRefreshView):
+    permission_classes = [permissions.AllowAny]
+    serializer_class = BankingTokenRefreshSerializer
+
+@api_view(['POST'])
+def logout(request):
+    """Revoke the presented access token and, when supplied, its refresh token."""
+    access = request.auth
+    revocations.revoke_token(access[jwt_settings.JTI_CLAIM], access['exp'])
+
+    if request.data.get('refresh'):
+        try:
+            refresh = RefreshToken(request.data['refresh'])
+        except TokenError as e:
+            return Response({'error': str(e)}, status=400)
+        if refresh[jwt_settings.USER_ID_CLAIM] == request.user.id:
+            revocations.revoke_token(refresh[jwt_settings.JTI_CLAIM], refresh['exp'])
+
+    return Response({'message': 'Logged out'})
 
 @api_view(['GET'])
 def account_holder_profile(request):
     try:
-        account_holder = AccountHolder.objects.get(user=request.user)
+        context = holder_context(request)
+        account_holder = AccountHolder.objects.select_related('user').get(pk=context.holder_id)
         serializer = AccountHolderSerializer(account_holder)
         return Response(serializer.data)
     except AccountHolder.DoesNotExist:
         return Response({'error': 'Account holder not found'}, status=404)
 
-class AccountListCreateView(generics.ListCreateAPIView):
+class AccountListCreateView(ConditionalGetMixin, generics.ListCreateAPIView):
     serializer_class = AccountSerializer
 
     def get_queryset(self):
-        account_holder = AccountHolder.objects.get(user=self.request.user)
-        return Account.objects.filter(account_holder=account_holder)
+        return Account.objects.filter(account_holder_id=holder_context(self.request).holder_id)
 
     def perform_create(self, serializer):
-        account_holder = AccountHolder.objects.get(user=self.request.user)
-        serializer.save(account_holder=account_holder)
+        serializer.save(account_holder_id=holder_context(self.request).holder_id)
 
-class AccountDetailView(generics.RetrieveUpdateDestroyAPIView):
+class AccountDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = AccountSerializer
+    conditional_account_kwarg = 'pk'
 
     def get_queryset(self):
-        account_holder = AccountHolder.objects.get(user=self.request.user)
-        return Account.objects.filter(account_holder=account_holder)
+        return Account.objects.filter(account_holder_id=holder_context(self.request).holder_id)
 
-class TransactionListView(generics.ListAPIView):
+class TransactionListView(ReplicaReadMixin, ConditionalGetMixin, generics.ListAPIView):
     serializer_class = TransactionSerializer
+    pagination_class = LedgerPagination
+    conditional_account_kwarg = 'account_id'
 
     def get_queryset(self):
         account_id = self.kwargs.get('account_id')
-        account_holder = AccountHolder.objects.get(user=self.request.user)
-        return Transaction.objects.filter(
-            account_id=account_id,
-            account__account_holder=account_holder
-        )
+        if not owns_account(self.request, account_id):
+            raise NotFound('Account not found')
+        return Transaction.objects.filter(account_id=account_id)
+
+@api_view(['GET'])
+def export_transactions(request, account_id):
+    """Stream an account's full transaction history as CSV or NDJSON."""
+    if not owns_account(request, account_id):
+        raise NotFound('Account not found')
+    queryset = exports.filter_transactions(
+        Transaction.objects.filter(account_id=account_id), request.query_params
+    )
+    return exports.stream(queryset, request.query_params.get('output', 'csv'),
+                          filename=f'transactions-{account_id}')
+
+@api_view(['GET'])
+def export_holder_transactions(request):
+    """Stream the transactions of every account the holder owns."""
+    context = holder_context(request)
+    queryset = exports.filter_transactions(
+        Transaction.objects.filter(account_id__in=context.account_ids), request.query_params
+    )
+    return exports.stream(queryset, request.query_params.get('output', 'csv'),
+                          filename=f'transactions-holder-{context.holder_id}')
 
 @api_view(['POST'])
+@idempotency.idempotent
 def deposit_money(request, account_id):
     try:
-        account_holder = AccountHolder.objects.get(user=request.user)
-        account = Account.objects.get(id=account_id, account_holder=account_holder)
+        context = holder_context(request)
 
         amount = Decimal(str(request.data.get('amount', 0)))
         description = request.data.get('description', 'Deposit')
@@ -77,33 +129,101 @@ def deposit_money(request, account_id):
         if amount <= 0:
             return Response({'error': 'Amount must be positive'}, status=400)
 
-        with transaction.atomic():
-            account.balance += amount
-            account.save()
-
-            Transaction.objects.create(
-                account=account,
-                transaction_type='DEPOSIT',
-                amount=amount,
-                description=description,
-                balance_after=account.balance
-            )
+        entry = writer.credit(
+            account_id, amount,
+            transaction_type='DEPOSIT',
+            description=description,
+            holder_id=context.holder_id
+        )
 
         return Response({
             'message': 'Deposit successful',
-            'new_balance': account.balance
+            'new_balance': str(entry.balance_after)
         })
 
     except Account.DoesNotExist:
         return Response({'error': 'Account not found'}, status=404)
+    except DatabaseError:
+        # Transient (e.g. a locked database): retryable, and never stored
+        # as an Idempotency-Key's final answer.
+        return Response({'error': 'Service temporarily unavailable, please retry'}, status=503)
+    except Exception as e:
+        return Response({'error': str(e)}, status=400)
+
+@api_view(['GET'])
+def account_balance(request, account_id):
+    try:
+        context = holder_context(request)
+        account = Account.objects.get(id=account_id, account_holder_id=context.holder_id)
+
+        as_of = request.query_params.get('date')
+        if as_of is None:
+            return Response({'balance': str(account.balance)})
+
+        day = datetime.strptime(as_of, '%Y-%m-%d').date()
+        return Response({
+            'date': day.isoformat(),
+            'balance': str(checkpoints.balance_as_of(account, day))
+        })
+
+    except Account.DoesNotExist:
+        return Response({'error': 'Account not found'}, status=404)
+    except Exception as e:
+        return Response({'error': str(e)}, status=400)
+
+def _summary_data(summary):
+    return {
+        'deposits': str(summary['deposits']),
+        'withdrawals': str(summary['withdrawals']),
+        'net_flow': str(summary['net_flow']),
+        'deposit_count': summary['deposit_count'],
+        'withdrawal_count': summary['withdrawal_count'],
+        'by_type': {
+            transaction_type: {'count': totals['count'], 'total': str(totals['total'])}
+            for transaction_type, totals in summary['by_type'].items()
+        }
+    }
+
+def _flows_response(account_ids, params):
+    end_date = datetime.strptime(params['end_date'], '%Y-%m-%d').date() if 'end_date' in params \
+        else timezone.localdate()
+    start_date = datetime.strptime(params['start_date'], '%Y-%m-%d').date() if 'start_date' in params \
+        else end_date - timedelta(days=365)
+    group = params.get('group', 'month')
+    flows = rollups.flows(account_ids, start_date, end_date, group=group)
+    return Response({
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'group': group,
+        'periods': [{'period': period['period'], **_summary_data(period)} for period in flows['periods']],
+        'totals': _summary_data(flows['totals'])
+    })
+
+@api_view(['GET'])
+def account_analytics(request, account_id):
+    try:
+        context = holder_context(request)
+        if account_id not in context.account_ids:
+            raise Account.DoesNotExist
+        return _flows_response([account_id], request.query_params)
+
+    except Account.DoesNotExist:
+        return Response({'error': 'Account not found'}, status=404)
+    except Exception as e:
+        return Response({'error': str(e)}, status=400)
+
+@api_view(['GET'])
+def holder_analytics(request):
+    try:
+        return _flows_response(holder_context(request).account_ids, request.query_params)
     except Exception as e:
         return Response({'error': str(e)}, status=400)
 
 @api_view(['POST'])
+@idempotency.idempotent
 def withdraw_money(request, account_id):
     try:
-        account_holder = AccountHolder.objects.get(user=request.user)
-        account = Account.objects.get(id=account_id, account_holder=account_holder)
+        context = holder_context(request)
 
         amount = Decimal(str(request.data.get('amount', 0)))
         description = request.data.get('description', 'Withdrawal')
@@ -111,28 +231,24 @@ def withdraw_money(request, account_id):
         if amount <= 0:
             return Response({'error': 'Amount must be positive'}, status=400)
 
-        if account.balance < amount:
-            return Response({'error': 'Insufficient funds'}, status=400)
-
-        with transaction.atomic():
-            account.balance -= amount
-            account.save()
-
-            Transaction.objects.create(
-                account=account,
-                transaction_type='WITHDRAWAL',
-                amount=amount,
-                description=description,
-                balance_after=account.balance
-            )
+        entry = writer.debit(
+            account_id, amount,
+            transaction_type='WITHDRAWAL',
+            description=description,
+            holder_id=context.holder_id
+        )
 
         return Response({
             'message': 'Withdrawal successful',
-            'new_balance': account.balance
+            'new_balance': str(entry.balance_after)
         })
 
+    except ledger.InsufficientFunds:
+        return Response({'error': 'Insufficient funds'}, status=400)
     except Account.DoesNotExist:
         return Response({'error': 'Account not found'}, status=404)
+    except DatabaseError:
+        return Response({'error': 'Service temporarily unavailable, please retry'}, status=503)
     except Exception as e:
         return Response({'error': str(e)}, status=400)
 
@@ -140,12 +256,27 @@ class MoneyTransferListCreateView(generics.ListCreateAPIView):
     serializer_class = MoneyTransferSerializer
 
     def get_queryset(self):
-        account_holder = AccountHolder.objects.get(user=self.request.user)
-        user_accounts = Account.objects.filter(account_holder=account_holder)
-        return MoneyTransfer.objects.filter(
-            Q(from_account__in=user_accounts) |
-            Q(to_account__in=user_accounts)
+        account_ids = holder_context(self.request).account_ids
+        transfers = MoneyTransfer.objects.filter(
+            Q(from_account_id__in=account_ids) |
+            Q(to_account_id__in=account_ids)
         )
+        if sharding.is_sharded():
+            return transfers  # the other side may be on another shard; see paginate_queryset
+        return transfers.select_related('from_account', 'to_account')
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is not None and sharding.is_sharded():
+            sharding.attach_accounts(page, 'from_account', 'to_account')
+        return page
+
+    @method_decorator(idempotency.idempotent)
+    def create(self, request, *args, **kwargs):
+        try:
+            return super().create(request, *args, **kwargs)
+        except DatabaseError:
+            return Response({'error': 'Service temporarily unavailable, please retry'}, status=503)
 
     def perform_create(self, serializer):
         from_account = serializer.validated_data['from_account']
@@ -153,60 +284,103 @@ class MoneyTransferListCreateView(generics.ListCreateAPIView):
         amount = serializer.validated_data['amount']
 
         # Verify user owns the from_account
-        account_holder = AccountHolder.objects.get(user=self.request.user)
-        if from_account.account_holder != account_holder:
+        context = holder_context(self.request)
+        if from_account.account_holder_id != context.holder_id:
             raise ValidationError("You can only transfer from your own accounts")
 
-        if from_account.balance < amount:
-            raise ValidationError("Insufficient funds")
-
         if from_account == to_account:
             raise ValidationError("Cannot transfer to the same account")
 
-        with transaction.atomic():
-            # Deduct from source account
-            from_account.balance -= amount
-            from_account.save()
-
-            # Add to destination account
-            to_account.balance += amount
-            to_account.save()
-
-            # Create transfer record
-            money_transfer = serializer.save(status='COMPLETED', completed_at=timezone.now())
-
-            # Create transaction records
-            Transaction.objects.create(
-                account=from_account,
-                transaction_type='TRANSFER_OUT',
-                amount=amount,
-                description=f"Transfer to {to_account.account_number}",
-                reference_number=money_transfer.transfer_id,
-                balance_after=from_account.balance
+        # The engine re-checks ownership and funds inside its conditional debit
+        try:
+            serializer.instance = writer.transfer(
+                from_account, to_account, amount,
+                description=serializer.validated_data.get('description', ''),
+                holder_id=context.holder_id
             )
+        except ledger.InsufficientFunds:
+            raise ValidationError("Insufficient funds")
 
-            Transaction.objects.create(
-                account=to_account,
-                transaction_type='TRANSFER_IN',
-                amount=amount,
-                description=f"Transfer from {from_account.account_number}",
-                reference_number=money_transfer.transfer_id,
-                balance_after=to_account.balance
-            )
+def _bulk_result_data(results):
+    data = []
+    for index, result in enumerate(results):
+        if result['status'] == 'COMPLETED':
+            money_transfer = result['transfer']
+            data.append({
+                'index': index,
+                'status': 'COMPLETED',
+                'transfer_id': money_transfer.transfer_id,
+                'to_account': money_transfer.to_account_id,
+                'amount': str(money_transfer.amount)
+            })
+        else:
+            data.append({'index': index, **result})
+    return data
+
+@api_view(['POST'])
+@idempotency.idempotent
+def bulk_transfer(request):
+    # Resolve the holder first so the source account is looked up on their shard
+    context = holder_context(request)
+    serializer = BulkTransferSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=400)
+    from_account = serializer.validated_data['from_account']
+
+    if from_account.account_holder_id != context.holder_id:
+        return Response({'error': 'You can only transfer from your own accounts'}, status=400)
+
+    try:
+        results = writer.bulk_transfer(
+            from_account, serializer.validated_data['items'],
+            holder_id=context.holder_id,
+            all_or_nothing=serializer.validated_data['all_or_nothing']
+        )
+    except ledger.BulkTransferError as e:
+        return Response({'error': 'Bulk transfer rejected', 'results': _bulk_result_data(e.results)}, status=400)
+    except ledger.InsufficientFunds:
+        return Response({'error': 'Insufficient funds'}, status=400)
+    except DatabaseError:
+        return Response({'error': 'Service temporarily unavailable, please retry'}, status=503)
+
+    completed = [result['transfer'] for result in results if result['status'] == 'COMPLETED']
+    return Response({
+        'completed': len(completed),
+        'failed': len(results) - len(completed),
+        'total_amount': str(sum((t.amount for t in completed), Decimal('0.00'))),
+        'results': _bulk_result_data(results)
+    }, status=201)
 
-class CardListCreateView(generics.ListCreateAPIView):
+@api_view(['POST'])
+@permission_classes([IsStaff])
+@idempotency.idempotent
+def ingest_transactions(request):
+    """Apply a settlement file (multipart ``file``) or a JSON array of lines."""
+    try:
+        if 'file' in request.FILES:
+            lines = ingestion.parse(request.FILES['file'].read(), request.data.get('format') or None)
+        elif isinstance(request.data, list):
+            lines = request.data
+        else:
+            lines = request.data.get('lines')
+    except ValueError as e:
+        return Response({'error': f'Could not read file: {e}'}, status=400)
+    if not isinstance(lines, list):
+        return Response({'error': 'Send a settlement file or a list of lines'}, status=400)
+
+    result = ingestion.ingest(lines)
+    return Response(result.as_dict(), status=200)
+
+class CardListCreateView(ReplicaReadMixin, generics.ListCreateAPIView):
     serializer_class = CardSerializer
 
     def get_queryset(self):
-        account_holder = AccountHolder.objects.get(user=self.request.user)
-        user_accounts = Account.objects.filter(account_holder=account_holder)
-        return Card.objects.filter(account__in=user_accounts)
+        return Card.objects.filter(account_id__in=holder_context(self.request).account_ids)
 
     def perform_create(self, serializer):
         account = serializer.validated_data['account']
-        account_holder = AccountHolder.objects.get(user=self.request.user)
 
-        if account.account_holder != account_holder:
+        if not owns_account(self.request, account.id):
             raise ValidationError("You can only create cards for your own accounts")
 
         # Generate CVV and expiry date
@@ -219,59 +393,52 @@ class CardDetailView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = CardSerializer
 
     def get_queryset(self):
-        account_holder = AccountHolder.objects.get(user=self.request.user)
-        user_accounts = Account.objects.filter(account_holder=account_holder)
-        return Card.objects.filter(account__in=user_accounts)
+        return Card.objects.filter(account_id__in=holder_context(self.request).account_ids)
 
-class StatementListView(generics.ListAPIView):
+    def perform_update(self, serializer):
+        account = serializer.validated_data.get('account')
+        if account is not None and not owns_account(self.request, account.id):
+            raise ValidationError("You can only move cards to your own accounts")
+        serializer.save()
+
+class StatementListView(ReplicaReadMixin, ConditionalGetMixin, generics.ListAPIView):
     serializer_class = StatementSerializer
+    conditional_account_kwarg = 'account_id'
 
     def get_queryset(self):
         account_id = self.kwargs.get('account_id')
-        account_holder = AccountHolder.objects.get(user=self.request.user)
-        return Statement.objects.filter(
-            account_id=account_id,
-            account__account_holder=account_holder
-        )
+        if not owns_account(self.request, account_id):
+            raise NotFound('Account not found')
+        return Statement.objects.filter(account_id=account_id).select_related('account')
+
+class StatementLineListView(ReplicaReadMixin, generics.ListAPIView):
+    serializer_class = StatementLineSerializer
+    pagination_class = PositionPagination
+
+    def get_queryset(self):
+        account_id = self.kwargs.get('account_id')
+        if not owns_account(self.request, account_id):
+            raise NotFound('Account not found')
+        try:
+            statement = Statement.objects.only('id', 'account_id').get(
+                id=self.kwargs.get('pk'), account_id=account_id
+            )
+        except Statement.DoesNotExist:
+            raise NotFound('Statement not found')
+        return statement.lines.all()
 
 @api_view(['POST'])
 def generate_statement(request, account_id):
     try:
-        account_holder = AccountHolder.objects.get(user=request.user)
-        account = Account.objects.get(id=account_id, account_holder=account_holder)
+        context = holder_context(request)
+        account = Account.objects.get(id=account_id, account_holder_id=context.holder_id)
 
         start_date = datetime.strptime(request.data.get('start_date'), '%Y-%m-%d').date()
         end_date = datetime.strptime(request.data.get('end_date'), '%Y-%m-%d').date()
 
-        # Get transactions for the period
-        transactions = Transaction.objects.filter(
-            account=account,
-            created_at__date__range=[start_date, end_date]
-        )
-
-        # Calculate totals
-        deposits = transactions.filter(
-            transaction_type__in=['DEPOSIT', 'TRANSFER_IN']
-        ).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-
-        withdrawals = transactions.filter(
-            transaction_type__in=['WITHDRAWAL', 'TRANSFER_OUT']
-        ).aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-
-        # Get opening balance (current balance minus net transactions)
-        opening_balance = account.balance - deposits + withdrawals
-
-        statement = Statement.objects.create(
-            account=account,
-            statement_period_start=start_date,
-            statement_period_end=end_date,
-            opening_balance=opening_balance,
-            closing_balance=account.balance,
-            total_deposits=deposits,
-            total_withdrawals=withdrawals
-        )
+        statement = statements.generate(account, start_date, end_date)
 
-        serializer = StatementSerializer(statement)
+        serializer = StatementDetailSerializer(statement)
         return Response(serializer.data)
 
     except Account.DoesNotExist:
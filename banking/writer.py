@@ -0,0 +1,190 @@
+"""
+Group-commit ledger writer.
+
+On SQLite every commit is an fsync, so one transaction per posting caps write
+throughput at the disk's fsyncs per second. When ``BANKING_LEDGER_GROUP_COMMIT``
+is on, ``credit``/``debit``/``transfer`` hand the posting to a single writer
+thread instead. The writer drains up to ``BANKING_LEDGER_GROUP_SIZE`` queued
+postings, or whatever arrived within ``BANKING_LEDGER_GROUP_WAIT`` seconds,
+runs each one in its own savepoint and commits the group once. Each caller
+then gets its own result or exception.
+
+A posting that fails only rolls back its own savepoint. If the group commit
+itself fails, every posting in it is retried in its own transaction so one
+bad group never fails requests that would have succeeded alone.
+
+Each shard gets its own writer thread (``lane``), so shards commit in
+parallel and a posting queues only behind postings to the same database.
+
+A caller waits at most ``BANKING_LEDGER_WRITE_TIMEOUT`` seconds for its posting
+to start. Past that the posting is cancelled and the caller gets
+``WriteTimeout``; the posting never runs, so the request can safely be retried.
+A posting that already started is always waited for, because it may commit.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections, transaction
+
+from . import ledger, sharding
+
+
+class WriteTimeout(DatabaseError):
+    """The writer did not reach a posting in time; it was cancelled and never ran."""
+
+
+class GroupCommitWriter:
+    """A writer thread that commits queued ledger postings to ``using`` in groups."""
+
+    def __init__(self, max_batch=64, max_wait=0.002, using=DEFAULT_DB_ALIAS):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.using = using
+        self.groups = 0
+        self.postings = 0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue ``fn(*args, **kwargs)`` for the next group and return its Future."""
+        future = Future()
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f'ledger-writer-{self.using}', daemon=True)
+                self._thread.start()
+            self._queue.put((fn, args, kwargs, future))
+        return future
+
+    def call(self, fn, *args, **kwargs):
+        """Run ``fn`` in the next group and wait for its result."""
+        timeout = getattr(settings, 'BANKING_LEDGER_WRITE_TIMEOUT', 30)
+        future = self.submit(fn, *args, **kwargs)
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            if future.cancel():
+                raise WriteTimeout('The ledger writer is busy, please retry') from None
+            # Already in a group, which commits or fails on its own soon
+            return future.result()
+
+    def shutdown(self):
+        """Commit whatever is queued and stop the writer thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+            if thread is not None:
+                self._queue.put(None)
+        if thread is not None:
+            thread.join()
+
+    def _run(self):
+        try:
+            stopping = False
+            while not stopping:
+                job = self._queue.get()
+                if job is None:
+                    return
+                batch = [job]
+                deadline = time.monotonic() + self.max_wait
+                while len(batch) < self.max_batch:
+                    try:
+                        job = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                    except queue.Empty:
+                        break
+                    if job is None:
+                        stopping = True
+                        break
+                    batch.append(job)
+                # Drop postings whose callers gave up waiting for them
+                batch = [job for job in batch if job[3].set_running_or_notify_cancel()]
+                if batch:
+                    self._commit(batch)
+        finally:
+            connections[self.using].close()
+
+    def _commit(self, batch):
+        outcomes = []
+        try:
+            with transaction.atomic(using=self.using):
+                for fn, args, kwargs, future in batch:
+                    try:
+                        with transaction.atomic(using=self.using):
+                            outcomes.append((future, fn(*args, **kwargs), None))
+                    except Exception as e:
+                        outcomes.append((future, None, e))
+        except Exception:
+            connections[self.using].close_if_unusable_or_obsolete()
+            for job in batch:
+                self._commit_one(*job)
+            return
+
+        self.groups += 1
+        self.postings += len(batch)
+        for future, result, error in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    def _commit_one(self, fn, args, kwargs, future):
+        try:
+            with transaction.atomic(using=self.using):
+                result = fn(*args, **kwargs)
+        except Exception as e:
+            future.set_exception(e)
+        else:
+            self.groups += 1
+            self.postings += 1
+            future.set_result(result)
+
+
+# The default shard's writer
+writer = GroupCommitWriter(
+    max_batch=getattr(settings, 'BANKING_LEDGER_GROUP_SIZE', 64),
+    max_wait=getattr(settings, 'BANKING_LEDGER_GROUP_WAIT', 0.002),
+)
+
+_lanes = {}
+_lanes_lock = threading.Lock()
+
+
+def lane(alias):
+    """The writer for shard ``alias``, created on first use."""
+    if alias == DEFAULT_DB_ALIAS:
+        return writer
+    with _lanes_lock:
+        if alias not in _lanes:
+            _lanes[alias] = GroupCommitWriter(max_batch=writer.max_batch, max_wait=writer.max_wait, using=alias)
+        return _lanes[alias]
+
+
+def _post(account_id, fn, *args, **kwargs):
+    # Inside an open transaction the posting has to join it, and another
+    # thread's connection could not see its uncommitted rows anyway.
+    alias = sharding.shard_for_account(account_id)
+    if not getattr(settings, 'BANKING_LEDGER_GROUP_COMMIT', False) or connections[alias].in_atomic_block:
+        return fn(*args, **kwargs)
+    return lane(alias).call(fn, *args, **kwargs)
+
+
+def credit(account_id, amount, **kwargs):
+    """``ledger.credit`` through the group-commit writer when it is enabled."""
+    return _post(account_id, ledger.credit, account_id, amount, **kwargs)
+
+
+def debit(account_id, amount, **kwargs):
+    """``ledger.debit`` through the group-commit writer when it is enabled."""
+    return _post(account_id, ledger.debit, account_id, amount, **kwargs)
+
+
+def transfer(from_account, to_account, amount, **kwargs):
+    """``ledger.transfer`` through the source shard's writer when it is enabled."""
+    return _post(from_account.id, ledger.transfer, from_account, to_account, amount, **kwargs)
+
+
+def bulk_transfer(from_account, items, **kwargs):
+    """``ledger.bulk_transfer`` through the source shard's writer when it is enabled."""
+    return _post(from_account.id, ledger.bulk_transfer, from_account, items, **kwargs)
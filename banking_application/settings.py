@@ -22,6 +22,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'banking.metrics.MetricsMiddleware',  # outermost, so it times the whole stack
+    'banking.profiling.ProfilingMiddleware',
+    'banking.routing.ReplicaRoutingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -57,9 +60,45 @@ DATABASES = {
     }
 }
 
+# Optional read replica for list endpoints and admin changelists (see
+# banking.routing). Locally, `manage.py sync_replica` keeps the file in sync.
+if os.environ.get('BANKING_REPLICA_PATH'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['BANKING_REPLICA_PATH'],
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Ledger databases (see banking.sharding). BANKING_LEDGER_DB_PATH moves the
+# ledger tables out of `default`, which keeps auth, sessions and the admin
+# log, into a `ledger` database. Each path in BANKING_SHARD_PATHS adds a
+# further shard, keyed by account-holder id.
+BANKING_SHARDS = ['default']
+if os.environ.get('BANKING_LEDGER_DB_PATH'):
+    DATABASES['ledger'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['BANKING_LEDGER_DB_PATH'],
+    }
+    BANKING_SHARDS = ['ledger']
+if 'ledger' in DATABASES and os.environ.get('BANKING_LEDGER_REPLICA_PATH'):
+    # The ledger's read replica, serving the same reads as `replica` does for default
+    DATABASES['ledger_replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['BANKING_LEDGER_REPLICA_PATH'],
+        'TEST': {'MIRROR': 'ledger'},
+    }
+for index, path in enumerate(filter(None, os.environ.get('BANKING_SHARD_PATHS', '').split(',')), start=1):
+    DATABASES[f'shard{index}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': path,
+    }
+    BANKING_SHARDS.append(f'shard{index}')
+
+DATABASE_ROUTERS = ['banking.sharding.ShardRouter', 'banking.routing.PrimaryReplicaRouter']
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'banking.authentication.StatelessHolderAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -83,3 +122,30 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Banking service tuning
+BANKING_TRANSFER_RETRIES = 5
+BANKING_TRANSFER_BACKOFF = 0.01  # seconds, doubled on each retry
+BANKING_HOLDER_CACHE_SIZE = 10000
+BANKING_HOLDER_CACHE_TTL = 300  # seconds
+BANKING_LEDGER_GROUP_COMMIT = False  # queue postings for a group-commit writer thread
+BANKING_LEDGER_GROUP_SIZE = 64
+BANKING_LEDGER_GROUP_WAIT = 0.002  # seconds to wait for a group to fill
+BANKING_LEDGER_WRITE_TIMEOUT = 30  # seconds a caller waits for its posting before a 503
+BANKING_BULK_TRANSFER_MAX_ITEMS = 10000
+BANKING_EXPORT_CHUNK_SIZE = 2000  # rows fetched per query while streaming an export
+BANKING_IDEMPOTENCY_TTL = 86400  # seconds an Idempotency-Key is remembered
+BANKING_IDEMPOTENCY_LEASE = 60  # seconds an unfinished request holds its key before a retry may reclaim it
+BANKING_IDEMPOTENCY_CACHE_SIZE = 10000
+BANKING_REPLICA_ALIAS = 'replica'
+BANKING_SHARD_REPLICAS = {'ledger': 'ledger_replica'}  # ledger database alias -> its replica's alias
+BANKING_REPLICA_STICKY_SECONDS = 5  # reads stay on the primary this long after a user's write
+BANKING_SQLITE_PRAGMAS = {}  # run on every new SQLite connection; see settings_production
+BANKING_METRICS_ENABLED = True  # per-endpoint metrics at /metrics
+BANKING_PROFILE_ENABLED = False  # cProfile sampled or X-Profile-Request requests
+BANKING_PROFILE_SAMPLE_RATE = 0.0  # fraction of requests profiled
+BANKING_PROFILE_DIR = BASE_DIR / 'profiles'
+BANKING_PROFILE_KEEP = 100  # newest profiles kept in BANKING_PROFILE_DIR
+
+# Addresses allowed to scrape /metrics
+INTERNAL_IPS = ['127.0.0.1', '::1']
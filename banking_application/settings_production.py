@@ -0,0 +1,63 @@
+"""
+Production profile for a single-node SQLite deployment.
+
+Use with ``DJANGO_SETTINGS_MODULE=banking_application.settings_production``.
+Everything not overridden here comes from ``settings``.
+
+- WAL journaling with pragmas applied on every new connection
+  (``banking.sqlite``), so readers never wait for a writer.
+- Persistent connections: each server thread keeps its connection, and with
+  it SQLite's page cache and memory map, across requests.
+- A busy timeout, so the occasional write outside the ledger queues for the
+  lock instead of failing with "database is locked".
+- Every deposit, withdrawal and transfer goes through the ledger writer
+  thread (``banking.writer``). That is the one serialized writer lane. Reads
+  run in parallel on the request threads' own connections.
+"""
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import BANKING_SHARDS, BASE_DIR, DATABASES
+
+DEBUG = os.environ.get('DEBUG', '') == 'True'
+SECRET_KEY = os.environ.get('SECRET_KEY', SECRET_KEY)  # noqa: F405
+ALLOWED_HOSTS = [host for host in os.environ.get('ALLOWED_HOSTS', '*').split(',') if host]
+
+DATABASES = {
+    **DATABASES,
+    'default': {
+        **DATABASES['default'],
+        'NAME': os.environ.get('BANKING_DB_PATH', BASE_DIR / 'banking_db.sqlite3'),
+        'CONN_MAX_AGE': None,  # keep each thread's connection for its lifetime
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': 20,  # seconds to wait for the write lock
+        },
+    },
+}
+DATABASES['ledger'] = {
+    **DATABASES['default'],
+    'NAME': os.environ.get('BANKING_LEDGER_DB_PATH', BASE_DIR / 'banking_ledger.sqlite3'),
+}
+if os.environ.get('BANKING_LEDGER_REPLICA_PATH'):
+    DATABASES['ledger_replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['BANKING_LEDGER_REPLICA_PATH'],
+        'TEST': {'MIRROR': 'ledger'},
+    }
+# Any BANKING_SHARD_PATHS shards stay after it
+BANKING_SHARDS = ['ledger' if alias == 'default' else alias for alias in BANKING_SHARDS]
+
+BANKING_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -65536,  # KiB, i.e. 64 MiB per connection
+    'mmap_size': 268435456,  # 256 MiB
+    'temp_store': 'MEMORY',
+    'wal_autocheckpoint': 1000,  # pages
+}
+
+# The serialized writer lane
+BANKING_LEDGER_GROUP_COMMIT = True
+BANKING_LEDGER_GROUP_SIZE = 64
+BANKING_LEDGER_GROUP_WAIT = 0.002
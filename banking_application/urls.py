@@ -17,7 +17,13 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from banking import profiling
+from banking.metrics import metrics_view
+
 urlpatterns = [
+    path('admin/profiles/', profiling.profile_list, name='profile-list'),
+    path('admin/profiles/<str:name>', profiling.profile_download, name='profile-download'),
     path('admin/', admin.site.urls),
     path('api/', include('banking.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]